@@ -2,11 +2,14 @@
 AI Search endpoint - independent from regular search
 """
 from fastapi import APIRouter, Query
-from typing import List
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
 
+from app.core.config import settings
+from app.models.tool import Tool
 from app.services.storage import storage
 from app.services.ai_search import ai_search_service
+from app.services.result_cache import search_cache
 
 router = APIRouter()
 
@@ -30,10 +33,45 @@ class AISearchResponse(BaseModel):
     total: int
 
 
+class AISearchBatchRequest(BaseModel):
+    """Several AI searches sharing the same options"""
+    queries: List[str] = Field(..., min_length=1, max_length=settings.SEARCH_BATCH_MAX_QUERIES)
+    limit: int = Field(10, ge=1, le=50, description="Max number of results per query")
+    mode: Literal["semantic", "hybrid"] = "semantic"
+    tags: Optional[List[str]] = Field(None, description="Only tools with any of these tags")
+
+
+class AISearchBatchResponse(BaseModel):
+    """One AI search response per query, in request order"""
+    responses: List[AISearchResponse]
+
+
+def ai_search_key(q: str, limit: int, mode: str, tag_list: Optional[List[str]], catalog_version: str):
+    return search_cache.make_key("ai-search", q, {"limit": limit, "mode": mode, "tags": tag_list}, catalog_version)
+
+
+def to_ai_result(tool: Tool, score: float) -> AISearchResult:
+    return AISearchResult(
+        id=tool.id,
+        name=tool.name,
+        description=tool.description,
+        icon=tool.icon,
+        tool_link=str(tool.tool_link),
+        documentation_link=str(tool.documentation_link) if tool.documentation_link else None,
+        tags=tool.tags,
+        score=round(score, 3)
+    )
+
+
 @router.get("/ai-search", response_model=AISearchResponse)
 async def ai_search(
     q: str = Query(..., description="Search query in natural language"),
-    limit: int = Query(10, ge=1, le=50, description="Max number of results")
+    limit: int = Query(10, ge=1, le=50, description="Max number of results"),
+    mode: Literal["semantic", "hybrid"] = Query(
+        "semantic",
+        description="semantic: embeddings only; hybrid: embeddings + BM25 keyword match (RRF fusion)"
+    ),
+    tags: Optional[str] = Query(None, description="Comma-separated tags to filter by")
 ):
     """
     AI-powered semantic search
@@ -43,35 +81,91 @@ async def ai_search(
     - "监控系统" - finds monitoring tools (Chinese)
     - "HR management" - finds HR tools
     - "devops dashboard" - finds DevOps tools
+    - "RMS" with mode=hybrid - exact acronym hits rank first
+    - "dashboard" with tags=DevOps - top results among DevOps tools only
     """
+    tag_list = sorted({t.strip().lower() for t in tags.split(",") if t.strip()}) if tags else None
+    
+    # Serve repeated queries from cache until the catalog changes
+    catalog_version = await storage.get_catalog_version()
+    cache_key = ai_search_key(q, limit, mode, tag_list, catalog_version)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached.model_copy(update={"query": q})
+    
     # Get all tools
     all_tools = await storage.get_all_tools()
     
+    # Index snapshot to search; may lag the catalog while a rebuild runs
+    snapshot = await ai_search_service.get_snapshot(all_tools, catalog_version)
+    
     # Perform AI search
-    search_results = ai_search_service.search(
+    search_results = await ai_search_service.search_async(
         query=q,
         tools=all_tools,
         top_k=limit,
-        min_score=0.1  # Filter out very low relevance results
+        min_score=0.1,  # Filter out very low relevance results
+        mode=mode,
+        tags=tag_list,
+        snapshot=snapshot
     )
     
     # Convert to response format
-    results = [
-        AISearchResult(
-            id=tool.id,
-            name=tool.name,
-            description=tool.description,
-            icon=tool.icon,
-            tool_link=str(tool.tool_link),
-            documentation_link=str(tool.documentation_link) if tool.documentation_link else None,
-            tags=tool.tags,
-            score=round(score, 3)
-        )
-        for tool, score in search_results
-    ]
+    results = [to_ai_result(tool, score) for tool, score in search_results]
     
-    return AISearchResponse(
+    response = AISearchResponse(
         query=q,
         results=results,
         total=len(results)
     )
+    # Results from a lagging snapshot must not be cached under the new version
+    if snapshot.version == catalog_version:
+        search_cache.set(cache_key, response)
+    return response
+
+
+@router.post("/ai-search/batch", response_model=AISearchBatchResponse)
+async def ai_search_batch(request: AISearchBatchRequest):
+    """
+    AI search for several queries in one request (e.g. one per suggestion chip)
+    
+    Same results as calling `/api/ai-search` for each query, but the catalog is
+    loaded once, all queries are encoded in one model call and scored with one
+    matrix product.
+    
+    Example body: `{"queries": ["trading tools", "监控系统"], "limit": 5, "tags": ["DevOps"]}`
+    """
+    tag_list = sorted({t.strip().lower() for t in request.tags if t.strip()}) if request.tags else None
+    
+    # Queries already answered are served from the same cache as /api/ai-search
+    catalog_version = await storage.get_catalog_version()
+    cache_keys = [
+        ai_search_key(q, request.limit, request.mode, tag_list, catalog_version) for q in request.queries
+    ]
+    responses: List[Optional[AISearchResponse]] = []
+    for q, cache_key in zip(request.queries, cache_keys):
+        cached = search_cache.get(cache_key)
+        responses.append(cached.model_copy(update={"query": q}) if cached is not None else None)
+    
+    missing = [i for i, response in enumerate(responses) if response is None]
+    if missing:
+        all_tools = await storage.get_all_tools()
+        snapshot = await ai_search_service.get_snapshot(all_tools, catalog_version)
+        
+        results_per_query = await ai_search_service.search_many_async(
+            queries=[request.queries[i] for i in missing],
+            tools=all_tools,
+            top_k=request.limit,
+            min_score=0.1,
+            mode=request.mode,
+            tags=tag_list,
+            snapshot=snapshot
+        )
+        
+        for i, search_results in zip(missing, results_per_query):
+            results = [to_ai_result(tool, score) for tool, score in search_results]
+            responses[i] = AISearchResponse(query=request.queries[i], results=results, total=len(results))
+            if snapshot.version == catalog_version:
+                search_cache.set(cache_keys[i], responses[i])
+    
+    return AISearchBatchResponse(responses=responses)
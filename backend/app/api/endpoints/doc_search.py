@@ -2,13 +2,27 @@
 Document Search API Endpoints
 Provides semantic search over tool documentation
 """
-from fastapi import APIRouter, BackgroundTasks, Query, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+import asyncio
+import json
+import os
+import tempfile
+import uuid
 
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+from typing import Dict, List, Optional
+
+from app.core.auth import User, get_current_user, require_admin
+from app.core.config import settings
+from app.models.tool import Tool
 from app.services.document_rag import rag_service
-from app.services.document_crawler import crawler
+from app.services.index_jobs import index_jobs
+from app.services.index_snapshot import export_snapshot
+from app.services.index_writer import doc_index_writer
 from app.services.storage import storage
+from app.services.result_cache import search_cache
 
 router = APIRouter()
 
@@ -30,11 +44,29 @@ class DocumentSearchResponse(BaseModel):
     total: int
 
 
+class DocumentSearchBatchRequest(BaseModel):
+    """Several document searches sharing the same options"""
+    queries: List[str] = Field(..., min_length=1, max_length=settings.SEARCH_BATCH_MAX_QUERIES)
+    limit: int = Field(10, ge=1, le=50, description="Maximum number of results per query")
+    min_score: float = Field(0.3, ge=0.0, le=1.0, description="Minimum relevance score")
+    tool_ids: Optional[List[str]] = Field(None, description="Tool IDs to search in")
+    tags: Optional[List[str]] = Field(None, description="Only tools with any of these tags")
+    doc_types: Optional[List[str]] = Field(None, description="Document types (confluence, webpage, ...)")
+
+
+class DocumentSearchBatchResponse(BaseModel):
+    """One document search response per query, in request order"""
+    responses: List[DocumentSearchResponse]
+
+
 class IndexResponse(BaseModel):
     """Response for indexing operations"""
     message: str
     tool_id: Optional[str] = None
     chunks_indexed: Optional[int] = None
+    job_id: Optional[str] = None  # Queued indexing job
+    batch_id: Optional[str] = None  # Jobs of a reindex-all
+    jobs_queued: Optional[int] = None
 
 
 class StatsResponse(BaseModel):
@@ -42,13 +74,98 @@ class StatsResponse(BaseModel):
     total_chunks: int
     total_tools: int
     model_dimension: int
+    tool_chunks: Dict[str, int] = {}  # Chunks per tool id
+
+
+def clean_list(values: Optional[List[str]], lower: bool = False) -> Optional[List[str]]:
+    """Sorted, de-duplicated filter values without blanks (None if empty)"""
+    if not values:
+        return None
+    items = {item.strip().lower() if lower else item.strip() for item in values}
+    return sorted(item for item in items if item) or None
+
+
+def split_param(value: Optional[str], lower: bool = False) -> Optional[List[str]]:
+    """Comma-separated query parameter as a sorted, de-duplicated list (None if empty)"""
+    return clean_list(value.split(",") if value else None, lower)
+
+
+async def resolve_tool_scope(
+    tool_ids: Optional[List[str]],
+    tags: Optional[List[str]],
+    tools: Optional[List[Tool]] = None
+) -> Optional[List[str]]:
+    """
+    Tools a doc search is restricted to
+    
+    Tags are resolved to the ids of the tools carrying any of them (catalog
+    lookup, unless the caller passes the tools) and intersected with tool_ids
+    if both are given.
+    
+    Returns:
+        Tool ids (possibly empty: nothing matches), or None for all tools
+    """
+    if not tags:
+        return tool_ids
+    
+    tag_set = set(tags)
+    tagged = [
+        tool.id for tool in (tools if tools is not None else await storage.get_all_tools())
+        if tag_set & {tag.lower() for tag in tool.tags}
+    ]
+    if tool_ids is not None:
+        allowed = set(tool_ids)
+        tagged = [tool_id for tool_id in tagged if tool_id in allowed]
+    return sorted(tagged)
+
+
+async def doc_search_cache_key(
+    q: str,
+    limit: int,
+    min_score: float,
+    tool_ids: Optional[List[str]],
+    tags: Optional[List[str]],
+    doc_types: Optional[List[str]],
+    catalog_version: Optional[str] = None
+) -> str:
+    """Cache key valid until the index (or, for tag filters, the catalog) changes"""
+    version = rag_service.index_version
+    if tags:
+        version = f"{version}:{catalog_version or await storage.get_catalog_version()}"
+    # The multilingual doc model is case-sensitive: only whitespace is normalized
+    return search_cache.make_key(
+        "doc-search", q,
+        {"limit": limit, "min_score": min_score, "tool_ids": tool_ids, "tags": tags, "doc_types": doc_types},
+        version,
+        casefold=False
+    )
+
+
+def to_search_result(result: Dict) -> DocumentSearchResult:
+    """API form of a rag_service search result"""
+    # Use smart summary if available, otherwise truncate content
+    snippet = result.get('summary', result['content'])
+    if len(snippet) > 300:
+        snippet = snippet[:297] + "..."
+    
+    return DocumentSearchResult(
+        tool_id=result['tool_id'],
+        tool_name=result['tool_name'],
+        content_snippet=snippet,
+        doc_url=result['doc_url'],
+        doc_type=result['doc_type'],
+        relevance_score=result['relevance_score']
+    )
 
 
 @router.get("/doc-search", response_model=DocumentSearchResponse)
 async def search_documents(
     q: str = Query(..., description="Search query in natural language", min_length=2),
     limit: int = Query(10, ge=1, le=50, description="Maximum number of results"),
-    min_score: float = Query(0.3, ge=0.0, le=1.0, description="Minimum relevance score")
+    min_score: float = Query(0.3, ge=0.0, le=1.0, description="Minimum relevance score"),
+    tool_ids: Optional[str] = Query(None, description="Comma-separated tool IDs to search in"),
+    tags: Optional[str] = Query(None, description="Comma-separated tags: only tools with any of them"),
+    doc_type: Optional[str] = Query(None, description="Comma-separated document types (confluence, webpage, ...)")
 ):
     """
     🔍 Semantic search over tool documentation
@@ -62,58 +179,189 @@ async def search_documents(
     - "eye service configuration"
     - "authentication setup"
     
+    **Filters** (applied inside the vector search, so `limit` counts matching results):
+    - `tool_ids=id1,id2` - only these tools
+    - `tags=Trader,DevOps` - only tools with any of these tags
+    - `doc_type=confluence` - only these document types
+    
     **Returns:**
     - Relevant document snippets
     - Source tool and documentation URL
     - Relevance scores (0-1)
     """
+    tool_id_list = split_param(tool_ids)
+    tag_list = split_param(tags, lower=True)
+    doc_types = split_param(doc_type, lower=True)
+    
+    # Serve repeated queries from cache
+    cache_key = await doc_search_cache_key(q, limit, min_score, tool_id_list, tag_list, doc_types)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached.model_copy(update={"query": q})
+    
+    scope = await resolve_tool_scope(tool_id_list, tag_list)
+    if scope is not None and not scope:
+        return DocumentSearchResponse(query=q, results=[], total=0)
+    
     try:
         # Perform semantic search
-        results = rag_service.search(
+        results = await rag_service.search_async(
             query=q,
             top_k=limit,
-            min_score=min_score
+            min_score=min_score,
+            tool_ids=scope,
+            doc_types=doc_types
         )
         
         # Format results
-        formatted_results = []
-        for result in results:
-            # Use smart summary if available, otherwise truncate content
-            snippet = result.get('summary', result['content'])
-            if len(snippet) > 300:
-                snippet = snippet[:297] + "..."
-            
-            formatted_results.append(
-                DocumentSearchResult(
-                    tool_id=result['tool_id'],
-                    tool_name=result['tool_name'],
-                    content_snippet=snippet,
-                    doc_url=result['doc_url'],
-                    doc_type=result['doc_type'],
-                    relevance_score=result['relevance_score']
-                )
-            )
+        formatted_results = [to_search_result(result) for result in results]
         
-        return DocumentSearchResponse(
+        response = DocumentSearchResponse(
             query=q,
             results=formatted_results,
             total=len(formatted_results)
         )
+        search_cache.set(cache_key, response)
+        return response
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
 
 
-@router.post("/index-tool-docs/{tool_id}", response_model=IndexResponse)
-async def index_tool_documentation(
-    tool_id: str,
-    background_tasks: BackgroundTasks
+@router.post("/doc-search/batch", response_model=DocumentSearchBatchResponse)
+async def search_documents_batch(request: DocumentSearchBatchRequest):
+    """
+    🔍 Semantic search over tool documentation for several queries at once
+    
+    Same results as calling `/api/doc-search` for each query, but all queries
+    are encoded in one model call and looked up with one vector index request.
+    Filters apply to every query.
+    
+    Example body: `{"queries": ["如何部署 strategy GUI", "RKV connection"], "limit": 5, "tags": ["Trader"]}`
+    """
+    if any(len(q) < 2 for q in request.queries):
+        raise HTTPException(status_code=422, detail="Each query needs at least 2 characters")
+    
+    tool_id_list = clean_list(request.tool_ids)
+    tag_list = clean_list(request.tags, lower=True)
+    doc_types = clean_list(request.doc_types, lower=True)
+    
+    # Queries already answered are served from the same cache as /api/doc-search
+    cache_keys = [
+        await doc_search_cache_key(q, request.limit, request.min_score, tool_id_list, tag_list, doc_types)
+        for q in request.queries
+    ]
+    responses: List[Optional[DocumentSearchResponse]] = []
+    for q, cache_key in zip(request.queries, cache_keys):
+        cached = search_cache.get(cache_key)
+        responses.append(cached.model_copy(update={"query": q}) if cached is not None else None)
+    
+    missing = [i for i, response in enumerate(responses) if response is None]
+    if missing:
+        scope = await resolve_tool_scope(tool_id_list, tag_list)
+        if scope is not None and not scope:
+            results_per_query = [[] for _ in missing]
+        else:
+            try:
+                results_per_query = await rag_service.search_many_async(
+                    queries=[request.queries[i] for i in missing],
+                    top_k=request.limit,
+                    min_score=request.min_score,
+                    tool_ids=scope,
+                    doc_types=doc_types
+                )
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+        
+        for i, results in zip(missing, results_per_query):
+            formatted_results = [to_search_result(result) for result in results]
+            responses[i] = DocumentSearchResponse(
+                query=request.queries[i],
+                results=formatted_results,
+                total=len(formatted_results)
+            )
+            search_cache.set(cache_keys[i], responses[i])
+    
+    return DocumentSearchBatchResponse(responses=responses)
+
+
+@router.get("/doc-search/stream")
+async def stream_documents(
+    request: Request,
+    q: str = Query(..., description="Search query in natural language", min_length=2),
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of results"),
+    min_score: float = Query(0.3, ge=0.0, le=1.0, description="Minimum relevance score"),
+    tool_ids: Optional[str] = Query(None, description="Comma-separated tool IDs to search in"),
+    tags: Optional[str] = Query(None, description="Comma-separated tags: only tools with any of them"),
+    doc_type: Optional[str] = Query(None, description="Comma-separated document types (confluence, webpage, ...)")
 ):
+    """
+    🔍 Semantic search over tool documentation, streamed
+    
+    Same parameters and results as `/api/doc-search`, but each result is sent
+    as soon as its snippet is ready (best match first), so the first result
+    arrives without waiting for the whole page of summaries.
+    
+    **Formats:**
+    - NDJSON (default): one result object per line, then `{"done": true, "total": n}`
+    - Server-Sent Events (`Accept: text/event-stream`): `result` events, then a `done` event
+    """
+    tool_id_list = split_param(tool_ids)
+    tag_list = split_param(tags, lower=True)
+    doc_types = split_param(doc_type, lower=True)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    
+    def encode(event: str, payload: Dict) -> str:
+        data = json.dumps(payload, ensure_ascii=False)
+        return f"event: {event}\ndata: {data}\n\n" if sse else data + "\n"
+    
+    cache_key = await doc_search_cache_key(q, limit, min_score, tool_id_list, tag_list, doc_types)
+    cached = search_cache.get(cache_key)
+    scope = None if cached is not None else await resolve_tool_scope(tool_id_list, tag_list)
+    
+    async def events():
+        if cached is not None:
+            for result in cached.results:
+                yield encode("result", result.model_dump())
+            yield encode("done", {"done": True, "total": cached.total})
+            return
+        
+        results = []
+        if scope is None or scope:
+            try:
+                async for result in rag_service.search_stream(
+                    query=q,
+                    top_k=limit,
+                    min_score=min_score,
+                    tool_ids=scope,
+                    doc_types=doc_types
+                ):
+                    item = to_search_result(result)
+                    results.append(item)
+                    yield encode("result", item.model_dump())
+            except Exception as e:
+                # Headers are already sent: report the error in the stream
+                yield encode("error", {"error": f"Search error: {str(e)}"})
+                return
+        
+        # Only complete result lists are cached
+        search_cache.set(cache_key, DocumentSearchResponse(query=q, results=results, total=len(results)))
+        yield encode("done", {"done": True, "total": len(results)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/index-tool-docs/{tool_id}", response_model=IndexResponse)
+async def index_tool_documentation(tool_id: str):
     """
     📚 Index documentation for a specific tool
     
-    This endpoint crawls the tool's documentation URL and indexes it
-    for semantic search. The indexing happens in the background.
+    This endpoint queues a job that crawls the tool's documentation URL
+    and indexes it for semantic search.
     
     **What it does:**
     1. Fetches the documentation from the tool's doc URL
@@ -121,11 +369,12 @@ async def index_tool_documentation(
     3. Generates AI embeddings
     4. Stores in vector database
     
-    **Note:** Indexing happens asynchronously. The tool's documentation
-    will be searchable within a few seconds.
+    **Note:** Indexing happens asynchronously and is retried if it fails.
+    Follow it with `GET /api/index-jobs`. Repeated requests for a tool that
+    is still waiting are merged into one job.
     """
     # Get tool from storage
-    tool = await storage.get_tool(tool_id)
+    tool = await storage.get_tool_by_id(tool_id)
     if not tool:
         raise HTTPException(status_code=404, detail=f"Tool {tool_id} not found")
     
@@ -135,106 +384,49 @@ async def index_tool_documentation(
             detail=f"Tool {tool.name} has no documentation link"
         )
     
-    async def index_task():
-        """Background task to index documentation"""
-        try:
-            print(f"Starting indexing for {tool.name}...")
-            
-            # Fetch documentation content
-            content = crawler.fetch_url(str(tool.documentation_link))
-            
-            if not content:
-                print(f"Warning: Could not fetch content from {tool.documentation_link}")
-                return
-            
-            # Index the document
-            chunks_count = rag_service.index_document(
-                tool_id=tool.id,
-                tool_name=tool.name,
-                doc_url=str(tool.documentation_link),
-                content=content,
-                doc_type="confluence" if "confluence" in str(tool.documentation_link).lower() else "webpage"
-            )
-            
-            print(f"Successfully indexed {chunks_count} chunks for {tool.name}")
-            
-        except Exception as e:
-            print(f"Error indexing {tool.name}: {e}")
-    
-    # Add to background tasks
-    background_tasks.add_task(index_task)
+    job, created = await index_jobs.enqueue(tool.id, tool.name, str(tool.documentation_link))
     
+    if created:
+        message = f"Queued indexing of documentation for {tool.name}"
+    else:
+        message = f"Indexing of documentation for {tool.name} was already queued"
     return IndexResponse(
-        message=f"Started indexing documentation for {tool.name}",
-        tool_id=tool.id
+        message=message,
+        tool_id=tool.id,
+        job_id=job["id"]
     )
 
 
 @router.post("/reindex-all-docs", response_model=IndexResponse)
-async def reindex_all_documents(background_tasks: BackgroundTasks):
+async def reindex_all_documents():
     """
     🔄 Reindex all tool documentation
     
-    This endpoint reindexes documentation for ALL tools that have
-    documentation links. Use this to refresh the search index.
+    This endpoint queues a reindex of the documentation of ALL tools that
+    have documentation links. Use this to refresh the search index.
     
     **Warning:** This can take several minutes depending on the
-    number of tools. The operation runs in the background.
+    number of tools. Follow the progress with
+    `GET /api/index-jobs?batch_id=<batch_id>`.
     
     **Use cases:**
     - Documentation has been updated
     - Initial setup of the search system
     - Fixing indexing errors
     """
-    async def reindex_task():
-        """Background task to reindex all documentation"""
-        try:
-            print("Starting full reindex of all documentation...")
-            
-            # Get all tools
-            all_tools = await storage.get_all_tools()
-            
-            indexed_count = 0
-            failed_count = 0
-            
-            for tool in all_tools:
-                if not tool.documentation_link:
-                    continue
-                
-                try:
-                    # Fetch content
-                    content = crawler.fetch_url(str(tool.documentation_link))
-                    
-                    if content:
-                        # Index document
-                        chunks = rag_service.index_document(
-                            tool_id=tool.id,
-                            tool_name=tool.name,
-                            doc_url=str(tool.documentation_link),
-                            content=content,
-                            doc_type="confluence" if "confluence" in str(tool.documentation_link).lower() else "webpage"
-                        )
-                        
-                        if chunks > 0:
-                            indexed_count += 1
-                    else:
-                        failed_count += 1
-                        print(f"Failed to fetch content for {tool.name}")
-                
-                except Exception as e:
-                    failed_count += 1
-                    print(f"Error indexing {tool.name}: {e}")
-            
-            print(f"Reindex complete: {indexed_count} tools indexed, {failed_count} failed")
-            
-        except Exception as e:
-            print(f"Error during reindex: {e}")
-    
-    # Add to background tasks
-    background_tasks.add_task(reindex_task)
+    all_tools = await storage.get_all_tools()
+    
+    batch_id = str(uuid.uuid4())
+    queued = 0
+    for tool in all_tools:
+        if tool.documentation_link:
+            await index_jobs.enqueue(tool.id, tool.name, str(tool.documentation_link), batch_id=batch_id)
+            queued += 1
     
     return IndexResponse(
-        message="Started reindexing all tool documentation. This may take several minutes."
+        message=f"Queued reindexing of {queued} tools' documentation. This may take several minutes.",
+        batch_id=batch_id,
+        jobs_queued=queued
     )
 
 
@@ -243,18 +435,23 @@ async def delete_tool_documentation(tool_id: str):
     """
     🗑️ Delete indexed documentation for a tool
     
-    Removes all document chunks for a specific tool from the search index.
+    Removes all document chunks for a specific tool from the search index,
+    and drops its pending indexing job, if any.
     
     **Use cases:**
     - Tool is being deleted
     - Documentation URL changed (delete then reindex)
     - Cleaning up old data
     """
-    tool = await storage.get_tool(tool_id)
+    tool = await storage.get_tool_by_id(tool_id)
     if not tool:
         raise HTTPException(status_code=404, detail=f"Tool {tool_id} not found")
     
-    success = rag_service.delete_tool_documents(tool_id)
+    await index_jobs.cancel_pending(tool_id)
+    try:
+        success = await doc_index_writer.delete_tool_documents(tool_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
     if success:
         return IndexResponse(
@@ -268,6 +465,48 @@ async def delete_tool_documentation(tool_id: str):
         )
 
 
+class IndexJob(BaseModel):
+    """Doc indexing job"""
+    id: str
+    tool_id: str
+    tool_name: str
+    doc_url: str
+    batch_id: Optional[str] = None
+    status: str  # pending, running, succeeded, failed
+    attempts: int
+    max_attempts: int
+    run_after: Optional[str] = None  # Next attempt (pending jobs)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    chunks_indexed: Optional[int] = None
+    last_error: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+
+class IndexJobsResponse(BaseModel):
+    """Indexing progress"""
+    counts: Dict[str, int]  # Jobs per status, plus total
+    jobs: List[IndexJob]
+
+
+@router.get("/index-jobs", response_model=IndexJobsResponse)
+async def get_index_jobs(
+    batch_id: Optional[str] = Query(None, description="Only the jobs of one reindex-all"),
+    status: Optional[str] = Query(None, description="Only list jobs with this status"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of jobs listed")
+):
+    """
+    📋 Doc indexing jobs and progress
+    
+    Returns job counts per status (pending, running, succeeded, failed)
+    and the most recent jobs with their attempts and last error.
+    Pass the `batch_id` returned by `/api/reindex-all-docs` to follow one
+    reindex.
+    """
+    return IndexJobsResponse(**await index_jobs.get_status(batch_id=batch_id, status=status, limit=limit))
+
+
 @router.get("/doc-stats", response_model=StatsResponse)
 async def get_documentation_stats():
     """
@@ -280,10 +519,79 @@ async def get_documentation_stats():
     - Checking if indexing is complete
     - Debugging
     """
-    stats = rag_service.get_stats()
+    # The first call may open the vector store and load the model: keep it off the event loop
+    stats = await asyncio.to_thread(rag_service.get_stats)
     
     return StatsResponse(
         total_chunks=stats.get("total_chunks", 0),
         total_tools=stats.get("total_tools", 0),
-        model_dimension=stats.get("model", 384)
+        model_dimension=stats.get("model", 384),
+        tool_chunks=stats.get("tool_chunks", {})
     )
+
+
+class SnapshotResponse(BaseModel):
+    """Doc index snapshot manifest"""
+    model: str
+    dimension: int
+    index_version: str
+    chunks: int
+    tools: int
+    created_at: str
+
+
+@router.get("/doc-index/snapshot")
+async def download_index_snapshot(current_user: User = Depends(get_current_user)):
+    """
+    📦 Export the document index as one compressed snapshot file (Admin only)
+    
+    Contains vectors, chunk text, metadata and the embedding model id.
+    Import it on a new node with `POST /api/doc-index/snapshot` or
+    `python -m app.services.index_snapshot import <file>` instead of
+    running `/api/reindex-all-docs` there.
+    """
+    require_admin(current_user)
+    
+    fd, path = tempfile.mkstemp(suffix=".npz")
+    os.close(fd)
+    try:
+        manifest = await asyncio.to_thread(export_snapshot, rag_service, path)
+    except Exception as e:
+        os.remove(path)
+        raise HTTPException(status_code=500, detail=f"Snapshot export failed: {e}")
+    
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=f"doc_index_{manifest['index_version'][:12]}.npz",
+        background=BackgroundTask(os.remove, path)
+    )
+
+
+@router.post("/doc-index/snapshot", response_model=SnapshotResponse)
+async def upload_index_snapshot(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    📥 Replace the document index with an uploaded snapshot (Admin only)
+    
+    Send the file from `GET /api/doc-index/snapshot` as the raw request body
+    (`curl --data-binary @doc_index.npz -H "Content-Type: application/octet-stream"`).
+    The snapshot is loaded next to the live index and swapped in atomically;
+    it must have been built with this node's embedding model.
+    """
+    require_admin(current_user)
+    
+    # Next to the index, so the index writer process can read it too
+    fd, path = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(rag_service.db_path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for block in request.stream():
+                f.write(block)
+        manifest = await doc_index_writer.import_snapshot(path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    finally:
+        os.remove(path)
+    
+    return SnapshotResponse(**{field: manifest[field] for field in SnapshotResponse.model_fields})
@@ -5,26 +5,20 @@ from fastapi import APIRouter, Query
 from typing import List, Optional
 from app.models.tool import Tool
 from app.services.storage import storage
+from app.services.result_cache import search_cache
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[Tool])
-async def search_tools(
-    q: Optional[str] = Query(None, description="Search query"),
-    tags: Optional[str] = Query(None, description="Comma-separated tags to filter by")
-):
-    """
-    Search tools with intelligent filtering
-    - Search by name, description
-    - Filter by tags
-    - Future: NLP/AI semantic search
-    """
-    all_tools = await storage.get_all_tools()
-    
+def keyword_search_key(q: Optional[str], tag_list: Optional[List[str]], catalog_version: str):
+    """Cache key of a keyword search (substring matching is whitespace-sensitive, so only case is normalized)"""
+    return search_cache.make_key("search", q.lower() if q else None, {"tags": tag_list}, catalog_version, normalize=False)
+
+
+def filter_tools(all_tools: List[Tool], q: Optional[str], tag_list: Optional[List[str]]) -> List[Tool]:
+    """Tools with any of the tags whose name, description or tags contain q"""
     # Filter by tags
-    if tags:
-        tag_list = [t.strip().lower() for t in tags.split(",")]
+    if tag_list:
         all_tools = [
             tool for tool in all_tools
             if any(tag.lower() in [t.lower() for t in tool.tags] for tag in tag_list)
@@ -39,10 +33,43 @@ async def search_tools(
                 query_lower in tool.description.lower() or
                 any(query_lower in tag.lower() for tag in tool.tags))
         ]
+    return all_tools
+
+
+@router.get("", response_model=List[Tool])
+async def search_tools(
+    q: Optional[str] = Query(None, description="Search query"),
+    tags: Optional[str] = Query(None, description="Comma-separated tags to filter by")
+):
+    """
+    Search tools with intelligent filtering
+    - Search by name, description
+    - Filter by tags
+    - Future: NLP/AI semantic search
+    """
+    tag_list = sorted({t.strip().lower() for t in tags.split(",")}) if tags else None
+    
+    # Serve repeated queries from cache until the catalog changes
+    cache_key = keyword_search_key(q, tag_list, await storage.get_catalog_version())
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    all_tools = filter_tools(await storage.get_all_tools(), q, tag_list)
     
+    search_cache.set(cache_key, all_tools)
     return all_tools
 
 
+@router.get("/cache-stats")
+async def get_search_cache_stats():
+    """
+    Hit ratios of the search result cache
+    (shared by /api/search, /api/ai-search, /api/doc-search and /api/unified-search)
+    """
+    return search_cache.stats()
+
+
 @router.get("/suggest")
 async def suggest_tools(q: str = Query(..., description="Query for suggestions")):
     """
@@ -1,13 +1,12 @@
 """
 Tools CRUD endpoints
 """
-from fastapi import APIRouter, HTTPException, status, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status, Depends
 from typing import List
 from app.models.tool import Tool, ToolCreate, ToolUpdate
 from app.services.storage import storage
 from app.core.auth import User, get_current_user, require_admin
-from app.services.document_rag import rag_service
-from app.services.document_crawler import DocumentCrawler
+from app.services.index_jobs import index_jobs
 
 router = APIRouter()
 
@@ -33,32 +32,19 @@ async def get_tool(tool_id: str):
 @router.post("", response_model=Tool, status_code=status.HTTP_201_CREATED)
 async def create_tool(
     tool: ToolCreate,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """Create new tool (Admin only) - automatically indexes documentation"""
     require_admin(current_user)
     new_tool = await storage.create_tool(tool)
     
-    # Auto-index documentation in background
+    # Auto-index documentation (durable job, retried on failure)
     if new_tool.documentation_link:
-        async def index_docs():
-            try:
-                crawler = DocumentCrawler()
-                content = await crawler.fetch_url(new_tool.documentation_link)
-                if content:
-                    rag_service.index_document(
-                        tool_id=new_tool.id,
-                        tool_name=new_tool.name,
-                        doc_url=new_tool.documentation_link,
-                        content=content,
-                        doc_type="webpage"
-                    )
-                    print(f"✅ Auto-indexed docs for new tool: {new_tool.name}")
-            except Exception as e:
-                print(f"⚠️ Failed to auto-index docs for {new_tool.name}: {e}")
-        
-        background_tasks.add_task(index_docs)
+        try:
+            await index_jobs.enqueue(new_tool.id, new_tool.name, str(new_tool.documentation_link))
+            print(f"✅ Queued doc indexing for new tool: {new_tool.name}")
+        except Exception as e:
+            print(f"⚠️ Failed to queue doc indexing for {new_tool.name}: {e}")
     
     return new_tool
 
@@ -67,7 +53,6 @@ async def create_tool(
 async def update_tool(
     tool_id: str, 
     tool: ToolUpdate,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """Update existing tool (Admin only) - re-indexes documentation if link changed"""
@@ -79,29 +64,14 @@ async def update_tool(
             detail=f"Tool with id {tool_id} not found"
         )
     
-    # Re-index documentation if link was updated
+    # Re-index documentation if link was updated; the old page's chunks are
+    # removed once the new one is indexed
     if tool.documentation_link:
-        async def reindex_docs():
-            try:
-                # Delete old docs first
-                rag_service.delete_tool_documents(tool_id)
-                
-                # Index new docs
-                crawler = DocumentCrawler()
-                content = await crawler.fetch_url(tool.documentation_link)
-                if content:
-                    rag_service.index_document(
-                        tool_id=updated_tool.id,
-                        tool_name=updated_tool.name,
-                        doc_url=tool.documentation_link,
-                        content=content,
-                        doc_type="webpage"
-                    )
-                    print(f"✅ Re-indexed docs for updated tool: {updated_tool.name}")
-            except Exception as e:
-                print(f"⚠️ Failed to re-index docs for {updated_tool.name}: {e}")
-        
-        background_tasks.add_task(reindex_docs)
+        try:
+            await index_jobs.enqueue(updated_tool.id, updated_tool.name, str(tool.documentation_link))
+            print(f"✅ Queued doc re-indexing for updated tool: {updated_tool.name}")
+        except Exception as e:
+            print(f"⚠️ Failed to queue doc re-indexing for {updated_tool.name}: {e}")
     
     return updated_tool
 
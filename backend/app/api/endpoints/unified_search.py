@@ -0,0 +1,193 @@
+"""
+Unified search endpoint - keyword, AI and document search in one request
+"""
+import asyncio
+import time
+from typing import Dict, List, Literal, Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.models.tool import Tool
+from app.api.endpoints.ai_search import AISearchResponse, AISearchResult, ai_search_key, to_ai_result
+from app.api.endpoints.doc_search import (
+    DocumentSearchResponse, DocumentSearchResult, doc_search_cache_key, resolve_tool_scope, split_param,
+    to_search_result
+)
+from app.api.endpoints.search import filter_tools, keyword_search_key
+from app.services.ai_search import ai_search_service
+from app.services.document_rag import rag_service
+from app.services.embedding import embedding_service
+from app.services.result_cache import search_cache
+from app.services.storage import storage
+
+router = APIRouter()
+
+SOURCES = ("keyword", "semantic", "docs")
+
+
+class UnifiedSearchResponse(BaseModel):
+    """Results of each search source; sources that missed the budget are empty"""
+    query: str
+    keyword: List[Tool]  # Same as /api/search (first `limit` matches)
+    semantic: List[AISearchResult]  # Same as /api/ai-search
+    docs: List[DocumentSearchResult]  # Same as /api/doc-search
+    timed_out: List[str]  # Sources still running when the budget ran out
+    failed: Dict[str, str]  # Source -> error
+    took_ms: float
+
+
+@router.get("/unified-search", response_model=UnifiedSearchResponse)
+async def unified_search(
+    q: str = Query(..., description="Search query in natural language", min_length=2),
+    limit: int = Query(10, ge=1, le=50, description="Max number of results per source"),
+    tags: Optional[str] = Query(None, description="Comma-separated tags to filter every source by"),
+    mode: Literal["semantic", "hybrid"] = Query("semantic", description="AI tool search mode"),
+    min_score: float = Query(0.3, ge=0.0, le=1.0, description="Minimum document relevance score"),
+    sources: Optional[str] = Query(None, description="Comma-separated subset of keyword,semantic,docs"),
+    budget_ms: int = Query(
+        settings.UNIFIED_SEARCH_BUDGET_MS, ge=50, le=10000, description="Total latency budget"
+    )
+):
+    """
+    🔍 Keyword, AI tool and documentation search in one round trip
+
+    The sources run concurrently from one catalog snapshot and share the
+    query embedding (when the tool and doc models are the same). Whatever has
+    finished when `budget_ms` runs out is returned, grouped by source; the
+    others are listed in `timed_out`. Document snippets fall back to
+    extraction rather than LLM summaries near the deadline.
+
+    Each source is cached like its own endpoint, so a repeated query is
+    answered from cache. Document results are only written to the cache when
+    LLM summaries are off, since the budget may have degraded them.
+    """
+    start = time.monotonic()
+    deadline = start + budget_ms / 1000
+    tag_list = split_param(tags, lower=True)
+    requested = split_param(sources, lower=True) or list(SOURCES)
+    unknown = [source for source in requested if source not in SOURCES]
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown sources: {', '.join(unknown)} (expected {', '.join(SOURCES)})"
+        )
+    wanted = [source for source in SOURCES if source in requested]
+
+    # One catalog snapshot for every source
+    catalog_version = await storage.get_catalog_version()
+    tools_task: Optional[asyncio.Future] = None
+
+    async def get_tools() -> List[Tool]:
+        nonlocal tools_task
+        # The task, not its result, is shared so concurrent sources load the catalog once
+        if tools_task is None:
+            tools_task = asyncio.ensure_future(storage.get_all_tools())
+        return await asyncio.shield(tools_task)
+
+    # One query embedding per model, shared by the sources using it
+    embeddings: Dict[str, asyncio.Task] = {}
+
+    async def query_embedding(model_name: str) -> np.ndarray:
+        if model_name not in embeddings:
+            embeddings[model_name] = asyncio.ensure_future(embedding_service.encode_query(model_name, q))
+        # Shielded: a source giving up must not cancel the encode for the others
+        return await asyncio.shield(embeddings[model_name])
+
+    async def keyword() -> List[Tool]:
+        cache_key = keyword_search_key(q, tag_list, catalog_version)
+        matches = search_cache.get(cache_key)
+        if matches is None:
+            matches = filter_tools(await get_tools(), q, tag_list)
+            search_cache.set(cache_key, matches)
+        return matches[:limit]
+
+    async def semantic() -> List[AISearchResult]:
+        cache_key = ai_search_key(q, limit, mode, tag_list, catalog_version)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return cached.results
+
+        tools = await get_tools()
+        snapshot = await ai_search_service.get_snapshot(tools, catalog_version)
+        search_results = await ai_search_service.search_async(
+            query=q,
+            tools=tools,
+            top_k=limit,
+            min_score=0.1,
+            mode=mode,
+            tags=tag_list,
+            snapshot=snapshot,
+            query_embedding=await query_embedding(ai_search_service.model_name)
+        )
+        results = [to_ai_result(tool, score) for tool, score in search_results]
+        if snapshot.version == catalog_version:
+            search_cache.set(cache_key, AISearchResponse(query=q, results=results, total=len(results)))
+        return results
+
+    async def docs() -> List[DocumentSearchResult]:
+        cache_key = await doc_search_cache_key(q, limit, min_score, None, tag_list, None, catalog_version)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return cached.results
+
+        scope = await resolve_tool_scope(None, tag_list, await get_tools() if tag_list else None)
+        if scope is not None and not scope:
+            return []
+
+        if not rag_service.is_ready:
+            await asyncio.to_thread(rag_service.initialize)
+        results = await rag_service.search_async(
+            query=q,
+            top_k=limit,
+            min_score=min_score,
+            tool_ids=scope,
+            query_embedding=await query_embedding(rag_service.model_name),
+            summary_deadline=deadline
+        )
+        formatted_results = [to_search_result(result) for result in results]
+        # With LLM summaries the budget may have cut them short; /api/doc-search must not serve those
+        if not rag_service.use_llm_summary:
+            search_cache.set(
+                cache_key, DocumentSearchResponse(query=q, results=formatted_results, total=len(formatted_results))
+            )
+        return formatted_results
+
+    runners = {"keyword": keyword, "semantic": semantic, "docs": docs}
+    tasks = {asyncio.ensure_future(runners[source]()): source for source in wanted}
+    done, pending = set(), set()
+    if tasks:  # asyncio.wait rejects an empty set
+        done, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+
+    # Work already handed to a thread finishes in the background; its result is dropped
+    for task in pending:
+        task.cancel()
+    for task in embeddings.values():
+        task.cancel()
+    if tools_task is not None:
+        tools_task.cancel()
+
+    results: Dict[str, list] = {source: [] for source in SOURCES}
+    failed: Dict[str, str] = {}
+    for task in done:
+        source = tasks[task]
+        if task.exception() is not None:
+            print(f"⚠️ Unified search: {source} failed: {task.exception()}")
+            failed[source] = str(task.exception())
+        else:
+            results[source] = task.result()
+
+    timed_out = [tasks[task] for task in pending]
+    if timed_out:
+        print(f"⚠️ Unified search: {', '.join(timed_out)} missed the {budget_ms}ms budget for '{q}'")
+
+    return UnifiedSearchResponse(
+        query=q,
+        keyword=results["keyword"],
+        semantic=results["semantic"],
+        docs=results["docs"],
+        timed_out=sorted(timed_out, key=SOURCES.index),
+        failed=failed,
+        took_ms=round((time.monotonic() - start) * 1000, 1)
+    )
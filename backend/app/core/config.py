@@ -55,6 +55,75 @@ class Settings(BaseSettings):
     CONFLUENCE_EMAIL: str = ""  # Your Confluence email
     CONFLUENCE_API_TOKEN: str = ""  # Confluence API token
     
+    # Doc crawler (pooled async HTTP client)
+    CRAWLER_MAX_CONNECTIONS: int = 32  # Pages fetched at once, over all hosts
+    CRAWLER_MAX_PER_HOST: int = 4  # Pages fetched at once from one host (be polite)
+    CRAWLER_TIMEOUT_SECONDS: float = 30
+    
+    # Startup: load models and open the vector store in the background after boot
+    WARMUP_MODELS: bool = True
+    
+    # Query encoding (micro-batching of concurrent search requests)
+    QUERY_BATCH_MAX_SIZE: int = 32  # Max queries encoded in one model call
+    QUERY_BATCH_MAX_WAIT_MS: float = 5.0  # How long to wait for more queries
+    SEARCH_BATCH_MAX_QUERIES: int = 32  # Queries per POST /api/ai-search/batch or /api/doc-search/batch
+    
+    # Embedding models (set both to the same model to load it only once;
+    # changing DOC_EMBEDDING_MODEL requires re-indexing the documents)
+    TOOL_EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    DOC_EMBEDDING_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    EMBEDDING_BATCH_SIZE: int = 32  # Batch size when encoding documents
+    EMBEDDING_DEVICE: str = ""  # e.g. "cpu" or "cuda"; empty = auto-detect (torch backend)
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024  # Recent query embeddings kept in memory
+    EMBEDDING_CACHE_PATH: str = "data/embedding_cache.sqlite3"  # Chunk embeddings by (model, sha256)
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 100000  # LRU-evicted beyond this; 0 disables
+    
+    # Document chunking
+    DOC_CHUNK_MAX_TOKENS: int = 0  # Tokens per chunk; 0 = the doc model's input limit
+    DOC_CHUNK_OVERLAP_TOKENS: int = 16  # Tokens repeated between consecutive chunks
+    DOC_SNIPPET_EMBEDDINGS: bool = False  # Embed sentences at index time; snippets by similarity
+    
+    # Doc index vector store: "chroma" (HNSW, data/chroma_db) or "numpy" (exact, memory-mapped, data/vector_store)
+    VECTOR_STORE_BACKEND: str = "chroma"
+    
+    # Doc index HNSW graph (0 = Chroma default); M and construction_ef apply when the index is built
+    DOC_HNSW_M: int = 0  # Links per node: higher = better recall, more memory
+    DOC_HNSW_CONSTRUCTION_EF: int = 0  # Build-time candidate list: higher = better graph, slower indexing
+    DOC_HNSW_SEARCH_EF: int = 0  # Query-time candidate list: higher = better recall, slower queries
+    
+    # LLM summaries for doc search results (distilbart, ~600MB)
+    DOC_LLM_SUMMARY: bool = False
+    LLM_SUMMARY_BATCH_SIZE: int = 8  # Hits summarized per pipeline call
+    LLM_SUMMARY_CACHE_SIZE: int = 1024  # Summaries kept by (chunk id, query)
+    LLM_SUMMARY_DEADLINE_MS: int = 1500  # Remaining hits fall back to extracted snippets; 0 = no limit
+    
+    # Search result cache (keyed by catalog / doc index version)
+    SEARCH_CACHE_MAX_ENTRIES: int = 2048  # 0 disables the cache
+
+    # Unified search (GET /api/unified-search)
+    UNIFIED_SEARCH_BUDGET_MS: int = 800  # Default latency budget; sources still running are left out
+    
+    # Embedding inference backend
+    EMBEDDING_BACKEND: str = "torch"  # "torch" or "onnx" (ONNX Runtime, CPU)
+    EMBEDDING_ONNX_QUANTIZE: bool = False  # Dynamic int8 quantization for the onnx backend
+    EMBEDDING_ONNX_DIR: str = "data/onnx"  # Where exported ONNX models are cached
+    EMBEDDING_NUM_THREADS: int = 0  # Intra-op threads for inference (0 = library default)
+    
+    # Shared model server (python -m app.services.model_server)
+    MODEL_SERVER_SOCKET: str = ""  # e.g. data/model_server.sock; empty = load models in-process
+    MODEL_SERVER_PRELOAD: str = ""  # Comma-separated models; empty = the tool and doc models
+    
+    # Doc index writer process (python -m app.services.index_writer)
+    INDEX_WRITER_SOCKET: str = ""  # e.g. data/index_writer.sock; empty = workers write the index in-process
+    
+    # Doc indexing jobs (index_jobs table; run by the index writer, or the API without one)
+    INDEX_JOB_CONCURRENCY: int = 16  # Jobs in flight: pages are fetched concurrently, indexed one at a time
+    INDEX_JOB_MAX_ATTEMPTS: int = 5
+    INDEX_JOB_RETRY_BASE_SECONDS: float = 30  # Backoff after attempt n: base * 2^(n-1), capped at 1h
+    INDEX_JOB_POLL_SECONDS: float = 5  # How often the runner looks for jobs queued by other processes
+    INDEX_JOB_LEASE_SECONDS: int = 900  # A running job not renewed for this long is retried (its runner died)
+    INDEX_JOB_RETENTION_DAYS: int = 7  # Finished jobs kept for GET /api/index-jobs
+    
     class Config:
         env_file = ".env"
 
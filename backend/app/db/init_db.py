@@ -3,7 +3,7 @@ Database initialization script
 """
 import asyncio
 from app.db.base import engine, Base
-from app.db.models import ToolDB
+from app.db.models import ToolDB, IndexJobDB
 
 
 async def init_db():
@@ -1,7 +1,7 @@
 """
 Database models
 """
-from sqlalchemy import Column, String, Text, DateTime, JSON
+from sqlalchemy import Column, String, Text, DateTime, Integer, JSON, Index, text
 from sqlalchemy.sql import func
 from app.db.base import Base
 import uuid
@@ -39,3 +39,53 @@ class ToolDB(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
+
+
+class IndexJobDB(Base):
+    """Doc indexing job: fetch a tool's documentation and index it (see services/index_jobs.py)"""
+    __tablename__ = "index_jobs"
+    __table_args__ = (
+        # At most one pending job per tool: new requests are merged into it
+        Index(
+            "uq_index_jobs_pending_tool", "tool_id", unique=True,
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+        Index("ix_index_jobs_status_run_after", "status", "run_after"),
+    )
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    tool_id = Column(String(36), nullable=False, index=True)
+    tool_name = Column(String(255), nullable=False)
+    doc_url = Column(String(500), nullable=False)
+    batch_id = Column(String(36), nullable=True, index=True)  # Groups the jobs of one reindex-all
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # Next attempt (backoff)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    chunks_indexed = Column(Integer, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    
+    def to_dict(self):
+        """Convert to dictionary for API response"""
+        return {
+            "id": self.id,
+            "tool_id": self.tool_id,
+            "tool_name": self.tool_name,
+            "doc_url": self.doc_url,
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "run_after": self.run_after.isoformat() if self.run_after else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "chunks_indexed": self.chunks_indexed,
+            "last_error": self.last_error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
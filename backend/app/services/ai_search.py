@@ -1,94 +1,416 @@
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Tuple
+
 import numpy as np
-from typing import List, Optional
-from sentence_transformers import SentenceTransformer
 from app.models.tool import Tool
+from app.services.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from app.services.embedding import embedding_service
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """
+    Immutable search index over one version of the tool catalog
 
-# Use lightweight model (only 80MB)
-# Supports 100+ languages including English and Chinese
-MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+    Built off the request path and published by swapping a single reference,
+    so a reader holding a snapshot never sees a partially rebuilt index.
+    """
+    version: Optional[str]
+    tools: Tuple[Tool, ...]
+    embeddings: np.ndarray          # (n_tools, dim), read-only
+    norms: np.ndarray               # (n_tools,), read-only
+    tag_rows: Mapping[str, np.ndarray] = field(default_factory=dict)  # lowercase tag -> bool bitmap
+    bm25: BM25Index = field(default_factory=BM25Index)
+    tools_by_id: Mapping[str, Tool] = field(default_factory=dict)
+
+    def rows_for_tags(self, tags: Optional[List[str]]) -> np.ndarray:
+        """Row indices of tools having any of the tags (all rows if no tags)"""
+        if not tags:
+            return np.arange(len(self.tools))
+        mask = np.zeros(len(self.tools), dtype=bool)
+        for tag in tags:
+            bitmap = self.tag_rows.get(tag.lower())
+            if bitmap is not None:
+                mask |= bitmap
+        return np.flatnonzero(mask)
 
 
 class AISearchService:
-    """Semantic search using vector embeddings"""
-    
+    """Semantic search using vector embeddings, optionally fused with BM25"""
+
     def __init__(self):
-        self.model: Optional[SentenceTransformer] = None
-        self.embeddings: Optional[np.ndarray] = None
-        self.tools: List[Tool] = []
-        
+        # Current published snapshot; replaced atomically, never mutated
+        self._snapshot: Optional[IndexSnapshot] = None
+
+        # Builder-only state (guarded by _build_lock): reused between builds so
+        # only new or changed tools are re-encoded
+        self._build_lock = threading.Lock()
+        self._encoded: Dict[str, Tuple[str, np.ndarray]] = {}  # tool id -> (text, embedding)
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    @property
+    def model_name(self) -> str:
+        """Embedding model (lightweight all-MiniLM-L6-v2 unless configured otherwise)"""
+        return embedding_service.tool_model
+
+    @property
+    def is_ready(self) -> bool:
+        """True once the embedding model is loaded"""
+        return embedding_service.is_loaded(self.model_name)
+
+    @property
+    def snapshot(self) -> Optional[IndexSnapshot]:
+        """Currently published snapshot (None before the first build)"""
+        return self._snapshot
+
     def initialize(self):
-        """Load the model (called on first search)"""
-        if self.model is None:
-            print("Loading AI search model (first time only)...")
-            self.model = SentenceTransformer(MODEL_NAME)
-            print("AI search model loaded successfully")
-    
-    def update_embeddings(self, tools: List[Tool]):
-        """Generate embeddings for all tools"""
+        """Load the model (called on first search or by the startup warm-up)"""
+        embedding_service.get_model(self.model_name)
+
+    @staticmethod
+    def _is_current(snapshot: Optional[IndexSnapshot], tools: List[Tool], version: Optional[str]) -> bool:
+        """Whether a snapshot was built from this catalog version (or these tools)"""
+        if snapshot is None:
+            return False
+        if version is not None and snapshot.version is not None:
+            return snapshot.version == version
+        return len(tools) == len(snapshot.tools) and tuple(tools) == snapshot.tools
+
+    @staticmethod
+    def _embedding_text(tool: Tool) -> str:
+        """Text used for the tool's embedding (name, description, keywords)"""
+        text = f"{tool.name} {tool.description}"
+        if tool.keywords:
+            text += " " + tool.keywords
+        return text
+
+    @staticmethod
+    def _lexical_tokens(tool: Tool) -> List[str]:
+        """BM25 tokens; name and tags count double so exact hits on them rank first"""
+        return (
+            tokenize(tool.name) * 2
+            + tokenize(" ".join(tool.tags)) * 2
+            + tokenize(tool.keywords or "")
+            + tokenize(tool.description)
+        )
+
+    def build_snapshot(self, tools: List[Tool], version: Optional[str] = None) -> IndexSnapshot:
+        """
+        Build and publish a new index snapshot for the given tools
+
+        Only new or changed tools are re-encoded or re-tokenized; the BM25
+        index of the previous snapshot is copied, never modified in place.
+
+        Args:
+            tools: Current tool catalog
+            version: Catalog version the tools were read at
+
+        Returns:
+            The published snapshot
+        """
         self.initialize()
-        self.tools = tools
-        
-        if not tools:
-            self.embeddings = np.array([])
+
+        with self._build_lock:
+            previous = self._snapshot
+
+            # Another build already published this version while we waited
+            if self._is_current(previous, tools, version):
+                return previous
+
+            previous_by_id = previous.tools_by_id if previous else {}
+            bm25 = previous.bm25.copy() if previous else BM25Index()
+
+            # Drop tools that no longer exist
+            current_ids = {tool.id for tool in tools}
+            for tool_id in [tool_id for tool_id in previous_by_id if tool_id not in current_ids]:
+                bm25.remove(tool_id)
+            for tool_id in [tool_id for tool_id in self._encoded if tool_id not in current_ids]:
+                del self._encoded[tool_id]
+
+            # Re-index changed tools; re-encode only when the embedded text changed
+            to_encode = []
+            for tool in tools:
+                if previous_by_id.get(tool.id) != tool:
+                    bm25.add(tool.id, self._lexical_tokens(tool))
+                text = self._embedding_text(tool)
+                if tool.id not in self._encoded or self._encoded[tool.id][0] != text:
+                    to_encode.append((tool.id, text))
+
+            if to_encode:
+                vectors = embedding_service.encode(self.model_name, [text for _, text in to_encode])
+                for (tool_id, text), vector in zip(to_encode, vectors):
+                    self._encoded[tool_id] = (text, vector)
+
+            if tools:
+                embeddings = np.stack([self._encoded[tool.id][1] for tool in tools])
+            else:
+                embeddings = np.zeros((0, embedding_service.dimension(self.model_name)), dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1)
+
+            tag_rows: Dict[str, np.ndarray] = {}
+            for row, tool in enumerate(tools):
+                for tag in tool.tags:
+                    bitmap = tag_rows.setdefault(tag.lower(), np.zeros(len(tools), dtype=bool))
+                    bitmap[row] = True
+
+            for array in (embeddings, norms, *tag_rows.values()):
+                array.flags.writeable = False
+
+            snapshot = IndexSnapshot(
+                version=version,
+                tools=tuple(tools),
+                embeddings=embeddings,
+                norms=norms,
+                tag_rows=tag_rows,
+                bm25=bm25,
+                tools_by_id={tool.id: tool for tool in tools}
+            )
+
+            # Publish: a single reference assignment is atomic for readers
+            self._snapshot = snapshot
+            return snapshot
+
+    def schedule_rebuild(self, tools: List[Tool], version: Optional[str] = None):
+        """Rebuild the snapshot on a worker thread unless a rebuild is already running"""
+        if self._rebuild_task is not None and not self._rebuild_task.done():
             return
-        
-        # Combine tool information into searchable text
-        texts = []
-        for tool in tools:
-            # Use name, description, and keywords for AI search
-            text = f"{tool.name} {tool.description}"
-            if tool.keywords:
-                text += " " + tool.keywords
-            texts.append(text)
-        
-        # Generate embeddings
-        self.embeddings = self.model.encode(texts, show_progress_bar=False)
+        self._rebuild_task = asyncio.get_running_loop().create_task(
+            self._rebuild_in_background(tools, version)
+        )
     
+    async def _rebuild_in_background(self, tools: List[Tool], version: Optional[str]):
+        try:
+            await asyncio.to_thread(self.build_snapshot, tools, version)
+        except Exception as e:
+            print(f"⚠️ AI search index rebuild failed: {e}")
+
+    async def get_snapshot(self, tools: List[Tool], version: Optional[str] = None) -> IndexSnapshot:
+        """
+        Snapshot to serve a request from
+
+        Only the very first build is awaited. Later catalog changes are
+        picked up by a background rebuild, and requests keep using the
+        previous snapshot until the new one is published.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await asyncio.to_thread(self.build_snapshot, tools, version)
+        if not self._is_current(snapshot, tools, version):
+            self.schedule_rebuild(tools, version)
+        return snapshot
+
     def search(
-        self, 
-        query: str, 
-        tools: List[Tool], 
+        self,
+        query: str,
+        tools: List[Tool],
         top_k: int = 6,
-        min_score: float = 0.1
+        min_score: float = 0.1,
+        query_embedding: Optional[np.ndarray] = None,
+        mode: str = "semantic",
+        tags: Optional[List[str]] = None,
+        snapshot: Optional[IndexSnapshot] = None
     ) -> List[tuple[Tool, float]]:
         """
         Semantic search for tools
-        
+
         Args:
             query: Search query in natural language
             tools: List of tools to search from
             top_k: Number of results to return
             min_score: Minimum similarity score (0-1)
-            
+            query_embedding: Pre-computed query embedding (skips encoding)
+            mode: "semantic" (vectors only) or "hybrid" (vectors + BM25, fused with RRF)
+            tags: Only score tools having any of these tags (case-insensitive)
+            snapshot: Index snapshot to search (built synchronously from tools if omitted)
+
         Returns:
             List of (tool, score) tuples sorted by relevance
         """
-        self.initialize()
-        
-        # Update embeddings if tools changed
-        if len(tools) != len(self.tools) or tools != self.tools:
-            self.update_embeddings(tools)
-        
-        if not tools or self.embeddings.size == 0:
-            return []
-        
-        # Encode query
-        query_embedding = self.model.encode([query], show_progress_bar=False)[0]
-        
-        # Calculate cosine similarity
-        similarities = np.dot(self.embeddings, query_embedding) / (
-            np.linalg.norm(self.embeddings, axis=1) * np.linalg.norm(query_embedding)
+        if query_embedding is not None:
+            query_embedding = np.asarray(query_embedding)[None, :]
+        return self.search_many(
+            queries=[query],
+            tools=tools,
+            top_k=top_k,
+            min_score=min_score,
+            query_embeddings=query_embedding,
+            mode=mode,
+            tags=tags,
+            snapshot=snapshot
+        )[0]
+
+    def search_many(
+        self,
+        queries: List[str],
+        tools: List[Tool],
+        top_k: int = 6,
+        min_score: float = 0.1,
+        query_embeddings: Optional[np.ndarray] = None,
+        mode: str = "semantic",
+        tags: Optional[List[str]] = None,
+        snapshot: Optional[IndexSnapshot] = None
+    ) -> List[List[tuple[Tool, float]]]:
+        """
+        Semantic search for several queries at once
+
+        All queries are scored with one matrix-matrix product; the other
+        arguments are as for search() and apply to every query.
+
+        Args:
+            queries: Search queries
+            query_embeddings: Pre-computed query embeddings, one row per query
+
+        Returns:
+            One list of (tool, score) tuples per query
+        """
+        if snapshot is None:
+            snapshot = self._snapshot
+            if not self._is_current(snapshot, tools, None):
+                snapshot = self.build_snapshot(tools)
+
+        if not snapshot.tools or not queries:
+            return [[] for _ in queries]
+
+        # Encode queries
+        if query_embeddings is None:
+            query_embeddings = embedding_service.encode_queries(self.model_name, queries)
+
+        # Restrict scoring to the tag partition before computing similarities
+        rows = snapshot.rows_for_tags(tags)
+        if rows.size == 0:
+            return [[] for _ in queries]
+
+        # Calculate cosine similarity (only for candidate rows): (rows, queries)
+        similarities = np.dot(snapshot.embeddings[rows], query_embeddings.T) / (
+            snapshot.norms[rows][:, None] * np.linalg.norm(query_embeddings, axis=1)[None, :]
         )
-        
+
+        return [
+            self._rank(snapshot, query, rows, similarities[:, i], top_k, min_score, mode)
+            for i, query in enumerate(queries)
+        ]
+
+    def _rank(
+        self,
+        snapshot: IndexSnapshot,
+        query: str,
+        rows: np.ndarray,
+        similarities: np.ndarray,
+        top_k: int,
+        min_score: float,
+        mode: str
+    ) -> List[tuple[Tool, float]]:
+        """Results of one query from its similarities to the candidate rows"""
+        if mode == "hybrid":
+            return self._fuse_with_lexical(snapshot, query, rows, similarities, top_k, min_score)
+
         # Get top results above threshold
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        top_positions = self._top_positions(similarities, top_k)
         results = []
-        
-        for idx in top_indices:
-            score = float(similarities[idx])
+
+        for pos in top_positions:
+            score = float(similarities[pos])
             if score >= min_score:
-                results.append((tools[idx], score))
-        
+                results.append((snapshot.tools[rows[pos]], score))
+
         return results
 
+    @staticmethod
+    def _top_positions(scores: np.ndarray, top_k: int) -> np.ndarray:
+        """Indices of the top_k scores, best first (partial sort)"""
+        if top_k < len(scores):
+            candidates = np.argpartition(scores, -top_k)[-top_k:]
+            return candidates[np.argsort(scores[candidates])[::-1]]
+        return np.argsort(scores)[::-1]
+
+    @staticmethod
+    def _fuse_with_lexical(
+        snapshot: IndexSnapshot,
+        query: str,
+        rows: np.ndarray,
+        similarities: np.ndarray,
+        top_k: int,
+        min_score: float
+    ) -> List[tuple[Tool, float]]:
+        """Combine the vector ranking with the BM25 ranking using reciprocal rank fusion"""
+        order = np.argsort(similarities)[::-1]
+        vector_ranking = [snapshot.tools[rows[pos]].id for pos in order if similarities[pos] >= min_score]
+
+        candidates = {snapshot.tools[row].id for row in rows}
+        lexical_ranking = [tool_id for tool_id, _ in snapshot.bm25.search(query) if tool_id in candidates]
+
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking])
+        return [(snapshot.tools_by_id[tool_id], score) for tool_id, score in fused[:top_k]]
+
+    async def search_async(
+        self,
+        query: str,
+        tools: List[Tool],
+        top_k: int = 6,
+        min_score: float = 0.1,
+        mode: str = "semantic",
+        tags: Optional[List[str]] = None,
+        version: Optional[str] = None,
+        snapshot: Optional[IndexSnapshot] = None,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[tuple[Tool, float]]:
+        """
+        Non-blocking semantic search for use inside async handlers
+
+        The query is encoded through the shared micro-batching executor and
+        index rebuilds happen off the request path (see get_snapshot), so the
+        event loop stays responsive under concurrent search load.
+
+        Args:
+            version: Catalog version of tools (cheaper staleness check than comparing tools)
+            snapshot: Snapshot to search (defaults to get_snapshot(tools, version))
+            query_embedding: Pre-computed query embedding (skips encoding)
+        """
+        if snapshot is None:
+            snapshot = await self.get_snapshot(tools, version)
+        if query_embedding is None:
+            query_embedding = await embedding_service.encode_query(self.model_name, query)
+
+        return self.search(
+            query=query,
+            tools=tools,
+            top_k=top_k,
+            min_score=min_score,
+            query_embedding=query_embedding,
+            mode=mode,
+            tags=tags,
+            snapshot=snapshot
+        )
+
+    async def search_many_async(
+        self,
+        queries: List[str],
+        tools: List[Tool],
+        top_k: int = 6,
+        min_score: float = 0.1,
+        mode: str = "semantic",
+        tags: Optional[List[str]] = None,
+        version: Optional[str] = None,
+        snapshot: Optional[IndexSnapshot] = None
+    ) -> List[List[tuple[Tool, float]]]:
+        """
+        Non-blocking search_many(); all queries are encoded in one model call
+        """
+        if snapshot is None:
+            snapshot = await self.get_snapshot(tools, version)
+        query_embeddings = await embedding_service.encode_query_batch(self.model_name, queries)
+
+        return self.search_many(
+            queries=queries,
+            tools=tools,
+            top_k=top_k,
+            min_score=min_score,
+            query_embeddings=query_embeddings,
+            mode=mode,
+            tags=tags,
+            snapshot=snapshot
+        )
+
 ai_search_service = AISearchService()
@@ -0,0 +1,138 @@
+"""
+BM25 Lexical Index
+Small in-memory Okapi BM25 index with incremental add/remove, used next to
+the embedding matrix so exact terms and acronyms ("RMS", "RKV", "HFT") rank
+as well as semantic matches.
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_CJK_RE = re.compile(r"([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+)")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens; CJK runs are split into characters and bigrams
+    since they are written without spaces
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        for part in _CJK_RE.split(word):
+            if not part:
+                continue
+            if _CJK_RE.fullmatch(part):
+                tokens.extend(part)
+                tokens.extend(part[i:i + 2] for i in range(len(part) - 1))
+            else:
+                tokens.append(part)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over a mutable set of documents keyed by id"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> {doc_id: tf}
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    def copy(self) -> "BM25Index":
+        """Independent copy (copy-on-write for published index snapshots)"""
+        clone = BM25Index(self.k1, self.b)
+        clone.postings = {term: dict(docs) for term, docs in self.postings.items()}
+        clone.doc_terms = dict(self.doc_terms)  # Counters are replaced, never mutated
+        clone.doc_lengths = dict(self.doc_lengths)
+        clone.total_length = self.total_length
+        return clone
+
+    def add(self, doc_id: str, tokens: Iterable[str]):
+        """Add or replace a document"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+
+        counts = Counter(tokens)
+        self.doc_terms[doc_id] = counts
+        length = sum(counts.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id: str):
+        """Remove a document (no-op if unknown)"""
+        counts = self.doc_terms.pop(doc_id, None)
+        if counts is None:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        for term in counts:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """
+        Score documents against a query
+
+        Returns:
+            (doc_id, score) pairs with a positive score, best first
+        """
+        n_docs = len(self.doc_lengths)
+        if n_docs == 0:
+            return []
+
+        avg_length = self.total_length / n_docs
+        scores: Dict[str, float] = {}
+
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse several rankings with RRF: score(d) = sum(1 / (k + rank_i(d)))
+
+    Scores are scaled to 0-1, where 1 means ranked first in every list.
+
+    Args:
+        rankings: Lists of ids, best first
+        k: RRF damping constant
+
+    Returns:
+        (id, fused score) pairs, best first
+    """
+    if not rankings:
+        return []
+
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+
+    best_possible = len(rankings) / (k + 1)
+    return sorted(
+        ((doc_id, score / best_possible) for doc_id, score in fused.items()),
+        key=lambda item: item[1],
+        reverse=True
+    )
@@ -0,0 +1,337 @@
+"""
+Document Chunking
+Splits crawled documents into chunks sized for the embedding model.
+
+The token chunker packs paragraphs up to the model's token budget using
+the model's own fast tokenizer, so CJK text is not silently truncated and
+English chunks use the full input window. It consumes paragraphs lazily,
+so a large Confluence page never has to be tokenized in one call.
+"""
+import re
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Very long paragraphs (the crawler collapses whitespace, so a whole page can
+# arrive as one) are tokenized in windows of about this many characters
+SEGMENT_CHARS = 8000
+
+# Special tokens added by the model around every input ([CLS] ... [SEP])
+SPECIAL_TOKENS = 2
+
+# Sentence boundaries: whitespace after . ! ? or directly after a CJK terminator
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+|(?<=[\u3002\uff01\uff1f])")
+
+
+def iter_paragraphs(content: str) -> Iterator[str]:
+    """Yield non-empty, stripped paragraphs separated by blank lines"""
+    start = 0
+    while start < len(content):
+        end = content.find("\n\n", start)
+        if end == -1:
+            end = len(content)
+        paragraph = content[start:end].strip()
+        if paragraph:
+            yield paragraph
+        start = end + 2
+
+
+def iter_segments(paragraph: str, max_chars: int = SEGMENT_CHARS) -> Iterator[str]:
+    """Split a paragraph into pieces of at most max_chars, at whitespace where possible"""
+    while len(paragraph) > max_chars:
+        cut = paragraph.rfind(" ", max_chars // 2, max_chars)
+        if cut == -1:
+            cut = max_chars
+        yield paragraph[:cut]
+        paragraph = paragraph[cut:].lstrip()
+    if paragraph:
+        yield paragraph
+
+
+def sentence_spans(text: str, min_length: int = 11) -> List[Tuple[int, int]]:
+    """
+    Character spans of the sentences in a chunk (stripped, at least min_length chars)
+
+    Computed once at index time and stored with the chunk, so snippets can
+    be selected at query time without re-splitting the text.
+    """
+    spans = []
+    start = 0
+    for match in [*_SENTENCE_BREAK_RE.finditer(text), None]:
+        end = match.start() if match else len(text)
+        sentence = text[start:end]
+        stripped = sentence.strip()
+        if len(stripped) >= min_length:
+            offset = start + len(sentence) - len(sentence.lstrip())
+            spans.append((offset, offset + len(stripped)))
+        if match:
+            start = match.end()
+    return spans
+
+
+# A piece of a chunk is tokens [first, last) of a segment:
+# (segment number, segment text, token spans of the segment, first, last)
+Piece = Tuple[int, str, List[Tuple[int, int]], int, int]
+
+
+def _is_word_char(char: str) -> bool:
+    """Letters and digits of space-separated scripts (CJK characters are words on their own)"""
+    return char.isalnum() and ord(char) < 0x2E80
+
+
+class TokenChunker:
+    """Packs paragraphs into chunks of at most max_tokens model tokens"""
+
+    def __init__(self, tokenizer, max_tokens: int, overlap_tokens: int = 16):
+        """
+        Args:
+            tokenizer: HuggingFace fast tokenizer (must support offset mapping)
+            max_tokens: Token budget per chunk, excluding special tokens
+            overlap_tokens: Tokens repeated from the end of the previous chunk
+        """
+        self.tokenizer = tokenizer
+        self.max_tokens = max(max_tokens, 8)
+        # Overlap must leave room for new content or windows never advance
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+
+    def _token_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Character span of each token in text"""
+        encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        return [(start, end) for start, end in encoded["offset_mapping"] if end > start]
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._token_spans(text))
+
+    @staticmethod
+    def _word_start(segment: str, spans: List[Tuple[int, int]], index: int) -> bool:
+        """Whether token index starts a word, i.e. a window may begin there"""
+        if index == 0 or index >= len(spans):
+            return True
+        previous_end, start = spans[index - 1][1], spans[index][0]
+        return previous_end < start or not (
+            _is_word_char(segment[previous_end - 1]) and _is_word_char(segment[start])
+        )
+
+    def _window_end(self, segment: str, spans: List[Tuple[int, int]], start: int, room: int) -> Optional[int]:
+        """
+        End of the next window: as many tokens as fit, cut where a word starts
+
+        Returns None if not even the first word fits in room.
+        """
+        if room <= 0:
+            return None
+        end = start + room
+        if end >= len(spans):
+            return len(spans)
+        while end > start and not self._word_start(segment, spans, end):
+            end -= 1
+        return end if end > start else None
+
+    @staticmethod
+    def _text(pieces: List[Piece]) -> str:
+        """
+        Chunk text
+
+        Consecutive pieces of one segment are sliced from it in one go, so
+        the original spacing is kept; different segments are joined by a space.
+        """
+        texts = []
+        run: Optional[Piece] = None
+        for piece in pieces:
+            if run is not None and run[0] == piece[0] and run[4] == piece[3]:
+                run = (*run[:4], piece[4])
+                continue
+            if run is not None:
+                texts.append(run[1][run[2][run[3]][0]:run[2][run[4] - 1][1]])
+            run = piece
+        if run is not None:
+            texts.append(run[1][run[2][run[3]][0]:run[2][run[4] - 1][1]])
+        return " ".join(texts)
+
+    def _overlap(self, pieces: List[Piece]) -> List[Piece]:
+        """Trailing overlap_tokens of a finished chunk (from a word start), as the start of the next one"""
+        if self.overlap_tokens == 0 or not pieces:
+            return []
+        number, segment, spans, first, last = pieces[-1]
+        start = max(first, last - self.overlap_tokens)
+        while start < last and not self._word_start(segment, spans, start):
+            start += 1
+        return [(number, segment, spans, start, last)] if start < last else []
+
+    def chunk(self, paragraphs: Iterable[str]) -> Iterator[str]:
+        """
+        Chunk a stream of paragraphs
+
+        Whole paragraphs are kept together when they fit; a paragraph longer
+        than the budget is cut into token windows at word boundaries (inside a
+        word only if it alone exceeds the budget).
+
+        Args:
+            paragraphs: Paragraph texts (any iterable, consumed lazily)
+
+        Yields:
+            Chunk texts
+        """
+        pieces: List[Piece] = []
+        used = 0
+        fresh = 0  # tokens in the current chunk that are not overlap
+        number = 0
+
+        for paragraph in paragraphs:
+            for segment in iter_segments(paragraph):
+                number += 1
+                spans = self._token_spans(segment)
+                start = 0
+                while start < len(spans):
+                    room = self.max_tokens - used
+                    end = self._window_end(segment, spans, start, room)
+                    # Start a new chunk rather than split a paragraph (or word) that fits in one
+                    fits_next = len(spans) <= self.max_tokens - self.overlap_tokens
+                    if fresh and (end is None or (start == 0 and len(spans) > room and fits_next)):
+                        yield self._text(pieces)
+                        pieces = self._overlap(pieces)
+                        used = sum(last - first for *_, first, last in pieces)
+                        fresh = 0
+                        continue
+
+                    if end is None:
+                        end = start + max(room, 1)  # a single word longer than the budget
+                    pieces.append((number, segment, spans, start, end))
+                    used += end - start
+                    fresh += end - start
+                    start = end
+
+        if fresh:
+            yield self._text(pieces)
+
+
+_chunkers: Dict[str, Optional[TokenChunker]] = {}
+_chunkers_lock = threading.Lock()
+
+
+def _max_seq_length(model_name: str, model) -> int:
+    """Input limit the sentence-transformers model truncates at"""
+    length = getattr(model, "max_seq_length", None)
+    if length:
+        return length
+    try:
+        import json
+        from huggingface_hub import hf_hub_download
+
+        with open(hf_hub_download(model_name, "sentence_bert_config.json")) as f:
+            return json.load(f)["max_seq_length"]
+    except Exception:
+        return 128
+
+
+def get_chunker(model_name: str) -> Optional[TokenChunker]:
+    """
+    Token chunker for an embedding model (None if no fast tokenizer is available)
+
+    Reuses the tokenizer of the locally loaded model; when the model runs in
+    the shared model server, the tokenizer is loaded on its own (it is small).
+    """
+    if model_name in _chunkers:
+        return _chunkers[model_name]
+
+    with _chunkers_lock:
+        if model_name not in _chunkers:
+            from app.core.config import settings
+            from app.services.embedding import embedding_service
+
+            chunker = None
+            try:
+                model = embedding_service.get_model(model_name)
+                tokenizer = getattr(model, "tokenizer", None)
+                if tokenizer is None:
+                    from transformers import AutoTokenizer
+                    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+                if getattr(tokenizer, "is_fast", False):
+                    max_tokens = settings.DOC_CHUNK_MAX_TOKENS or (
+                        _max_seq_length(model_name, model) - SPECIAL_TOKENS
+                    )
+                    chunker = TokenChunker(tokenizer, max_tokens, settings.DOC_CHUNK_OVERLAP_TOKENS)
+                    print(f"Token chunker for {model_name}: {chunker.max_tokens} tokens per chunk")
+                else:
+                    print(f"⚠️ No fast tokenizer for {model_name}, chunking by characters")
+            except Exception as e:
+                print(f"⚠️ Could not load tokenizer for {model_name} ({e}), chunking by characters")
+            _chunkers[model_name] = chunker
+        return _chunkers[model_name]
+
+
+def chunk_by_characters(content: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
+    """
+    Split document into overlapping chunks by character count
+
+    Used when no fast tokenizer is available for the embedding model.
+
+    Args:
+        content: Document text
+        chunk_size: Target size of each chunk (characters)
+        overlap: Overlap between chunks (characters)
+
+    Returns:
+        List of text chunks
+    """
+    if not content or not content.strip():
+        return []
+    
+    # Split by paragraphs first
+    paragraphs = content.split('\n\n')
+    
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    
+    for para in paragraphs:
+        para = para.strip()
+        if not para:
+            continue
+        
+        para_length = len(para)
+        
+        # If paragraph itself is too long, split it
+        if para_length > chunk_size:
+            words = para.split()
+            temp_chunk = []
+            temp_length = 0
+            
+            for word in words:
+                temp_chunk.append(word)
+                temp_length += len(word) + 1
+                
+                if temp_length >= chunk_size:
+                    if current_chunk:
+                        chunks.append(' '.join(current_chunk))
+                        current_chunk = []
+                        current_length = 0
+                    
+                    chunks.append(' '.join(temp_chunk))
+                    temp_chunk = []
+                    temp_length = 0
+            
+            if temp_chunk:
+                current_chunk.extend(temp_chunk)
+                current_length += temp_length
+        else:
+            # Add paragraph to current chunk
+            if current_length + para_length > chunk_size and current_chunk:
+                chunks.append(' '.join(current_chunk))
+                # Keep some overlap
+                if overlap > 0 and current_chunk:
+                    overlap_words = ' '.join(current_chunk).split()[-10:]
+                    current_chunk = overlap_words
+                    current_length = sum(len(w) + 1 for w in overlap_words)
+                else:
+                    current_chunk = []
+                    current_length = 0
+            
+            current_chunk.append(para)
+            current_length += para_length + 1
+    
+    # Add remaining chunk
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+    
+    return chunks
@@ -1,32 +1,99 @@
 """
 Document Crawler Service
 Fetches content from various documentation sources (Confluence, README, etc.)
+
+Requests go through one pooled httpx.AsyncClient, bounded by a global and a
+per-host concurrency limit, so many pages can be fetched at once without
+blocking the event loop or hammering a single server.
 """
-import requests
+import asyncio
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import httpx
 from bs4 import BeautifulSoup
-from typing import Optional
-from urllib.parse import urlparse
-import time
 
 
 class DocumentCrawler:
     """Crawl and extract text from documentation sources"""
     
-    def __init__(self, confluence_token: Optional[str] = None, confluence_email: Optional[str] = None):
-        self.session = requests.Session()
-        self.session.headers.update({
+    def __init__(
+        self,
+        confluence_token: Optional[str] = None,
+        confluence_email: Optional[str] = None,
+        max_connections: int = 32,
+        max_per_host: int = 4,
+        timeout: float = 30
+    ):
+        """
+        Args:
+            confluence_token: Confluence API token
+            confluence_email: Confluence account email
+            max_connections: Requests in flight at once, over all hosts
+            max_per_host: Requests in flight at once to the same host
+            timeout: Per-request timeout in seconds
+        """
+        self.headers = {
             'User-Agent': 'AG-Tools-Catalogue-Bot/1.0'
-        })
-        self.timeout = 30
+        }
+        self.timeout = timeout
+        self.max_connections = max(1, max_connections)
+        self.max_per_host = max(1, max_per_host)
         
         # Confluence authentication
         self.confluence_token = confluence_token
         self.confluence_email = confluence_email
+        self.auth: Optional[Tuple[str, str]] = None
         if confluence_token and confluence_email:
             # Use API token authentication
-            self.session.auth = (confluence_email, confluence_token)
+            self.auth = (confluence_email, confluence_token)
+        
+        # Client and limits belong to the event loop they were created on
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Pooled client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_connections)
+            self._host_slots = {}
+        return self._client
+    
+    async def _get(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        auth: Optional[Tuple[str, str]] = None
+    ) -> httpx.Response:
+        """GET within the global and per-host limits"""
+        client = self._get_client()
+        host = urlparse(url).netloc
+        host_slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        # Host first: requests queued behind a busy host must not hold global slots
+        async with host_slots, self._slots:
+            return await client.get(url, params=params, auth=auth or self.auth)
+    
+    async def close(self):
+        """Close pooled connections (on shutdown)"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
     
-    def fetch_url(self, url: str) -> Optional[str]:
+    async def fetch_url(self, url: str) -> Optional[str]:
         """
         Fetch content from URL and extract text
         
@@ -38,31 +105,35 @@ class DocumentCrawler:
         """
         try:
             print(f"Fetching: {url}")
-            response = self.session.get(url, timeout=self.timeout)
+            response = await self._get(url)
             response.raise_for_status()
             
-            # Detect document type by URL or content-type
-            content_type = response.headers.get('content-type', '').lower()
-            
-            if 'confluence' in url.lower():
-                return self._extract_confluence(response.text)
-            elif any(ext in url.lower() for ext in ['.md', 'readme']):
-                return self._extract_markdown(response.text)
-            elif 'text/html' in content_type:
-                return self._extract_html(response.text)
-            elif 'text/plain' in content_type or 'text/markdown' in content_type:
-                return response.text
-            else:
-                # Try HTML extraction as fallback
-                return self._extract_html(response.text)
+            # Parsing large pages is CPU work: keep it off the event loop
+            return await asyncio.to_thread(
+                self._extract, url, response.headers.get('content-type', '').lower(), response.text
+            )
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"Error fetching {url}: {e}")
             return None
         except Exception as e:
             print(f"Unexpected error processing {url}: {e}")
             return None
     
+    def _extract(self, url: str, content_type: str, text: str) -> str:
+        """Extract text according to the document type (URL or content-type)"""
+        if 'confluence' in url.lower():
+            return self._extract_confluence(text)
+        elif any(ext in url.lower() for ext in ['.md', 'readme']):
+            return self._extract_markdown(text)
+        elif 'text/html' in content_type:
+            return self._extract_html(text)
+        elif 'text/plain' in content_type or 'text/markdown' in content_type:
+            return text
+        else:
+            # Try HTML extraction as fallback
+            return self._extract_html(text)
+    
     def _extract_confluence(self, html: str) -> str:
         """
         Extract main content from Confluence page
@@ -117,8 +188,6 @@ class DocumentCrawler:
         Remove markdown syntax but keep the text
         """
         # Simple markdown cleanup
-        import re
-        
         # Remove code blocks
         content = re.sub(r'```[\s\S]*?```', '', content)
         
@@ -168,7 +237,7 @@ class DocumentCrawler:
         
         return ""
     
-    def fetch_confluence_page(self, url: str, auth: Optional[tuple] = None) -> Optional[str]:
+    async def fetch_confluence_page(self, url: str, auth: Optional[tuple] = None) -> Optional[str]:
         """
         Fetch Confluence page with optional authentication
         
@@ -180,17 +249,17 @@ class DocumentCrawler:
             Extracted text content
         """
         if auth:
-            self.session.auth = auth
+            self.auth = auth
         
         # Try Confluence REST API first (better than HTML scraping)
-        api_content = self._try_confluence_api(url)
+        api_content = await self._try_confluence_api(url)
         if api_content:
             return api_content
         
         # Fallback to HTML scraping
-        return self.fetch_url(url)
+        return await self.fetch_url(url)
     
-    def _try_confluence_api(self, page_url: str) -> Optional[str]:
+    async def _try_confluence_api(self, page_url: str) -> Optional[str]:
         """
         Try to fetch content via Confluence REST API
         
@@ -203,9 +272,6 @@ class DocumentCrawler:
             # - /display/SPACE/Page+Title
             # - /spaces/SPACE/pages/123456/Page+Title
             
-            import re
-            from urllib.parse import unquote, urlparse
-            
             parsed = urlparse(page_url)
             base_url = f"{parsed.scheme}://{parsed.netloc}"
             
@@ -223,7 +289,7 @@ class DocumentCrawler:
                     'expand': 'body.storage,body.view'
                 }
                 
-                response = self.session.get(api_url, params=params, timeout=self.timeout)
+                response = await self._get(api_url, params=params)
                 if response.status_code == 200:
                     data = response.json()
                     if data.get('results'):
@@ -248,7 +314,7 @@ class DocumentCrawler:
                 api_url = f"{base_url}/rest/api/content/{page_id}"
                 params = {'expand': 'body.storage,body.view'}
                 
-                response = self.session.get(api_url, params=params, timeout=self.timeout)
+                response = await self._get(api_url, params=params)
                 if response.status_code == 200:
                     data = response.json()
                     body = data.get('body', {})
@@ -266,7 +332,7 @@ class DocumentCrawler:
         
         return None
     
-    def fetch_readme(self, url: str) -> Optional[str]:
+    async def fetch_readme(self, url: str) -> Optional[str]:
         """
         Fetch README file (Markdown or plain text)
         
@@ -276,28 +342,23 @@ class DocumentCrawler:
         Returns:
             Extracted text content
         """
-        return self.fetch_url(url)
+        return await self.fetch_url(url)
     
-    def fetch_multiple_urls(self, urls: list[str], delay: float = 1.0) -> dict[str, Optional[str]]:
+    async def fetch_multiple_urls(self, urls: List[str]) -> Dict[str, Optional[str]]:
         """
-        Fetch multiple URLs with delay between requests
+        Fetch multiple URLs concurrently
+        
+        The per-host limit keeps any one server from being hammered.
         
         Args:
             urls: List of URLs to fetch
-            delay: Delay between requests in seconds
             
         Returns:
             Dictionary mapping URL to extracted content
         """
-        results = {}
-        
-        for i, url in enumerate(urls):
-            if i > 0:
-                time.sleep(delay)  # Be polite, don't hammer the server
-            
-            results[url] = self.fetch_url(url)
-        
-        return results
+        unique_urls = list(dict.fromkeys(urls))
+        contents = await asyncio.gather(*(self.fetch_url(url) for url in unique_urls))
+        return dict(zip(unique_urls, contents))
 
 
 # Global instance
@@ -305,5 +366,8 @@ from app.core.config import settings
 
 crawler = DocumentCrawler(
     confluence_token=settings.CONFLUENCE_API_TOKEN or None,
-    confluence_email=settings.CONFLUENCE_EMAIL or None
+    confluence_email=settings.CONFLUENCE_EMAIL or None,
+    max_connections=settings.CRAWLER_MAX_CONNECTIONS,
+    max_per_host=settings.CRAWLER_MAX_PER_HOST,
+    timeout=settings.CRAWLER_TIMEOUT_SECONDS
 )
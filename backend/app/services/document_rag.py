@@ -2,128 +2,299 @@
 Document RAG (Retrieval-Augmented Generation) Service
 Handles document chunking, embedding, and semantic search
 """
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Optional
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
 import hashlib
+import json
 import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.chunking import chunk_by_characters, get_chunker, iter_paragraphs, sentence_spans
+from app.services.embedding import embedding_service
+from app.services.embedding_cache import content_hash
+from app.services.result_cache import ResultCache, normalize_query
+from app.services.vector_store import VectorStore, create_vector_store
+
+# Ignored when matching query keywords against sentences
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'is', 'are', 'was', 'were'
+})
+_QUERY_WORD_RE = re.compile(r'\w+')
+
+
+def query_keywords(query: str) -> Set[str]:
+    """Lowercase query words minus stop words"""
+    return set(_QUERY_WORD_RE.findall(query.lower())) - STOP_WORDS
+
+
+def search_filter(
+    tool_ids: Optional[List[str]] = None,
+    doc_types: Optional[List[str]] = None
+) -> Optional[Dict]:
+    """
+    Vector store `where` filter restricting a search to some tools / doc types
+    
+    Returns:
+        Filter dict, or None when nothing is restricted
+    """
+    conditions = []
+    if tool_ids:
+        conditions.append({"tool_id": {"$in": list(tool_ids)}})
+    if doc_types:
+        conditions.append({"doc_type": {"$in": list(doc_types)}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
 
 
 class DocumentRAGService:
     """Document RAG for semantic search over tool documentation"""
     
     def __init__(self, use_llm_summary: bool = False, preload_model: bool = False):
+        # Construction is cheap: the vector store and the models are opened in initialize()
         self.use_llm_summary = use_llm_summary
+        self.preload_model = preload_model
         self.summarizer = None
         self._model_loading = False
+        self._summarizer_lock = threading.Lock()  # one pipeline call at a time
         
-        # Initialize ChromaDB with persistent storage
-        db_path = os.path.join(os.path.dirname(__file__), "../../data/chroma_db")
-        os.makedirs(db_path, exist_ok=True)
-        
-        self.chroma_client = chromadb.PersistentClient(
-            path=db_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
+        # LLM summaries by (chunk id, normalized query); chunk ids are content hashes
+        self.summary_cache = ResultCache(max_entries=settings.LLM_SUMMARY_CACHE_SIZE)
         
-        # Create or get collection
-        self.collection = self.chroma_client.get_or_create_collection(
-            name="tool_documents",
-            metadata={"hnsw:space": "cosine"}  # Use cosine similarity
-        )
+        store_dir = "chroma_db" if settings.VECTOR_STORE_BACKEND == "chroma" else "vector_store"
+        self.db_path = os.path.join(os.path.dirname(__file__), "../../data", store_dir)
+        self.store: Optional[VectorStore] = None
+        # Web workers behind the index writer only search; the writer process sets this
+        self.writable = not settings.INDEX_WRITER_SOCKET
+        self._store_generation: Optional[str] = None  # changes when a snapshot import replaces the store
+        self._seen_version: Optional[str] = None  # index version the open store reflects
+        self._ready = False
         
-        # Optionally preload model in background
-        if use_llm_summary and preload_model:
-            import threading
-            threading.Thread(target=self._background_load_model, daemon=True).start()
+        # Maintained stats: chunks per tool, valid for index version _counts_version
+        self._tool_chunk_counts: Optional[Dict[str, int]] = None
+        self._counts_version: Optional[str] = None
+        self._counts_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+    
+    @property
+    def model_name(self) -> str:
+        """Embedding model (multilingual by default: English and Chinese)"""
+        return embedding_service.doc_model
+    
+    @property
+    def is_ready(self) -> bool:
+        """True once the vector store and embedding model are loaded"""
+        return self._ready
+    
+    def initialize(self):
+        """Open the vector store and load the embedding model (first call only, thread-safe)"""
+        if self.is_ready:
+            self._refresh_if_changed()
+            return
         
-        # Use multilingual model (supports English and Chinese)
-        print("Loading embedding model...")
-        self.model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
-        print("Embedding model loaded successfully")
+        with self._init_lock:
+            if self.is_ready:
+                return
+            
+            # Chunk embeddings, text and metadata (VECTOR_STORE_BACKEND)
+            self._seen_version = self.index_version
+            self.store = create_vector_store(self.db_path, writable=self.writable)
+            self._store_generation = self._read_store_generation()
+            
+            # Optional: LLM summarization, preloaded in background if requested
+            if self.use_llm_summary:
+                if self.preload_model:
+                    threading.Thread(target=self._background_load_model, daemon=True).start()
+                else:
+                    self._load_summarizer()
+            
+            # Shared with tool search when both are configured with the same model
+            embedding_service.get_model(self.model_name)
+            
+            # Published last: is_ready flips only when everything is usable
+            self._ready = True
+    
+    def _read_store_generation(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.db_path, "store_generation")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def _refresh_if_changed(self):
+        """
+        Pick up index changes made by another process
         
-        # Optional: LLM summarization
-        self.use_llm_summary = use_llm_summary
-        self.summarizer = None
-        if use_llm_summary:
-            self._load_summarizer()
+        The index writer process (or a snapshot import) bumps index_version;
+        a replaced store directory is reopened, otherwise the store reloads
+        what was written (Chroma has to reopen its HNSW segment for that).
+        """
+        version = self.index_version
+        generation = self._read_store_generation()
+        if version == self._seen_version and generation == self._store_generation:
+            return
+        with self._init_lock:
+            if version == self._seen_version and generation == self._store_generation:
+                return  # another thread got here first
+            if generation != self._store_generation:
+                print("Doc index was replaced by a snapshot import, reopening")
+                # Close first: Chroma would hand the new store the old one's cached segments
+                self.store.close()
+                self.store = create_vector_store(self.db_path, writable=self.writable)
+                self._store_generation = generation
+            elif version != self._seen_version:
+                self.store.refresh()
+            self._seen_version = version
     
-    def chunk_document(self, content: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
+    def replace_store(self, staging_path: str, index_version: str):
         """
-        Split document into overlapping chunks
+        Swap a fully built store directory in place of the current one
+        
+        The staging directory is renamed over db_path (it must be on the same
+        filesystem) and stamped with a new generation, so other worker
+        processes reopen it on their next request.
         
         Args:
-            content: Document text
-            chunk_size: Target size of each chunk (characters)
-            overlap: Overlap between chunks (characters)
-            
-        Returns:
-            List of text chunks
+            staging_path: Directory of the new store
+            index_version: Index version to publish for the new contents
         """
-        if not content or not content.strip():
-            return []
+        generation = uuid.uuid4().hex
+        with open(os.path.join(staging_path, "store_generation"), "w") as f:
+            f.write(generation)
+        with open(os.path.join(staging_path, "index_version"), "w") as f:
+            f.write(index_version)
         
-        # Split by paragraphs first
-        paragraphs = content.split('\n\n')
+        with self._init_lock:
+            # Close first: Chroma would hand the new store the old one's cached segments
+            if self.store is not None:
+                self.store.close()
+            
+            retired_path = f"{self.db_path}.old-{generation}"
+            if os.path.exists(self.db_path):
+                os.replace(self.db_path, retired_path)
+            os.replace(staging_path, self.db_path)
+            
+            self.store = create_vector_store(self.db_path, writable=self.writable)
+            self._store_generation = generation
+            self._seen_version = index_version
+            with self._counts_lock:
+                self._tool_chunk_counts = None
         
-        chunks = []
-        current_chunk = []
-        current_length = 0
+        shutil.rmtree(retired_path, ignore_errors=True)
+    
+    @property
+    def index_version(self) -> str:
+        """
+        Version marker of the document index, changed on every write
         
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
+        Kept in a file next to the vector store data so every worker process sees
+        the same value (used to key cached search results).
+        """
+        try:
+            with open(os.path.join(self.db_path, "index_version")) as f:
+                return f.read().strip() or "0"
+        except FileNotFoundError:
+            return "0"
+    
+    def _bump_index_version(self) -> str:
+        """Record that the index changed (atomic replace of the marker file)"""
+        os.makedirs(self.db_path, exist_ok=True)
+        marker = os.path.join(self.db_path, "index_version")
+        tmp_path = f"{marker}.{os.getpid()}.tmp"
+        version = uuid.uuid4().hex
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, marker)
+        return version
+    
+    def _record_write(self, tool_id: str, chunk_delta: Optional[int]):
+        """
+        Bump the index version and keep the per-tool chunk counters in step
+        
+        Args:
+            tool_id: Tool whose chunks changed
+            chunk_delta: Chunks added (negative when removed); None drops the tool
+        """
+        with self._counts_lock:
+            previous = self.index_version
+            counters_in_sync = (
+                self._tool_chunk_counts is not None
+                and self._counts_version == previous
+            )
+            version = self._bump_index_version()
+            if previous == self._seen_version:
+                self._seen_version = version  # our own write: nothing to reload
             
-            para_length = len(para)
+            if not counters_in_sync:
+                # Someone else wrote since we counted: recount lazily on next stats call
+                self._tool_chunk_counts = None
+                return
             
-            # If paragraph itself is too long, split it
-            if para_length > chunk_size:
-                words = para.split()
-                temp_chunk = []
-                temp_length = 0
-                
-                for word in words:
-                    temp_chunk.append(word)
-                    temp_length += len(word) + 1
-                    
-                    if temp_length >= chunk_size:
-                        if current_chunk:
-                            chunks.append(' '.join(current_chunk))
-                            current_chunk = []
-                            current_length = 0
-                        
-                        chunks.append(' '.join(temp_chunk))
-                        temp_chunk = []
-                        temp_length = 0
-                
-                if temp_chunk:
-                    current_chunk.extend(temp_chunk)
-                    current_length += temp_length
+            if chunk_delta is None:
+                self._tool_chunk_counts.pop(tool_id, None)
             else:
-                # Add paragraph to current chunk
-                if current_length + para_length > chunk_size and current_chunk:
-                    chunks.append(' '.join(current_chunk))
-                    # Keep some overlap
-                    if overlap > 0 and current_chunk:
-                        overlap_words = ' '.join(current_chunk).split()[-10:]
-                        current_chunk = overlap_words
-                        current_length = sum(len(w) + 1 for w in overlap_words)
-                    else:
-                        current_chunk = []
-                        current_length = 0
-                
-                current_chunk.append(para)
-                current_length += para_length + 1
+                count = self._tool_chunk_counts.get(tool_id, 0) + chunk_delta
+                if count > 0:
+                    self._tool_chunk_counts[tool_id] = count
+                else:
+                    self._tool_chunk_counts.pop(tool_id, None)
+            self._counts_version = version
+    
+    def _get_tool_chunk_counts(self) -> Dict[str, int]:
+        """
+        Chunks per tool, maintained by index/delete
+        
+        Counted once from metadata only (no documents or embeddings), then
+        recounted only if another process changed the index.
+        """
+        with self._counts_lock:
+            version = self.index_version
+            if self._tool_chunk_counts is None or self._counts_version != version:
+                counts: Dict[str, int] = {}
+                data = self.store.get()
+                for metadata in data['metadatas']:
+                    counts[metadata['tool_id']] = counts.get(metadata['tool_id'], 0) + 1
+                self._tool_chunk_counts = counts
+                self._counts_version = version
+            return dict(self._tool_chunk_counts)
+    
+    def chunk_document(self, content: str) -> List[str]:
+        """
+        Split document into chunks that fit the embedding model's input
         
-        # Add remaining chunk
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+        Paragraphs are packed up to the model's token limit with token overlap;
+        falls back to character-based chunks if no fast tokenizer is available.
         
-        return chunks
+        Args:
+            content: Document text
+            
+        Returns:
+            List of text chunks
+        """
+        if not content or not content.strip():
+            return []
+        
+        chunker = get_chunker(self.model_name)
+        if chunker is None:
+            return chunk_by_characters(content)
+        return list(chunker.chunk(iter_paragraphs(content)))
     
-    def _extract_key_sentences(self, content: str, query: str, max_sentences: int = 1) -> str:
+    def _extract_key_sentences(
+        self,
+        content: str,
+        query: str,
+        max_sentences: int = 1,
+        spans: Optional[List[Tuple[int, int]]] = None,
+        keywords: Optional[Set[str]] = None
+    ) -> str:
         """
         Extract the sentence(s) containing the most query keywords
         
@@ -131,26 +302,24 @@ class DocumentRAGService:
             content: Document chunk content
             query: User's search query
             max_sentences: Maximum number of sentences to return (default: 1)
+            spans: Sentence spans stored at index time (re-split if missing)
+            keywords: Query keywords, computed once per search by the caller
             
         Returns:
             The sentence(s) containing search keywords
         """
-        import re
-        
-        # Split into sentences
-        sentences = re.split(r'(?<=[.!?])\s+', content)
-        sentences = [s.strip() for s in sentences if len(s.strip()) > 10]
+        if spans is None:
+            spans = sentence_spans(content)
+        sentences = [content[start:end] for start, end in spans]
         
         if not sentences:
             return content[:200] + "..." if len(content) > 200 else content
         
         # Extract query keywords
-        query_lower = query.lower()
-        query_words = set(re.findall(r'\w+', query_lower))
-        common_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were'}
-        query_keywords = query_words - common_words
+        if keywords is None:
+            keywords = query_keywords(query)
         
-        if not query_keywords:
+        if not keywords:
             return sentences[0][:250] + "..." if len(sentences[0]) > 250 else sentences[0]
         
         # Find sentence with most keyword matches
@@ -160,7 +329,7 @@ class DocumentRAGService:
         for sentence in sentences:
             sentence_lower = sentence.lower()
             # Count keyword matches
-            matches = sum(1 for kw in query_keywords if kw in sentence_lower)
+            matches = sum(1 for kw in keywords if kw in sentence_lower)
             if matches > max_matches:
                 max_matches = matches
                 best_sentence = sentence
@@ -169,11 +338,84 @@ class DocumentRAGService:
         if max_matches == 0:
             best_sentence = sentences[0]
         
-        # Truncate if too long
-        if len(best_sentence) > 300:
-            best_sentence = best_sentence[:297] + "..."
+        return self._truncate_snippet(best_sentence)
+    
+    @staticmethod
+    def _truncate_snippet(sentence: str) -> str:
+        if len(sentence) > 300:
+            return sentence[:297] + "..."
+        return sentence
+    
+    @staticmethod
+    def _stored_spans(metadata: Dict) -> Optional[List[Tuple[int, int]]]:
+        """Sentence spans from chunk metadata (None for chunks indexed before they were stored)"""
+        raw = metadata.get("sentence_spans")
+        if raw is None:
+            return None
+        try:
+            return [tuple(span) for span in json.loads(raw)]
+        except (TypeError, ValueError):
+            return None
+    
+    def _embed_sentences(self, chunks: List[str]):
+        """Warm the embedding cache with every sentence, for semantic snippets"""
+        sentences = [
+            chunk[start:end]
+            for chunk in chunks
+            for start, end in sentence_spans(chunk)
+        ]
+        if sentences:
+            embedding_service.encode_documents(self.model_name, sentences)
+    
+    def _semantic_snippets(
+        self,
+        contents: List[str],
+        spans_per_hit: List[List[Tuple[int, int]]],
+        query_embedding: np.ndarray
+    ) -> List[Optional[str]]:
+        """
+        Best sentence per hit by similarity to the query
+        
+        Sentence embeddings come from the embedding cache (filled at index
+        time, and kept fresh by every reindex), so this is one read-only
+        lookup and one matrix-vector product for all hits. Hits with uncached
+        sentences get None (keyword fallback).
+        """
+        cache = embedding_service.document_cache
+        snippets: List[Optional[str]] = [None] * len(contents)
+        if cache is None or not cache.enabled:
+            return snippets
+        
+        sentences = [
+            (hit, contents[hit][start:end])
+            for hit, spans in enumerate(spans_per_hit)
+            for start, end in spans
+        ]
+        hashes = [content_hash(sentence) for _, sentence in sentences]
+        cached = cache.get_many(self.model_name, hashes, touch=False)  # searches never write
+        
+        rows = [i for i, digest in enumerate(hashes) if digest in cached]
+        if not rows:
+            return snippets
+        
+        matrix = np.stack([cached[hashes[i]] for i in rows])
+        scores = matrix @ query_embedding / (
+            np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_embedding) + 1e-12
+        )
+        
+        best: Dict[int, Tuple[float, str]] = {}
+        complete = {hit for hit, spans in enumerate(spans_per_hit) if spans}
+        for row, score in zip(rows, scores):
+            hit, sentence = sentences[row]
+            if hit not in best or score > best[hit][0]:
+                best[hit] = (float(score), sentence)
+        for i, (hit, _) in enumerate(sentences):
+            if hashes[i] not in cached:
+                complete.discard(hit)
         
-        return best_sentence
+        for hit in complete:
+            snippets[hit] = self._truncate_snippet(best[hit][1])
+        return snippets
     
     def _background_load_model(self):
         """Load model in background thread"""
@@ -211,65 +453,97 @@ class DocumentRAGService:
             self.summarizer = None
             self.use_llm_summary = False
     
-    def _generate_llm_summary(self, content: str, query: str = "", max_length: int = 130) -> str:
+    def _generate_llm_summaries(
+        self,
+        hits: List[Tuple[str, str]],
+        query: str = "",
+        deadline: Optional[float] = None,
+        max_length: int = 130
+    ) -> List[Optional[str]]:
         """
-        Generate query-focused summary using LLM
+        Generate query-focused summaries for several hits using the LLM
+        
+        Cached summaries are reused; the rest are summarized in batches of
+        LLM_SUMMARY_BATCH_SIZE. No new batch is started if it would not finish
+        before the deadline, so slow summarization degrades to snippets
+        instead of slowing the whole request.
         
         Args:
-            content: Text to summarize
-            query: Search query to focus the summary on
-            max_length: Maximum length of summary
+            hits: (chunk id, chunk text) pairs
+            query: Search query to focus the summaries on
+            deadline: time.monotonic() value after which no batch is started
+            max_length: Maximum length of a summary
             
         Returns:
-            Query-focused summary
+            Summary per hit, or None where the caller should fall back to extraction
         """
+        summaries: List[Optional[str]] = [None] * len(hits)
+        
         # Wait if model is loading in background
         if self._model_loading:
             print("⏳ Model still loading in background, falling back to extraction...")
-            return self._extract_key_sentences(content, query)
+            return summaries
         
         # Lazy load if not loaded yet and not currently loading
         if not self.summarizer and self.use_llm_summary and not self._model_loading:
             print("Loading LLM summarization model (first time only, ~600MB)...")
             self._load_summarizer()
         
-        if not self.summarizer or not content.strip():
-            return self._extract_key_sentences(content, query)
+        if not self.summarizer:
+            return summaries
         
-        try:
+        normalized_query = normalize_query(query)
+        pending = []
+        for i, (chunk_id, content) in enumerate(hits):
+            cached = self.summary_cache.get(("llm-summary", chunk_id, normalized_query))
+            if cached is not None:
+                summaries[i] = cached
+            elif content.strip():
+                pending.append(i)
+        
+        batch_size = max(1, settings.LLM_SUMMARY_BATCH_SIZE)
+        last_batch_seconds = 0.0
+        for start in range(0, len(pending), batch_size):
+            if deadline is not None and time.monotonic() + last_batch_seconds > deadline:
+                print(f"⏱️ LLM summary deadline reached, {len(pending) - start} results use extraction")
+                break
+            
+            batch = pending[start:start + batch_size]
             # Truncate content if too long (model has input limit)
-            if len(content) > 1024:
-                content = content[:1024]
+            contents = [hits[i][1][:1024] for i in batch]
             
             # Prefix content with query context for focused summarization
-            if query:
-                focused_content = f"Regarding '{query}': {content}"
-            else:
-                focused_content = content
+            inputs = [f"Regarding '{query}': {content}" if query else content for content in contents]
             
-            # Calculate appropriate max_length based on input
-            # For summarization, output should be shorter than input
-            input_tokens = len(content.split())
+            # For summarization, output should be shorter than the shortest input
+            input_tokens = min(len(content.split()) for content in contents)
             adaptive_max_length = min(max_length, max(30, input_tokens // 2))
             
-            # Generate summary
-            result = self.summarizer(
-                focused_content,
-                max_length=adaptive_max_length,
-                min_length=min(20, adaptive_max_length - 10),
-                do_sample=False,
-                truncation=True
-            )
-            
-            summary = result[0]['summary_text']
-            # Remove the query prefix if it appears in the output
-            if query and summary.startswith("Regarding"):
-                summary = summary.split(": ", 1)[-1]
-            return summary
+            batch_started = time.monotonic()
+            try:
+                with self._summarizer_lock:
+                    results = self.summarizer(
+                        inputs,
+                        max_length=adaptive_max_length,
+                        min_length=min(20, adaptive_max_length - 10),
+                        do_sample=False,
+                        truncation=True,
+                        batch_size=len(inputs)
+                    )
+            except Exception as e:
+                print(f"LLM summarization failed: {e}, falling back to extraction")
+                break
+            last_batch_seconds = time.monotonic() - batch_started
             
-        except Exception as e:
-            print(f"LLM summarization failed: {e}, falling back to extraction")
-            return self._extract_key_sentences(content, query)
+            for i, result in zip(batch, results):
+                summary = result['summary_text']
+                # Remove the query prefix if it appears in the output
+                if query and summary.startswith("Regarding"):
+                    summary = summary.split(": ", 1)[-1]
+                summaries[i] = summary
+                self.summary_cache.set(("llm-summary", hits[i][0], normalized_query), summary)
+        
+        return summaries
     
     def index_document(
         self, 
@@ -296,6 +570,8 @@ class DocumentRAGService:
             print(f"Warning: Empty content for {tool_name}")
             return 0
         
+        self.initialize()
+        
         # Split into chunks
         chunks = self.chunk_document(content)
         
@@ -305,14 +581,8 @@ class DocumentRAGService:
         
         print(f"Indexing {len(chunks)} chunks for {tool_name}...")
         
-        # Generate unique IDs for each chunk
-        chunk_ids = [
-            hashlib.md5(f"{tool_id}_{doc_url}_{i}".encode()).hexdigest()
-            for i in range(len(chunks))
-        ]
-        
-        # Generate embeddings
-        embeddings = self.model.encode(chunks, show_progress_bar=True).tolist()
+        # Content-addressed IDs: an unchanged chunk keeps its id wherever it moves
+        chunk_ids = self._chunk_ids(tool_id, doc_url, chunks)
         
         # Prepare metadata
         metadatas = [
@@ -322,44 +592,117 @@ class DocumentRAGService:
                 "doc_url": doc_url,
                 "doc_type": doc_type,
                 "chunk_index": i,
-                "total_chunks": len(chunks)
+                "total_chunks": len(chunks),
+                # Sentence boundaries for query-time snippets (JSON: metadata values are scalars)
+                "sentence_spans": json.dumps(sentence_spans(chunk), separators=(",", ":"))
             }
-            for i in range(len(chunks))
+            for i, chunk in enumerate(chunks)
         ]
         
-        # Store in vector database
         try:
-            self.collection.upsert(
-                ids=chunk_ids,
-                documents=chunks,
-                embeddings=embeddings,
-                metadatas=metadatas
+            # Manifest of what is currently stored for this document
+            manifest = self._get_document_manifest(tool_id, doc_url)
+            
+            new_positions = [i for i, chunk_id in enumerate(chunk_ids) if chunk_id not in manifest]
+            moved_positions = [
+                i for i, chunk_id in enumerate(chunk_ids)
+                if chunk_id in manifest and manifest[chunk_id] != metadatas[i]
+            ]
+            current_ids = set(chunk_ids)
+            stale_ids = [chunk_id for chunk_id in manifest if chunk_id not in current_ids]
+            
+            # Embed only new or changed chunks
+            if new_positions:
+                embeddings, cache_hits = embedding_service.encode_documents(
+                    self.model_name,
+                    [chunks[i] for i in new_positions],
+                    show_progress_bar=True
+                )
+                embeddings = embeddings.tolist()
+                print(
+                    f"Embedding cache: {cache_hits}/{len(new_positions)} hits "
+                    f"({cache_hits / len(new_positions):.0%}) for {tool_name}"
+                )
+                self.store.upsert(
+                    ids=[chunk_ids[i] for i in new_positions],
+                    embeddings=embeddings,
+                    documents=[chunks[i] for i in new_positions],
+                    metadatas=[metadatas[i] for i in new_positions]
+                )
+                
+                if settings.DOC_SNIPPET_EMBEDDINGS:
+                    self._embed_sentences([chunks[i] for i in new_positions])
+            
+            # Unchanged chunks that moved only need their metadata refreshed
+            if moved_positions:
+                self.store.update_metadata(
+                    ids=[chunk_ids[i] for i in moved_positions],
+                    metadatas=[metadatas[i] for i in moved_positions]
+                )
+            
+            # Chunks no longer in the document (e.g. it shrank)
+            if stale_ids:
+                self.store.delete(ids=stale_ids)
+            
+            if new_positions or moved_positions or stale_ids:
+                self._record_write(tool_id, len(new_positions) - len(stale_ids))
+            
+            print(
+                f"Successfully indexed {len(chunks)} chunks for {tool_name} "
+                f"({len(new_positions)} embedded, {len(chunks) - len(new_positions)} unchanged, "
+                f"{len(stale_ids)} stale removed)"
             )
-            print(f"Successfully indexed {len(chunks)} chunks for {tool_name}")
             return len(chunks)
         except Exception as e:
             print(f"Error indexing {tool_name}: {e}")
             return 0
     
-    def delete_tool_documents(self, tool_id: str) -> bool:
+    @staticmethod
+    def _chunk_ids(tool_id: str, doc_url: str, chunks: List[str]) -> List[str]:
+        """
+        Chunk ids derived from the chunk content
+        
+        Repeated identical chunks within a document get an occurrence suffix
+        so ids stay unique.
+        """
+        seen: Dict[str, int] = {}
+        chunk_ids = []
+        for chunk in chunks:
+            digest = content_hash(chunk)
+            occurrence = seen.get(digest, 0)
+            seen[digest] = occurrence + 1
+            chunk_ids.append(
+                hashlib.md5(f"{tool_id}_{doc_url}_{digest}_{occurrence}".encode()).hexdigest()
+            )
+        return chunk_ids
+    
+    def _get_document_manifest(self, tool_id: str, doc_url: str) -> Dict[str, Dict]:
+        """Chunk id -> metadata of everything stored for one document (no text or vectors)"""
+        results = self.store.get(where={"$and": [{"tool_id": tool_id}, {"doc_url": doc_url}]})
+        return dict(zip(results['ids'], results['metadatas']))
+    
+    def delete_tool_documents(self, tool_id: str, keep_doc_url: Optional[str] = None) -> bool:
         """
         Delete all document chunks for a tool
         
         Args:
             tool_id: Tool identifier
+            keep_doc_url: Keep the chunks of this document (e.g. after the
+                tool's documentation link changed and the new one was indexed)
             
         Returns:
             True if successful
         """
+        self.initialize()
+        where = {"tool_id": tool_id}
+        if keep_doc_url:
+            where = {"$and": [where, {"doc_url": {"$ne": keep_doc_url}}]}
         try:
-            # Query all chunks for this tool
-            results = self.collection.get(
-                where={"tool_id": tool_id}
-            )
+            deleted = self.store.delete(where=where)
             
-            if results['ids']:
-                self.collection.delete(ids=results['ids'])
-                print(f"Deleted {len(results['ids'])} chunks for tool {tool_id}")
+            if deleted:
+                self._record_write(tool_id, -deleted if keep_doc_url else None)
+                print(f"Deleted {deleted} chunks for tool {tool_id}")
             
             return True
         except Exception as e:
@@ -371,7 +714,10 @@ class DocumentRAGService:
         query: str, 
         top_k: int = 10,
         min_score: float = 0.3,
-        tool_ids: Optional[List[str]] = None
+        tool_ids: Optional[List[str]] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        summary_deadline: Optional[float] = None,
+        doc_types: Optional[List[str]] = None
     ) -> List[Dict]:
         """
         Semantic search over indexed documents
@@ -381,6 +727,10 @@ class DocumentRAGService:
             top_k: Maximum number of results
             min_score: Minimum similarity score (0-1)
             tool_ids: Optional filter by specific tool IDs
+            query_embedding: Pre-computed query embedding (skips encoding)
+            summary_deadline: time.monotonic() value after which LLM summaries
+                fall back to extraction (defaults to LLM_SUMMARY_DEADLINE_MS from now)
+            doc_types: Optional filter by document type (confluence, webpage, ...)
             
         Returns:
             List of search results with content, metadata, and scores
@@ -388,75 +738,316 @@ class DocumentRAGService:
         if not query or not query.strip():
             return []
         
-        # Generate query embedding
-        query_embedding = self.model.encode([query], show_progress_bar=False)[0].tolist()
+        if summary_deadline is None and settings.LLM_SUMMARY_DEADLINE_MS > 0:
+            summary_deadline = time.monotonic() + settings.LLM_SUMMARY_DEADLINE_MS / 1000
         
-        # Prepare filter
-        where_filter = {"tool_id": {"$in": tool_ids}} if tool_ids else None
+        query_embedding = self._query_embedding(query, query_embedding)
+        hits = self._query_hits(query_embedding, top_k, min_score, tool_ids, doc_types)
+        summaries = self._summarize_hits(hits, query, query_embedding, summary_deadline)
+        return [self._format_hit(hit, summary) for hit, summary in zip(hits, summaries)]
+    
+    def iter_search(
+        self,
+        query: str,
+        top_k: int = 10,
+        min_score: float = 0.3,
+        tool_ids: Optional[List[str]] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        summary_deadline: Optional[float] = None,
+        doc_types: Optional[List[str]] = None
+    ) -> Iterator[Dict]:
+        """
+        Same results as search(), yielded one by one as their snippets are ready
+        
+        Results come in score order. The first hit is summarized on its own
+        and the rest in LLM_SUMMARY_BATCH_SIZE batches, so the time to the
+        first result does not grow with top_k.
+        """
+        if not query or not query.strip():
+            return
+        
+        if summary_deadline is None and settings.LLM_SUMMARY_DEADLINE_MS > 0:
+            summary_deadline = time.monotonic() + settings.LLM_SUMMARY_DEADLINE_MS / 1000
+        
+        query_embedding = self._query_embedding(query, query_embedding)
+        hits = self._query_hits(query_embedding, top_k, min_score, tool_ids, doc_types)
+        
+        batch_size = max(1, settings.LLM_SUMMARY_BATCH_SIZE)
+        start = 0
+        while start < len(hits):
+            end = 1 if start == 0 else start + batch_size
+            batch = hits[start:end]
+            for hit, summary in zip(batch, self._summarize_hits(batch, query, query_embedding, summary_deadline)):
+                yield self._format_hit(hit, summary)
+            start = end
+    
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 10,
+        min_score: float = 0.3,
+        tool_ids: Optional[List[str]] = None,
+        query_embeddings: Optional[np.ndarray] = None,
+        summary_deadline: Optional[float] = None,
+        doc_types: Optional[List[str]] = None
+    ) -> List[List[Dict]]:
+        """
+        Semantic search for several queries at once
+        
+        The queries are encoded in one model call and looked up with one
+        vector store request; the other arguments are as for search() and
+        apply to every query (one summary deadline for the whole batch).
         
-        # Search in vector database
+        Args:
+            queries: Search queries
+            query_embeddings: Pre-computed query embeddings, one row per query
+            
+        Returns:
+            One list of search results per query (empty for blank queries)
+        """
+        results: List[List[Dict]] = [[] for _ in queries]
+        active = [i for i, query in enumerate(queries) if query and query.strip()]
+        if not active:
+            return results
+        
+        if summary_deadline is None and settings.LLM_SUMMARY_DEADLINE_MS > 0:
+            summary_deadline = time.monotonic() + settings.LLM_SUMMARY_DEADLINE_MS / 1000
+        
+        if query_embeddings is None:
+            query_embeddings = embedding_service.encode_queries(self.model_name, [queries[i] for i in active])
+        else:
+            query_embeddings = np.asarray(query_embeddings)[active]
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        
+        hits_per_query = self._query_hits_many(query_embeddings, top_k, min_score, tool_ids, doc_types)
+        for i, query_embedding, hits in zip(active, query_embeddings, hits_per_query):
+            summaries = self._summarize_hits(hits, queries[i], query_embedding, summary_deadline)
+            results[i] = [self._format_hit(hit, summary) for hit, summary in zip(hits, summaries)]
+        return results
+    
+    def _query_embedding(self, query: str, query_embedding: Optional[np.ndarray]) -> np.ndarray:
+        """Generate the query embedding unless the caller already did"""
+        if query_embedding is None:
+            query_embedding = embedding_service.encode_queries(self.model_name, [query])[0]
+        return np.asarray(query_embedding, dtype=np.float32)
+    
+    def _query_hits(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        min_score: float,
+        tool_ids: Optional[List[str]],
+        doc_types: Optional[List[str]]
+    ) -> List[Dict]:
+        """Nearest chunks scoring at least min_score, best first"""
+        return self._query_hits_many(query_embedding[None, :], top_k, min_score, tool_ids, doc_types)[0]
+    
+    def _query_hits_many(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int,
+        min_score: float,
+        tool_ids: Optional[List[str]],
+        doc_types: Optional[List[str]]
+    ) -> List[List[Dict]]:
+        """_query_hits() for each row of query_embeddings, in one vector store request"""
+        self.initialize()
+        
+        # Filters are applied inside the vector query, so top_k counts matching chunks only
+        where_filter = search_filter(tool_ids, doc_types)
+        
+        # Search in vector store; errors propagate so an outage is never mistaken
+        # for (and cached as) "no results"
         try:
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                where=where_filter,
-                include=["documents", "metadatas", "distances"]
-            )
+            results_per_query = self.store.query_many(query_embeddings.tolist(), top_k, where=where_filter)
         except Exception as e:
             print(f"Search error: {e}")
+            raise
+        
+        hits_per_query = []
+        for results in results_per_query:
+            hits = []
+            for chunk_id, content, metadata, distance in zip(
+                results['ids'], results['documents'], results['metadatas'], results['distances']
+            ):
+                # Convert distance to similarity score (0-1)
+                # Both vector stores return cosine distance
+                similarity = 1 / (1 + distance)
+                if similarity >= min_score:
+                    hits.append({
+                        "id": chunk_id,
+                        "content": content,
+                        "metadata": metadata,
+                        "similarity": similarity,
+                        # Stored sentence spans: no per-hit re-splitting
+                        "spans": self._stored_spans(metadata) or sentence_spans(content),
+                    })
+            hits_per_query.append(hits)
+        return hits_per_query
+    
+    def _summarize_hits(
+        self,
+        hits: List[Dict],
+        query: str,
+        query_embedding: np.ndarray,
+        deadline: Optional[float]
+    ) -> List[str]:
+        """Query-focused summary per hit: LLM, closest sentence, or extracted key sentences"""
+        if not hits:
             return []
         
-        if not results['documents'] or not results['documents'][0]:
+        contents = [hit["content"] for hit in hits]
+        spans_per_hit = [hit["spans"] for hit in hits]
+        
+        # Generate query-focused summaries based on configuration
+        llm_summaries: List[Optional[str]] = [None] * len(hits)
+        semantic_snippets: List[Optional[str]] = [None] * len(hits)
+        if self.use_llm_summary and self.summarizer:
+            # Use LLM to generate query-focused summaries, batched across hits
+            llm_summaries = self._generate_llm_summaries(
+                [(hit["id"], hit["content"]) for hit in hits],
+                query,
+                deadline=deadline
+            )
+        elif settings.DOC_SNIPPET_EMBEDDINGS and hits:
+            semantic_snippets = self._semantic_snippets(contents, spans_per_hit, query_embedding)
+        
+        keywords = query_keywords(query)
+        summaries = []
+        for i, content in enumerate(contents):
+            if llm_summaries[i] is not None:
+                summaries.append(llm_summaries[i])
+            elif semantic_snippets[i] is not None:
+                # Sentence closest to the query (embeddings cached at index time)
+                summaries.append(semantic_snippets[i])
+            else:
+                # Use fast extractive summarization (already query-focused)
+                summaries.append(self._extract_key_sentences(
+                    content, query, spans=spans_per_hit[i], keywords=keywords
+                ))
+        return summaries
+    
+    @staticmethod
+    def _format_hit(hit: Dict, summary: str) -> Dict:
+        metadata = hit["metadata"]
+        return {
+            "content": hit["content"],
+            "summary": summary,  # Smart extracted summary
+            "tool_id": metadata['tool_id'],
+            "tool_name": metadata['tool_name'],
+            "doc_url": metadata['doc_url'],
+            "doc_type": metadata['doc_type'],
+            "chunk_index": metadata['chunk_index'],
+            "relevance_score": round(hit["similarity"], 3)
+        }
+    
+    async def search_async(
+        self,
+        query: str,
+        top_k: int = 10,
+        min_score: float = 0.3,
+        tool_ids: Optional[List[str]] = None,
+        doc_types: Optional[List[str]] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        summary_deadline: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Non-blocking semantic search for use inside async handlers
+        
+        The query is encoded through the shared micro-batching executor (unless
+        query_embedding is given); the vector query and snippet extraction run
+        on a worker thread.
+        """
+        if not query or not query.strip():
             return []
         
-        # Format results
-        formatted_results = []
-        for i in range(len(results['documents'][0])):
-            # Convert distance to similarity score (0-1)
-            # ChromaDB returns squared euclidean distance
-            distance = results['distances'][0][i]
-            similarity = 1 / (1 + distance)  # Convert to 0-1 range
-            
-            if similarity >= min_score:
-                content = results['documents'][0][i]
-                
-                # Generate query-focused summary based on configuration
-                if self.use_llm_summary and self.summarizer:
-                    # Use LLM to generate query-focused summary
-                    summary = self._generate_llm_summary(content, query)
-                else:
-                    # Use fast extractive summarization (already query-focused)
-                    summary = self._extract_key_sentences(content, query)
-                
-                formatted_results.append({
-                    "content": content,
-                    "summary": summary,  # Smart extracted summary
-                    "tool_id": results['metadatas'][0][i]['tool_id'],
-                    "tool_name": results['metadatas'][0][i]['tool_name'],
-                    "doc_url": results['metadatas'][0][i]['doc_url'],
-                    "doc_type": results['metadatas'][0][i]['doc_type'],
-                    "chunk_index": results['metadatas'][0][i]['chunk_index'],
-                    "relevance_score": round(similarity, 3)
-                })
-        
-        return formatted_results
+        if not self.is_ready:
+            await asyncio.to_thread(self.initialize)
+        if query_embedding is None:
+            query_embedding = await embedding_service.encode_query(self.model_name, query)
+        
+        return await asyncio.to_thread(
+            self.search,
+            query,
+            top_k=top_k,
+            min_score=min_score,
+            tool_ids=tool_ids,
+            query_embedding=query_embedding,
+            summary_deadline=summary_deadline,
+            doc_types=doc_types
+        )
+    
+    async def search_many_async(
+        self,
+        queries: List[str],
+        top_k: int = 10,
+        min_score: float = 0.3,
+        tool_ids: Optional[List[str]] = None,
+        doc_types: Optional[List[str]] = None
+    ) -> List[List[Dict]]:
+        """
+        Non-blocking search_many(); all queries are encoded in one model call
+        """
+        if not self.is_ready:
+            await asyncio.to_thread(self.initialize)
+        query_embeddings = await embedding_service.encode_query_batch(self.model_name, queries)
+        
+        return await asyncio.to_thread(
+            self.search_many,
+            queries,
+            top_k=top_k,
+            min_score=min_score,
+            tool_ids=tool_ids,
+            query_embeddings=query_embeddings,
+            doc_types=doc_types
+        )
+    
+    async def search_stream(
+        self,
+        query: str,
+        top_k: int = 10,
+        min_score: float = 0.3,
+        tool_ids: Optional[List[str]] = None,
+        doc_types: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Non-blocking iter_search() for async handlers
+        
+        Each result is yielded as soon as its snippet is ready; the work for
+        the next one runs on a worker thread meanwhile.
+        """
+        if not query or not query.strip():
+            return
+        
+        if not self.is_ready:
+            await asyncio.to_thread(self.initialize)
+        query_embedding = await embedding_service.encode_query(self.model_name, query)
+        
+        results = self.iter_search(
+            query,
+            top_k=top_k,
+            min_score=min_score,
+            tool_ids=tool_ids,
+            query_embedding=query_embedding,
+            doc_types=doc_types
+        )
+        while True:
+            result = await asyncio.to_thread(next, results, None)
+            if result is None:
+                break
+            yield result
     
     def get_stats(self) -> Dict:
         """Get statistics about indexed documents"""
+        self.initialize()
         try:
-            collection_data = self.collection.get()
-            total_chunks = len(collection_data['ids']) if collection_data['ids'] else 0
-            
-            # Count unique tools
-            unique_tools = set()
-            if collection_data['metadatas']:
-                for metadata in collection_data['metadatas']:
-                    unique_tools.add(metadata['tool_id'])
+            tool_chunks = self._get_tool_chunk_counts()
             
             return {
-                "total_chunks": total_chunks,
-                "total_tools": len(unique_tools),
-                "model": self.model.get_sentence_embedding_dimension()
+                "total_chunks": self.store.count(),
+                "total_tools": len(tool_chunks),
+                "tool_chunks": tool_chunks,
+                "model": embedding_service.dimension(self.model_name)
             }
         except Exception as e:
             print(f"Error getting stats: {e}")
@@ -464,4 +1055,4 @@ class DocumentRAGService:
 
 
 # Global instance - Fast extractive summarization only
-rag_service = DocumentRAGService(use_llm_summary=False)
+rag_service = DocumentRAGService(use_llm_summary=settings.DOC_LLM_SUMMARY, preload_model=settings.DOC_LLM_SUMMARY)
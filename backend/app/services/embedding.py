@@ -0,0 +1,205 @@
+"""
+Embedding Service
+Single owner of the embedding models shared by tool search and doc search:
+model lifecycle, query micro-batching, query-embedding caching and
+backend/device/thread settings all live here.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.embedding_cache import EmbeddingCache, content_hash
+from app.services.inference_executor import BatchingEncoder
+from app.services.model_server import load_encoder
+
+
+class EmbeddingService:
+    """Loads each embedding model once per process and serves every caller"""
+
+    def __init__(self, query_cache_size: int = 1024, document_cache: Optional[EmbeddingCache] = None):
+        self._models: Dict[str, object] = {}
+        self._query_encoders: Dict[str, BatchingEncoder] = {}
+        self._load_lock = threading.Lock()
+
+        # Recent query embeddings per (model, text); popular queries skip the model
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Persistent content-addressed cache for document chunk embeddings
+        self.document_cache = document_cache
+
+    @property
+    def tool_model(self) -> str:
+        """Model used for AI tool search"""
+        return settings.TOOL_EMBEDDING_MODEL
+
+    @property
+    def doc_model(self) -> str:
+        """Model used for document search (defaults to a multilingual model)"""
+        return settings.DOC_EMBEDDING_MODEL
+
+    def is_loaded(self, model_name: str) -> bool:
+        return model_name in self._models
+
+    def get_model(self, model_name: str):
+        """Load a model on first use (thread-safe); same name => same instance"""
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+
+        with self._load_lock:
+            if model_name not in self._models:
+                print(f"Loading embedding model {model_name}...")
+                self._models[model_name] = load_encoder(model_name)
+                print(f"Embedding model {model_name} loaded successfully")
+            return self._models[model_name]
+
+    def dimension(self, model_name: str) -> int:
+        return self.get_model(model_name).get_sentence_embedding_dimension()
+
+    def encode(
+        self,
+        model_name: str,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        show_progress_bar: bool = False
+    ) -> np.ndarray:
+        """
+        Encode documents (no caching)
+
+        Args:
+            model_name: Model to use
+            texts: Texts to encode
+            batch_size: Encode batch size (defaults to EMBEDDING_BATCH_SIZE)
+            show_progress_bar: Show progress while encoding
+
+        Returns:
+            2D float32 array of embeddings
+        """
+        if not texts:
+            return np.zeros((0, self.dimension(model_name)), dtype=np.float32)
+        model = self.get_model(model_name)
+        embeddings = model.encode(
+            texts,
+            show_progress_bar=show_progress_bar,
+            batch_size=batch_size or settings.EMBEDDING_BATCH_SIZE
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def encode_documents(
+        self,
+        model_name: str,
+        texts: List[str],
+        show_progress_bar: bool = False
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Encode document chunks through the persistent embedding cache
+        
+        Only texts whose (model, sha256) is not cached are sent to the model;
+        duplicates within the batch are encoded once.
+        
+        Args:
+            model_name: Model to use
+            texts: Chunk texts
+            show_progress_bar: Show progress while encoding the misses
+            
+        Returns:
+            (2D float32 array of embeddings, number of cache hits)
+        """
+        if not texts or self.document_cache is None or not self.document_cache.enabled:
+            return self.encode(model_name, texts, show_progress_bar=show_progress_bar), 0
+        
+        hashes = [content_hash(text) for text in texts]
+        cached = self.document_cache.get_many(model_name, hashes)
+        hits = sum(1 for digest in hashes if digest in cached)
+        
+        missing = {digest: text for digest, text in zip(hashes, texts) if digest not in cached}
+        if missing:
+            vectors = self.encode(model_name, list(missing.values()), show_progress_bar=show_progress_bar)
+            fresh = dict(zip(missing.keys(), vectors))
+            self.document_cache.put_many(model_name, fresh)
+            cached.update(fresh)
+        
+        return np.stack([cached[digest] for digest in hashes]), hits
+    
+    def encode_queries(self, model_name: str, queries: List[str]) -> np.ndarray:
+        """
+        Encode search queries, reusing cached embeddings where possible
+
+        Args:
+            model_name: Model to use
+            queries: Query texts
+
+        Returns:
+            2D float32 array with one row per query
+        """
+        results: List[Optional[np.ndarray]] = [None] * len(queries)
+        missing: Dict[str, List[int]] = {}
+
+        with self._cache_lock:
+            for i, query in enumerate(queries):
+                cached = self._query_cache.get((model_name, query))
+                if cached is not None:
+                    self._query_cache.move_to_end((model_name, query))
+                    results[i] = cached
+                else:
+                    missing.setdefault(query, []).append(i)
+
+        if missing:
+            embeddings = self.encode(model_name, list(missing))
+            with self._cache_lock:
+                for (query, positions), embedding in zip(missing.items(), embeddings):
+                    for i in positions:
+                        results[i] = embedding
+                    if self.query_cache_size > 0:
+                        self._query_cache[(model_name, query)] = embedding
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+
+        if not results:
+            return np.zeros((0, self.dimension(model_name)), dtype=np.float32)
+        return np.stack(results)
+
+    def _get_query_encoder(self, model_name: str) -> BatchingEncoder:
+        encoder = self._query_encoders.get(model_name)
+        if encoder is None:
+            encoder = BatchingEncoder(
+                lambda queries: self.encode_queries(model_name, queries),
+                max_batch_size=settings.QUERY_BATCH_MAX_SIZE,
+                max_wait_ms=settings.QUERY_BATCH_MAX_WAIT_MS,
+                name=f"encoder-{model_name.rsplit('/', 1)[-1]}"
+            )
+            self._query_encoders[model_name] = encoder
+        return encoder
+
+    async def encode_query(self, model_name: str, query: str) -> np.ndarray:
+        """
+        Encode one query from an async handler
+
+        Concurrent callers using the same model are micro-batched into a
+        single encode call on a worker thread.
+        """
+        return await self._get_query_encoder(model_name).encode(query)
+
+    async def encode_query_batch(self, model_name: str, queries: List[str]) -> np.ndarray:
+        """
+        Encode several queries from an async handler in a single model call
+
+        Returns:
+            2D float32 array with one row per query
+        """
+        return await self._get_query_encoder(model_name).encode_many(queries)
+
+
+embedding_service = EmbeddingService(
+    query_cache_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    document_cache=EmbeddingCache(
+        os.path.join(os.path.dirname(__file__), "../..", settings.EMBEDDING_CACHE_PATH),
+        max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+    )
+)
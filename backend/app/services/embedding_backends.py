@@ -0,0 +1,221 @@
+"""
+Embedding Backends
+Pluggable inference engines for the sentence-transformers models:
+- torch: SentenceTransformer (default)
+- onnx: ONNX Runtime on CPU, optionally with dynamic int8 quantization
+"""
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "../..")
+
+
+def _model_slug(model_name: str) -> str:
+    return model_name.replace("/", "__")
+
+
+class TorchBackend:
+    """PyTorch inference through SentenceTransformer"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        if settings.EMBEDDING_NUM_THREADS > 0:
+            import torch
+            torch.set_num_threads(settings.EMBEDDING_NUM_THREADS)
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device=settings.EMBEDDING_DEVICE or None)
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.model.max_seq_length
+
+    def encode(self, texts, show_progress_bar: bool = False, batch_size: int = 32, **kwargs) -> np.ndarray:
+        return self.model.encode(texts, show_progress_bar=show_progress_bar, batch_size=batch_size)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime inference for sentence-transformers models
+
+    The transformer is exported once to ONNX (and optionally quantized to
+    int8) under EMBEDDING_ONNX_DIR; pooling and normalization are replayed
+    in NumPy so the output matches SentenceTransformer.encode.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, quantize: bool = False, export_dir: Optional[str] = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.model_dir = os.path.join(
+            export_dir or os.path.join(BACKEND_DIR, settings.EMBEDDING_ONNX_DIR),
+            _model_slug(model_name)
+        )
+
+        model_path = self.export(model_name, self.model_dir, quantize=quantize)
+
+        with open(os.path.join(self.model_dir, "pooling.json")) as f:
+            pooling = json.load(f)
+        self.pooling_mode = pooling["mode"]
+        self.normalize = pooling["normalize"]
+        self.max_seq_length = pooling["max_seq_length"]
+        self.dimension = pooling["dimension"]
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        options = ort.SessionOptions()
+        if settings.EMBEDDING_NUM_THREADS > 0:
+            options.intra_op_num_threads = settings.EMBEDDING_NUM_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def export(model_name: str, model_dir: str, quantize: bool = False) -> str:
+        """
+        Export a sentence-transformers model to ONNX (no-op if already exported)
+
+        Args:
+            model_name: Sentence-transformers model name
+            model_dir: Directory for the exported files
+            quantize: Also produce a dynamically int8-quantized model
+
+        Returns:
+            Path of the ONNX file to load
+        """
+        fp32_path = os.path.join(model_dir, "model.onnx")
+        int8_path = os.path.join(model_dir, "model.int8.onnx")
+
+        if not os.path.exists(fp32_path):
+            import torch
+            from sentence_transformers import SentenceTransformer
+
+            print(f"Exporting {model_name} to ONNX...")
+            os.makedirs(model_dir, exist_ok=True)
+            st_model = SentenceTransformer(model_name, device="cpu")
+            transformer = st_model[0]
+            transformer.auto_model.eval()
+
+            # Remember how SentenceTransformer pools and normalizes
+            module_names = [type(m).__name__ for m in st_model]
+            pooling = next((m for m in st_model if type(m).__name__ == "Pooling"), None)
+            mode = pooling.get_pooling_mode_str() if pooling is not None else "mean"
+            with open(os.path.join(model_dir, "pooling.json"), "w") as f:
+                json.dump({
+                    "mode": mode,
+                    "normalize": "Normalize" in module_names,
+                    "max_seq_length": st_model.max_seq_length,
+                    "dimension": st_model.get_sentence_embedding_dimension(),
+                }, f)
+            transformer.tokenizer.save_pretrained(model_dir)
+
+            sample = transformer.tokenizer(["export sample"], return_tensors="pt")
+            input_names = list(sample.keys())
+            dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+            dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+            with torch.no_grad():
+                torch.onnx.export(
+                    transformer.auto_model,
+                    tuple(sample[name] for name in input_names),
+                    fp32_path,
+                    input_names=input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=14,
+                )
+            print(f"Exported {model_name} to {fp32_path}")
+
+        if not quantize:
+            return fp32_path
+
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            print(f"Quantizing {model_name} to int8...")
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        return int8_path
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self.pooling_mode == "cls":
+            return hidden[:, 0]
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        if self.pooling_mode == "max":
+            return np.where(mask > 0, hidden, -1e9).max(axis=1)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts, show_progress_bar: bool = False, batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        # Sort by length so each batch pads as little as possible
+        order = np.argsort([-len(t) for t in texts])
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            encoded = self.tokenizer(
+                [texts[i] for i in idx],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            inputs = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+            hidden = self.session.run(["last_hidden_state"], inputs)[0]
+            embeddings[idx] = self._pool(hidden, encoded["attention_mask"])
+
+        if self.normalize:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+
+def load_backend(model_name: str, backend: Optional[str] = None, quantize: Optional[bool] = None):
+    """
+    Load a model with the configured embedding backend
+
+    Args:
+        model_name: Sentence-transformers model name
+        backend: "torch" or "onnx" (defaults to EMBEDDING_BACKEND)
+        quantize: Use int8 weights for onnx (defaults to EMBEDDING_ONNX_QUANTIZE)
+
+    Returns:
+        Backend exposing encode() and get_sentence_embedding_dimension()
+    """
+    backend = (backend or settings.EMBEDDING_BACKEND).lower()
+    quantize = settings.EMBEDDING_ONNX_QUANTIZE if quantize is None else quantize
+
+    if backend == "onnx":
+        try:
+            return OnnxBackend(model_name, quantize=quantize)
+        except Exception as e:
+            print(f"⚠️  ONNX backend unavailable for {model_name}: {e}, falling back to torch")
+
+    return TorchBackend(model_name)
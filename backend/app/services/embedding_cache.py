@@ -0,0 +1,161 @@
+"""
+Embedding Cache
+Persistent, content-addressed cache of chunk embeddings keyed by
+(model, sha256 of the text), so identical boilerplate is embedded once
+across tools and across reindex runs.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache with least-recently-used eviction"""
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        """
+        Args:
+            path: SQLite database file
+            max_entries: Entries kept before the least recently used are evicted
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._readers = threading.local()  # read-only connection per thread
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, content_hash)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read-only connection (WAL readers do not block each other or the writer)"""
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            if self._conn is None:
+                with self._lock:
+                    self._connect()  # creates the file and table
+            uri = Path(os.path.abspath(self.path)).as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=30)
+            self._readers.conn = conn
+        return conn
+
+    @staticmethod
+    def _select(conn: sqlite3.Connection, model_name: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT content_hash, vector FROM embeddings "
+                f"WHERE model = ? AND content_hash IN ({placeholders})",
+                [model_name, *batch]
+            ).fetchall()
+            for digest, blob in rows:
+                found[digest] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def get_many(self, model_name: str, hashes: List[str], touch: bool = True) -> Dict[str, np.ndarray]:
+        """
+        Look up cached embeddings
+
+        Args:
+            model_name: Model the embeddings were produced with
+            hashes: Content hashes to look up
+            touch: Mark the hits as recently used, which is a write. Search-time
+                lookups pass False: a plain read on this thread's own
+                connection, without the cache lock
+
+        Returns:
+            content hash -> embedding for the hashes found
+        """
+        if not self.enabled or not hashes:
+            return {}
+
+        unique = list(dict.fromkeys(hashes))
+        if not touch:
+            return self._select(self._reader(), model_name, unique)
+
+        with self._lock:
+            conn = self._connect()
+            found = self._select(conn, model_name, unique)
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND content_hash = ?",
+                    [(now, model_name, digest) for digest in found]
+                )
+                conn.commit()
+        return found
+
+    def put_many(self, model_name: str, items: Dict[str, np.ndarray]):
+        """Store embeddings (content hash -> vector) and evict if over capacity"""
+        if not self.enabled or not items:
+            return
+
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, content_hash, dim, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (model_name, digest, len(vector), np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for digest, vector in items.items()
+                ]
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used entries down to 90% of capacity"""
+        (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * 0.9)
+        conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        print(f"Embedding cache: evicted {excess} least recently used entries")
+
+    def stats(self) -> Dict:
+        if not self.enabled:
+            return {"entries": 0, "max_entries": 0}
+        with self._lock:
+            (count,) = self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return {"entries": count, "max_entries": self.max_entries}
@@ -0,0 +1,377 @@
+"""
+Doc Indexing Jobs
+Durable queue of "fetch a tool's documentation and index it" jobs, kept in
+the index_jobs table so they survive restarts.
+
+- One pending job per tool: a new request for a tool that is still waiting
+  updates that job instead of adding another
+- Failed attempts are retried with exponential backoff, up to max_attempts
+- At most INDEX_JOB_CONCURRENCY jobs run at once; jobs are claimed with
+  SELECT ... FOR UPDATE SKIP LOCKED, so two runners never take the same job
+- Their pages are fetched concurrently (see DocumentCrawler for the per-host
+  limit); embedding and writing the index happen one job at a time
+- A job whose runner died is taken again once its lease has expired; a live
+  runner renews the lease while the job waits for its turn to be indexed, so
+  the lease does not limit how many jobs may be in flight
+
+The runner lives in the index writer process when INDEX_WRITER_SOCKET is set,
+otherwise in the API process.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal
+from app.db.models import IndexJobDB
+from app.services.document_crawler import crawler
+from app.services.index_writer import DocIndexWriter, doc_index_writer
+
+JOB_STATUSES = ("pending", "running", "succeeded", "failed")
+MAX_RETRY_DELAY_SECONDS = 3600
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def doc_type_for(doc_url: str) -> str:
+    return "confluence" if "confluence" in doc_url.lower() else "webpage"
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait after the given number of failed attempts"""
+    return min(settings.INDEX_JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+
+
+class IndexJobQueue:
+    """Persistent indexing jobs and the runner that executes them"""
+
+    def __init__(self, writer: DocIndexWriter, concurrency: int, max_attempts: int):
+        self.writer = writer
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._active: Dict[asyncio.Task, Dict] = {}  # running job per task
+        self._index_slot: Optional[asyncio.Lock] = None  # one job embedding/writing at a time
+        self._next_purge = 0.0
+
+    # -- Queueing ----------------------------------------------------------
+
+    async def enqueue(
+        self,
+        tool_id: str,
+        tool_name: str,
+        doc_url: str,
+        batch_id: Optional[str] = None
+    ) -> Tuple[Dict, bool]:
+        """
+        Queue (re)indexing of a tool's documentation
+
+        Args:
+            tool_id: Tool identifier
+            tool_name: Tool name for display
+            doc_url: Documentation URL to fetch
+            batch_id: Groups the jobs of one reindex-all for progress reporting
+
+        Returns:
+            (job, created); created is False if merged into the tool's pending job
+        """
+        for _ in range(3):
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(IndexJobDB)
+                    .where(IndexJobDB.tool_id == tool_id, IndexJobDB.status == "pending")
+                    .with_for_update()
+                )
+                job = result.scalar_one_or_none()
+                created = job is None
+                if created:
+                    job = IndexJobDB(tool_id=tool_id, max_attempts=self.max_attempts)
+                    session.add(job)
+
+                # Latest request wins, and runs as soon as a slot is free
+                job.tool_name = tool_name
+                job.doc_url = doc_url
+                if batch_id:
+                    job.batch_id = batch_id
+                job.attempts = 0
+                job.last_error = None
+                job.run_after = _now()
+                try:
+                    await session.commit()
+                except IntegrityError:
+                    continue  # another worker queued this tool at the same moment: merge into it
+                await session.refresh(job)
+
+            self._notify()
+            return job.to_dict(), created
+        raise RuntimeError(f"Could not queue indexing for tool {tool_id}")
+
+    async def cancel_pending(self, tool_id: str) -> int:
+        """Drop the tool's pending job (e.g. its documents are being deleted)"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                delete(IndexJobDB).where(IndexJobDB.tool_id == tool_id, IndexJobDB.status == "pending")
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def get_status(self, batch_id: Optional[str] = None, status: Optional[str] = None, limit: int = 50) -> Dict:
+        """
+        Job counts per status and the most recent jobs
+
+        Args:
+            batch_id: Only the jobs of one reindex-all
+            status: Only list jobs with this status (counts cover all statuses)
+            limit: Maximum number of jobs listed
+
+        Returns:
+            {"counts": {status: n, ..., "total": n}, "jobs": [...]}
+        """
+        filters = [IndexJobDB.batch_id == batch_id] if batch_id else []
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(IndexJobDB.status, func.count(IndexJobDB.id)).where(*filters).group_by(IndexJobDB.status)
+            )
+            by_status = dict(result.all())
+
+            query = select(IndexJobDB).where(*filters)
+            if status:
+                query = query.where(IndexJobDB.status == status)
+            result = await session.execute(query.order_by(IndexJobDB.created_at.desc()).limit(limit))
+            jobs = [job.to_dict() for job in result.scalars().all()]
+
+        counts = {name: by_status.get(name, 0) for name in JOB_STATUSES}
+        counts["total"] = sum(counts.values())
+        return {"counts": counts, "jobs": jobs}
+
+    # -- Runner ------------------------------------------------------------
+
+    def _notify(self):
+        """Wake the runner of this process (others notice on their next poll)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self) -> Optional[Dict]:
+        """Take the next due job, or one whose runner's lease expired"""
+        # Jobs this runner is still working on are never taken over by it
+        active_ids = [job["id"] for job in self._active.values()]
+        while True:
+            now = _now()
+            async with AsyncSessionLocal() as session:
+                query = select(IndexJobDB).where(or_(
+                    and_(IndexJobDB.status == "pending", IndexJobDB.run_after <= now),
+                    and_(
+                        IndexJobDB.status == "running",
+                        IndexJobDB.started_at < now - timedelta(seconds=settings.INDEX_JOB_LEASE_SECONDS)
+                    ),
+                ))
+                if active_ids:
+                    query = query.where(IndexJobDB.id.notin_(active_ids))
+                result = await session.execute(
+                    query
+                    .order_by(IndexJobDB.run_after)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+                job = result.scalar_one_or_none()
+                if job is None:
+                    return None
+
+                if job.status == "running":
+                    print(f"⚠️ Index job for {job.tool_name} outlived its lease (runner stopped?)")
+                    if job.attempts >= job.max_attempts:
+                        job.status = "failed"
+                        job.finished_at = now
+                        job.last_error = "Runner stopped before the job finished"
+                        await session.commit()
+                        continue
+
+                job.status = "running"
+                job.attempts += 1
+                job.started_at = now
+                job.finished_at = None
+                await session.commit()
+                await session.refresh(job)
+                return job.to_dict()
+
+    async def _update_running(self, job: Dict, values: Dict) -> bool:
+        """Update the job if this runner still holds it; False if it was taken over"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(IndexJobDB)
+                .where(
+                    IndexJobDB.id == job["id"],
+                    IndexJobDB.status == "running",
+                    IndexJobDB.attempts == job["attempts"]
+                )
+                .values(**values)
+            )
+            await session.commit()
+            return result.rowcount > 0
+
+    async def _finish(self, job: Dict, values: Dict):
+        """Record the outcome, unless the job was taken over after its lease expired"""
+        if not await self._update_running(job, values):
+            print(f"⚠️ Index job for {job['tool_name']} was taken over by another runner; outcome not recorded")
+
+    async def _acquire_index_slot(self, job: Dict) -> bool:
+        """
+        Wait for the index slot, renewing the job's lease meanwhile
+
+        Returns:
+            False (slot not held) if another runner took the job over
+        """
+        renew_every = max(1.0, settings.INDEX_JOB_LEASE_SECONDS / 3)
+        while True:
+            try:
+                await asyncio.wait_for(self._index_slot.acquire(), timeout=renew_every)
+            except asyncio.TimeoutError:
+                if not await self._update_running(job, {"started_at": _now()}):
+                    return False
+                continue
+
+            # The lease restarts now: indexing gets all of it
+            try:
+                renewed = await self._update_running(job, {"started_at": _now()})
+            except BaseException:
+                self._index_slot.release()
+                raise
+            if not renewed:
+                self._index_slot.release()
+            return renewed
+
+    async def _run(self, job: Dict):
+        """Fetch and index one tool's documentation"""
+        name = job["tool_name"]
+        try:
+            content = await crawler.fetch_url(job["doc_url"])
+            if not content:
+                raise RuntimeError(f"Could not fetch {job['doc_url']}")
+
+            if not await self._acquire_index_slot(job):
+                print(f"⚠️ Index job for {name} was taken over by another runner, not indexing it here")
+                return
+            try:
+                chunks = await self.writer.index_document(
+                    tool_id=job["tool_id"],
+                    tool_name=name,
+                    doc_url=job["doc_url"],
+                    content=content,
+                    doc_type=doc_type_for(job["doc_url"])
+                )
+                if not chunks:
+                    raise RuntimeError("Indexing produced no chunks")
+
+                # The documentation link may have changed: drop the old page's chunks
+                await self.writer.delete_tool_documents(job["tool_id"], keep_doc_url=job["doc_url"])
+            finally:
+                self._index_slot.release()
+        except Exception as e:
+            await self._fail(job, str(e))
+            return
+
+        await self._finish(job, {"status": "succeeded", "finished_at": _now(), "chunks_indexed": chunks, "last_error": None})
+        print(f"✅ Indexed {chunks} chunks for {name} (attempt {job['attempts']})")
+
+    async def _fail(self, job: Dict, error: str):
+        """Schedule a retry with exponential backoff, or give up"""
+        name = job["tool_name"]
+        if job["attempts"] < job["max_attempts"]:
+            delay = retry_delay(job["attempts"])
+            values = {"status": "pending", "run_after": _now() + timedelta(seconds=delay), "last_error": error}
+            print(f"⚠️ Indexing {name} failed (attempt {job['attempts']}/{job['max_attempts']}), retrying in {delay:.0f}s: {error}")
+        else:
+            values = {"status": "failed", "finished_at": _now(), "last_error": error}
+            print(f"❌ Indexing {name} failed after {job['attempts']} attempts: {error}")
+
+        try:
+            await self._finish(job, values)
+        except IntegrityError:
+            # A newer request for this tool is already pending and will redo the work
+            await self._finish(job, {"status": "failed", "finished_at": _now(), "last_error": f"{error} (superseded)"})
+
+    async def _purge_finished(self):
+        """Forget finished jobs after INDEX_JOB_RETENTION_DAYS"""
+        cutoff = _now() - timedelta(days=settings.INDEX_JOB_RETENTION_DAYS)
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                delete(IndexJobDB).where(
+                    IndexJobDB.status.in_(("succeeded", "failed")),
+                    IndexJobDB.finished_at < cutoff
+                )
+            )
+            await session.commit()
+
+    def _job_done(self, task: asyncio.Task):
+        self._active.pop(task, None)
+        self._notify()  # a slot is free
+
+    async def _run_forever(self):
+        available = True
+        while True:
+            self._wakeup.clear()
+            try:
+                if time.monotonic() >= self._next_purge:
+                    await self._purge_finished()
+                    self._next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+
+                while len(self._active) < self.concurrency:
+                    job = await self._claim()
+                    if job is None:
+                        break
+                    task = asyncio.create_task(self._run(job))
+                    self._active[task] = job
+                    task.add_done_callback(self._job_done)
+
+                if not available:
+                    print("Index job queue available again")
+                available = True
+            except Exception as e:
+                if available:
+                    print(f"⚠️ Index job queue unavailable: {e}")
+                available = False
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.INDEX_JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the runner on the running event loop"""
+        if self._runner is None:
+            self._wakeup = asyncio.Event()
+            self._index_slot = asyncio.Lock()
+            self._runner = asyncio.create_task(self._run_forever())
+            print(f"Index job runner started ({self.concurrency} concurrent jobs)")
+
+    async def stop(self):
+        """Stop the runner; interrupted jobs go back to pending without using up an attempt"""
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        interrupted = list(self._active.values())
+        for task in list(self._active):
+            task.cancel()
+        await asyncio.gather(self._runner, *self._active, return_exceptions=True)
+        self._runner = None
+
+        for job in interrupted:
+            try:
+                await self._finish(job, {"status": "pending", "attempts": job["attempts"] - 1, "run_after": _now()})
+            except Exception as e:
+                print(f"⚠️ Could not requeue index job for {job['tool_name']}: {e}")
+
+
+index_jobs = IndexJobQueue(
+    doc_index_writer,
+    concurrency=settings.INDEX_JOB_CONCURRENCY,
+    max_attempts=settings.INDEX_JOB_MAX_ATTEMPTS
+)
@@ -0,0 +1,180 @@
+"""
+Doc Index Snapshots
+Export the document index (vectors, chunk text, metadata, model id) to one
+compressed file, and import it on another node, so a fresh node is warm in
+seconds instead of recrawling and re-embedding everything.
+
+Snapshot file: NumPy .npz (zip, deflate) with
+    manifest    JSON: format, model, dimension, index_version, chunks, created_at
+    records     JSON: ids, documents, metadatas
+    embeddings  float32 (chunks, dimension)
+
+Usage (from backend/):
+    python -m app.services.index_snapshot export data/doc_index.npz
+    python -m app.services.index_snapshot import data/doc_index.npz
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import uuid
+import zipfile
+from datetime import datetime
+from typing import Dict
+
+import numpy as np
+
+from app.services.embedding import embedding_service
+from app.services.vector_store import create_vector_store
+
+SNAPSHOT_FORMAT = 1
+IMPORT_BATCH_SIZE = 2000
+
+
+def export_snapshot(rag_service, path: str, attempts: int = 3) -> Dict:
+    """
+    Write a consistent snapshot of the doc index
+
+    The index is read between two index_version checks and re-read if a
+    writer changed it meanwhile.
+
+    Args:
+        rag_service: DocumentRAGService to export
+        path: Output file (.npz)
+        attempts: Reads to try before giving up on a busy index
+
+    Returns:
+        Snapshot manifest
+    """
+    rag_service.initialize()
+
+    for _ in range(attempts):
+        version = rag_service.index_version
+        data = rag_service.store.get(include_documents=True, include_embeddings=True)
+        if rag_service.index_version == version:
+            break
+    else:
+        raise RuntimeError("Doc index kept changing during export; retry when indexing is idle")
+
+    embeddings = data["embeddings"]
+    if embeddings.size == 0:
+        embeddings = np.zeros((0, embedding_service.dimension(rag_service.model_name)), dtype=np.float32)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "model": rag_service.model_name,
+        "dimension": int(embeddings.shape[1]),
+        "index_version": version,
+        "chunks": len(data["ids"]),
+        "tools": len({metadata["tool_id"] for metadata in data["metadatas"]}),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+    }
+    records = {"ids": data["ids"], "documents": data["documents"], "metadatas": data["metadatas"]}
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        manifest=np.frombuffer(json.dumps(manifest).encode(), dtype=np.uint8),
+        records=np.frombuffer(json.dumps(records, ensure_ascii=False).encode(), dtype=np.uint8),
+        embeddings=embeddings.astype(np.float32, copy=False)
+    )
+    os.replace(tmp_path, path)
+
+    print(f"📦 Exported doc index snapshot: {manifest['chunks']} chunks, {manifest['tools']} tools -> {path}")
+    return manifest
+
+
+def read_manifest(path: str) -> Dict:
+    with np.load(path) as snapshot:
+        return json.loads(snapshot["manifest"].tobytes())
+
+
+def import_snapshot(rag_service, path: str) -> Dict:
+    """
+    Replace the doc index with a snapshot
+
+    The snapshot is loaded into a staging store next to the live one and
+    swapped in only once complete; searches keep using the old index until then.
+
+    Args:
+        rag_service: DocumentRAGService to import into
+        path: Snapshot file written by export_snapshot
+
+    Returns:
+        Snapshot manifest
+
+    Raises:
+        ValueError: If the snapshot is unreadable or was built with another model
+    """
+    if not zipfile.is_zipfile(path):
+        raise ValueError("Not a doc index snapshot (expected an .npz file)")
+    try:
+        with np.load(path) as snapshot:
+            manifest = json.loads(snapshot["manifest"].tobytes())
+            records = json.loads(snapshot["records"].tobytes())
+            embeddings = snapshot["embeddings"]
+    except (OSError, KeyError, ValueError) as e:
+        raise ValueError(f"Not a doc index snapshot: {e}")
+
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')}")
+    if manifest["model"] != rag_service.model_name:
+        raise ValueError(
+            f"Snapshot was built with {manifest['model']}, this node uses {rag_service.model_name}"
+        )
+    if len(records["ids"]) != len(embeddings):
+        raise ValueError("Snapshot records and embeddings do not match")
+
+    rag_service.initialize()
+
+    staging_path = f"{rag_service.db_path}.import-{uuid.uuid4().hex}"
+    try:
+        staging = create_vector_store(staging_path)
+        for start in range(0, len(records["ids"]), IMPORT_BATCH_SIZE):
+            end = start + IMPORT_BATCH_SIZE
+            staging.upsert(
+                ids=records["ids"][start:end],
+                embeddings=embeddings[start:end].tolist(),
+                documents=records["documents"][start:end],
+                metadatas=records["metadatas"][start:end]
+            )
+        if staging.count() != manifest["chunks"]:
+            raise ValueError(f"Imported {staging.count()} of {manifest['chunks']} chunks")
+        staging.close()
+
+        rag_service.replace_store(staging_path, manifest["index_version"])
+    except Exception:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+
+    print(f"📥 Imported doc index snapshot: {manifest['chunks']} chunks, {manifest['tools']} tools from {path}")
+    return manifest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export or import a doc index snapshot")
+    parser.add_argument("action", choices=["export", "import", "info"])
+    parser.add_argument("path", help="Snapshot file (.npz)")
+    args = parser.parse_args()
+
+    if args.action == "info":
+        print(json.dumps(read_manifest(args.path), indent=2))
+        return 0
+
+    from app.services.document_rag import rag_service
+
+    if args.action == "export":
+        export_snapshot(rag_service, args.path)
+    else:
+        try:
+            import_snapshot(rag_service, args.path)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
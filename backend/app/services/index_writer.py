@@ -0,0 +1,269 @@
+"""
+Doc Index Writer
+One process owns every write to the document index (Chroma is not safe to
+write from several processes). Web workers send index/delete/import requests
+to it over a Unix domain socket; it applies them one at a time from a local
+queue. Workers only read the index and reload it when index_version changes.
+It also runs the doc indexing jobs (see index_jobs.py).
+
+Run it next to the API:
+    python -m app.services.index_writer
+
+Web workers forward writes when INDEX_WRITER_SOCKET is set, otherwise they
+write in-process (single-worker deployments).
+"""
+import asyncio
+import json
+import os
+import struct
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.services.document_rag import rag_service
+from app.services.index_snapshot import import_snapshot
+
+_HEADER = struct.Struct("!I")
+
+WRITE_OPS = ("index", "delete", "import")
+
+
+async def _read_message(reader: asyncio.StreamReader) -> Dict:
+    """Receive a length-prefixed JSON message"""
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return json.loads(await reader.readexactly(size))
+
+
+async def _write_message(writer: asyncio.StreamWriter, payload: Dict):
+    """Send a length-prefixed JSON message"""
+    data = json.dumps(payload, ensure_ascii=False).encode()
+    writer.write(_HEADER.pack(len(data)) + data)
+    await writer.drain()
+
+
+# ---------------------------------------------------------------------------
+# Client side (used inside web workers)
+# ---------------------------------------------------------------------------
+
+class DocIndexWriter:
+    """
+    Entry point for doc index writes
+
+    Forwards them to the writer process when a socket is configured, otherwise
+    applies them to the local rag_service in a worker thread.
+    """
+
+    def __init__(self, socket_path: str = "", server: Optional["IndexWriterServer"] = None):
+        self.socket_path = socket_path
+        self.server = server  # set inside the writer process: submit to its queue directly
+
+    @property
+    def remote(self) -> bool:
+        """Writes go through the writer's queue"""
+        return bool(self.socket_path) or self.server is not None
+
+    async def _request(self, payload: Dict) -> Dict:
+        """Send one request and wait for the writer to finish it"""
+        if self.server is not None:
+            return await self.server.submit(payload)
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        except OSError as e:
+            raise RuntimeError(f"Index writer is not running at {self.socket_path}: {e}")
+        try:
+            await _write_message(writer, payload)
+            response = await _read_message(reader)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            raise RuntimeError(f"Index writer connection lost: {e}")
+        finally:
+            writer.close()
+
+        if "error" in response:
+            if response.get("kind") == "ValueError":
+                raise ValueError(response["error"])
+            raise RuntimeError(f"Index writer error: {response['error']}")
+        return response
+
+    async def index_document(
+        self,
+        tool_id: str,
+        tool_name: str,
+        doc_url: str,
+        content: str,
+        doc_type: str = "confluence"
+    ) -> int:
+        """
+        Index a document (see DocumentRAGService.index_document)
+
+        Returns:
+            Number of chunks indexed
+        """
+        if not self.remote:
+            return await asyncio.to_thread(
+                rag_service.index_document, tool_id, tool_name, doc_url, content, doc_type
+            )
+        response = await self._request({
+            "op": "index",
+            "tool_id": tool_id,
+            "tool_name": tool_name,
+            "doc_url": doc_url,
+            "content": content,
+            "doc_type": doc_type,
+        })
+        return response["chunks"]
+
+    async def delete_tool_documents(self, tool_id: str, keep_doc_url: Optional[str] = None) -> bool:
+        """Delete the document chunks of a tool (except keep_doc_url's)"""
+        if not self.remote:
+            return await asyncio.to_thread(rag_service.delete_tool_documents, tool_id, keep_doc_url)
+        response = await self._request({"op": "delete", "tool_id": tool_id, "keep_doc_url": keep_doc_url})
+        return response["ok"]
+
+    async def import_snapshot(self, path: str) -> Dict:
+        """
+        Replace the doc index with a snapshot file (must be readable by the writer)
+
+        Raises:
+            ValueError: If the snapshot is invalid
+        """
+        if not self.remote:
+            return await asyncio.to_thread(import_snapshot, rag_service, path)
+        response = await self._request({"op": "import", "path": os.path.abspath(path)})
+        return response["manifest"]
+
+    async def status(self) -> Dict:
+        """Queue length and counters of the writer process"""
+        if not self.remote:
+            return {"remote": False}
+        return {"remote": True, **await self._request({"op": "status"})}
+
+
+doc_index_writer = DocIndexWriter(settings.INDEX_WRITER_SOCKET)
+
+
+# ---------------------------------------------------------------------------
+# Server side
+# ---------------------------------------------------------------------------
+
+class IndexWriterServer:
+    """Applies doc index writes from all web workers, one at a time"""
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.queue: Optional[asyncio.Queue] = None
+        self.current: Optional[str] = None
+        self.completed = 0
+        self.failed = 0
+
+    def _apply(self, request: Dict) -> Dict:
+        """Run one write against the local rag_service (worker thread)"""
+        op = request["op"]
+        if op == "index":
+            chunks = rag_service.index_document(
+                tool_id=request["tool_id"],
+                tool_name=request["tool_name"],
+                doc_url=request["doc_url"],
+                content=request["content"],
+                doc_type=request.get("doc_type", "confluence")
+            )
+            return {"chunks": chunks}
+        if op == "delete":
+            return {"ok": rag_service.delete_tool_documents(request["tool_id"], request.get("keep_doc_url"))}
+        return {"manifest": import_snapshot(rag_service, request["path"])}
+
+    @staticmethod
+    def _describe(request: Dict) -> str:
+        if request["op"] == "import":
+            return f"import {request['path']}"
+        return f"{request['op']} {request.get('tool_name') or request['tool_id']}"
+
+    async def submit(self, request: Dict) -> Dict:
+        """Queue a write and wait until it has been applied"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return await future
+
+    async def run_jobs(self):
+        """Consume the queue; the only place the index is written"""
+        while True:
+            request, future = await self.queue.get()
+            self.current = self._describe(request)
+            start = time.perf_counter()
+            try:
+                result = await asyncio.to_thread(self._apply, request)
+                self.completed += 1
+                print(f"Index writer: {self.current} done in {time.perf_counter() - start:.1f}s "
+                      f"({self.queue.qsize()} queued)")
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Index writer: {self.current} failed: {e}")
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.current = None
+                self.queue.task_done()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one worker connection; write requests are answered once applied"""
+        try:
+            while True:
+                try:
+                    request = await _read_message(reader)
+                except asyncio.IncompleteReadError:
+                    break
+
+                op = request.get("op")
+                try:
+                    if op == "status":
+                        response = {
+                            "queued": self.queue.qsize(),
+                            "current": self.current,
+                            "completed": self.completed,
+                            "failed": self.failed,
+                        }
+                    elif op in WRITE_OPS:
+                        response = await self.submit(request)
+                    else:
+                        response = {"error": f"Unknown op: {op}"}
+                except Exception as e:
+                    response = {"error": str(e), "kind": type(e).__name__}
+
+                await _write_message(writer, response)
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Open the index, then start listening on the Unix socket"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+
+        rag_service.writable = True
+        await asyncio.to_thread(rag_service.initialize)
+        self.queue = asyncio.Queue()
+        jobs = asyncio.create_task(self.run_jobs())
+
+        # Indexing jobs run here, with their writes going through the same queue
+        from app.services.document_crawler import crawler
+        from app.services.index_jobs import index_jobs
+        index_jobs.writer = DocIndexWriter(server=self)
+        index_jobs.start()
+
+        server = await asyncio.start_unix_server(self.handle_connection, path=self.socket_path)
+        print(f"Index writer listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await index_jobs.stop()
+            await crawler.close()
+            jobs.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+if __name__ == "__main__":
+    socket_path = settings.INDEX_WRITER_SOCKET or "data/index_writer.sock"
+    asyncio.run(IndexWriterServer(socket_path).serve())
@@ -0,0 +1,126 @@
+"""
+Micro-batching Inference Executor
+Coalesces concurrent query-encode requests into one batched model call
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+class BatchingEncoder:
+    """
+    Dynamic micro-batcher for embedding queries
+
+    Requests are queued on the event loop and collected for up to
+    ``max_wait_ms`` or ``max_batch_size`` items, whichever comes first.
+    The batch is encoded with a single call on a dedicated worker thread,
+    so the event loop is never blocked by a forward pass.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "encoder"
+    ):
+        """
+        Args:
+            encode_fn: Blocking function encoding a list of texts into a 2D array
+            max_batch_size: Maximum number of texts per encode call
+            max_wait_ms: How long to wait for more requests once one has arrived
+            name: Worker thread name prefix (shows up in thread dumps)
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def encode(self, text: str) -> np.ndarray:
+        """
+        Encode a single text, batched together with concurrent callers
+
+        Args:
+            text: Text to encode
+
+        Returns:
+            1D embedding vector
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def encode_many(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode a list of texts in one call on the worker thread
+
+        For callers that already hold a batch (e.g. batch search endpoints);
+        it is not split up or merged with queued single requests.
+
+        Returns:
+            2D array with one row per text
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.encode_fn, texts)
+
+    def _ensure_worker(self):
+        """Start the batching loop on the running event loop (once per loop)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for the first request, then gather more until the window closes"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Batching loop: collect, encode on the worker thread, resolve futures"""
+        while True:
+            batch = await self._collect_batch()
+
+            # Skip requests whose callers already went away
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            # Identical queries in the same window are encoded once
+            unique_texts = list(dict.fromkeys(text for text, _ in batch))
+
+            try:
+                embeddings = await self._loop.run_in_executor(
+                    self._executor, self.encode_fn, unique_texts
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            by_text = dict(zip(unique_texts, embeddings))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
@@ -0,0 +1,368 @@
+"""
+Shared Model Server
+Hosts the embedding models once per host and serves all uvicorn workers
+over a Unix domain socket, returning embeddings through shared memory.
+
+Run it next to the API:
+    python -m app.services.model_server
+
+Web workers connect when MODEL_SERVER_SOCKET is set and the server is up,
+otherwise they fall back to loading the models in-process. A worker whose
+server goes away mid-run does the same until the server answers again.
+"""
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.embedding_backends import load_backend
+
+_HEADER = struct.Struct("!I")
+SERVER_RETRY_SECONDS = 30  # After a connection failure, encode in-process this long before retrying
+
+
+def _send_message(sock: socket.socket, payload: Dict):
+    """Send a length-prefixed JSON message"""
+    data = json.dumps(payload).encode()
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("Model server closed the connection")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv_message(sock: socket.socket) -> Dict:
+    """Receive a length-prefixed JSON message"""
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment owned by the server without tracking it locally"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: stop the resource tracker from unlinking it at exit
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# ---------------------------------------------------------------------------
+# Client side (used inside web workers)
+# ---------------------------------------------------------------------------
+
+class ModelServerClient:
+    """Thin client talking to the model server over a Unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        """Check whether the server socket exists and answers"""
+        if not self.socket_path or not os.path.exists(self.socket_path):
+            return False
+        try:
+            with self._lock:
+                return self._request({"op": "ping"}).get("ok", False)
+        except (OSError, ConnectionError, ValueError):
+            return False
+
+    def _connect(self) -> socket.socket:
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._sock = sock
+        return self._sock
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+    def _request(self, payload: Dict) -> Dict:
+        """Send one request on the persistent connection (caller holds the lock)"""
+        try:
+            sock = self._connect()
+            _send_message(sock, payload)
+            response = _recv_message(sock)
+        except (OSError, ConnectionError):
+            self._close()
+            raise
+        if "error" in response:
+            raise RuntimeError(f"Model server error: {response['error']}")
+        return response
+
+    def encode(self, model_name: str, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts with a model hosted by the server
+
+        Args:
+            model_name: Sentence-transformers model name
+            texts: Texts to encode
+
+        Returns:
+            2D float32 array of embeddings
+        """
+        with self._lock:
+            response = self._request({"op": "encode", "model": model_name, "texts": texts})
+            shape = tuple(response["shape"])
+
+            # The segment is reused by the server for this connection, so copy
+            # it out before the next request is sent.
+            shm = _attach_shared_memory(response["shm"])
+            try:
+                return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+            finally:
+                shm.close()
+
+    def info(self, model_name: str) -> Dict:
+        """Embedding dimension and max_seq_length of a hosted model"""
+        with self._lock:
+            return self._request({"op": "info", "model": model_name})
+
+    def dimension(self, model_name: str) -> int:
+        """Embedding dimension of a hosted model"""
+        return int(self.info(model_name)["dimension"])
+
+
+class RemoteEncoder:
+    """
+    Encoder backed by the model server (same interface as the local backends)
+
+    If the server stops answering (it died, or its socket is gone), the call
+    is retried once on a new connection, then the model is loaded in this
+    process and used instead. The server is tried again every
+    SERVER_RETRY_SECONDS; once it answers, the local copy is released.
+    """
+
+    def __init__(self, client: ModelServerClient, model_name: str):
+        self.client = client
+        self.model_name = model_name
+        self._info: Optional[Dict] = None
+        self._tokenizer = None
+        self._local = None
+        self._local_lock = threading.Lock()
+        self._retry_at = 0.0
+
+    def _local_encoder(self):
+        with self._local_lock:
+            if self._local is None:
+                print(f"Loading {self.model_name} in-process while the model server is unavailable")
+                self._local = load_backend(self.model_name)
+            return self._local
+
+    def _call(self, remote, local):
+        """Run remote() on the server, or local(encoder) in-process if the server is unreachable"""
+        if time.monotonic() >= self._retry_at:
+            error: Optional[Exception] = None
+            for _ in range(2):  # a dropped connection is reopened on the second try
+                try:
+                    result = remote()
+                except (OSError, ConnectionError) as e:
+                    error = e
+                    continue
+                if self._local is not None:
+                    print(f"Model server is back, releasing the in-process {self.model_name}")
+                    self._local = None
+                return result
+            print(
+                f"⚠️ Model server unreachable ({error}); encoding with an in-process "
+                f"{self.model_name} for the next {SERVER_RETRY_SECONDS}s"
+            )
+            self._retry_at = time.monotonic() + SERVER_RETRY_SECONDS
+        return local(self._local_encoder())
+
+    def encode(self, texts, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        embeddings = self._call(
+            lambda: self.client.encode(self.model_name, batch),
+            lambda local: np.asarray(
+                local.encode(batch, show_progress_bar=show_progress_bar, **kwargs), dtype=np.float32
+            )
+        )
+        return embeddings[0] if single else embeddings
+
+    def _model_info(self) -> Dict:
+        if self._info is None:
+            self._info = self._call(
+                lambda: self.client.info(self.model_name),
+                lambda local: {
+                    "dimension": local.get_sentence_embedding_dimension(),
+                    "max_seq_length": getattr(local, "max_seq_length", None),
+                }
+            )
+        return self._info
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self._model_info()["dimension"])
+
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        """Input limit of the hosted model (None from servers that do not report it)"""
+        return self._model_info().get("max_seq_length")
+
+    @property
+    def tokenizer(self):
+        """The model's tokenizer, loaded in this process (it is small; used for chunking)"""
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return self._tokenizer
+
+
+_client: Optional[ModelServerClient] = None
+
+
+def get_client() -> Optional[ModelServerClient]:
+    """Shared client, or None if the model server is not configured or not running"""
+    global _client
+    if not settings.MODEL_SERVER_SOCKET:
+        return None
+    if _client is None:
+        _client = ModelServerClient(settings.MODEL_SERVER_SOCKET)
+    return _client if _client.is_available() else None
+
+
+def load_encoder(model_name: str):
+    """
+    Get an encoder for the given model
+
+    Uses the shared model server when it is running, otherwise loads the
+    model into this process.
+    """
+    client = get_client()
+    if client is not None:
+        print(f"Using shared model server for {model_name}")
+        return RemoteEncoder(client, model_name)
+
+    return load_backend(model_name)
+
+
+# ---------------------------------------------------------------------------
+# Server side
+# ---------------------------------------------------------------------------
+
+class ModelServer:
+    """Hosts embedding models and serves encode requests from web workers"""
+
+    def __init__(self, socket_path: str, preload: Optional[List[str]] = None):
+        self.socket_path = socket_path
+        self.preload = preload or []
+        self.models: Dict[str, object] = {}
+        self._load_lock = threading.Lock()
+
+    def get_model(self, model_name: str):
+        """Load a model on first use"""
+        with self._load_lock:
+            if model_name not in self.models:
+                print(f"Loading {model_name}...")
+                self.models[model_name] = load_backend(model_name)
+                print(f"{model_name} loaded")
+            return self.models[model_name]
+
+    def _encode(self, model_name: str, texts: List[str]) -> np.ndarray:
+        model = self.get_model(model_name)
+        return np.asarray(model.encode(texts, show_progress_bar=False), dtype=np.float32)
+
+    async def _read_message(self, reader: asyncio.StreamReader) -> Dict:
+        (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+        return json.loads(await reader.readexactly(size))
+
+    async def _write_message(self, writer: asyncio.StreamWriter, payload: Dict):
+        data = json.dumps(payload).encode()
+        writer.write(_HEADER.pack(len(data)) + data)
+        await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one worker connection; its shared memory buffer lives as long as it does"""
+        shm: Optional[shared_memory.SharedMemory] = None
+        try:
+            while True:
+                try:
+                    request = await self._read_message(reader)
+                except asyncio.IncompleteReadError:
+                    break
+
+                try:
+                    op = request.get("op")
+                    if op == "ping":
+                        response = {"ok": True, "models": list(self.models)}
+                    elif op == "info":
+                        model = await asyncio.to_thread(self.get_model, request["model"])
+                        response = {
+                            "dimension": model.get_sentence_embedding_dimension(),
+                            "max_seq_length": getattr(model, "max_seq_length", None),
+                        }
+                    elif op == "encode":
+                        embeddings = await asyncio.to_thread(
+                            self._encode, request["model"], request["texts"]
+                        )
+                        # Grow the per-connection buffer only when needed
+                        if shm is None or shm.size < max(embeddings.nbytes, 1):
+                            if shm is not None:
+                                shm.close()
+                                shm.unlink()
+                            shm = shared_memory.SharedMemory(create=True, size=max(embeddings.nbytes, 1))
+                        np.ndarray(embeddings.shape, dtype=np.float32, buffer=shm.buf)[:] = embeddings
+                        response = {"shm": shm.name, "shape": list(embeddings.shape)}
+                    else:
+                        response = {"error": f"Unknown op: {op}"}
+                except Exception as e:
+                    response = {"error": str(e)}
+
+                await self._write_message(writer, response)
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            writer.close()
+
+    async def serve(self):
+        """Start listening on the Unix socket"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+
+        for model_name in self.preload:
+            await asyncio.to_thread(self.get_model, model_name)
+
+        server = await asyncio.start_unix_server(self.handle_connection, path=self.socket_path)
+        print(f"Model server listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+if __name__ == "__main__":
+    socket_path = settings.MODEL_SERVER_SOCKET or "data/model_server.sock"
+    preload = [m.strip() for m in settings.MODEL_SERVER_PRELOAD.split(",") if m.strip()]
+    if not preload:
+        preload = list(dict.fromkeys([settings.TOOL_EMBEDDING_MODEL, settings.DOC_EMBEDDING_MODEL]))
+    asyncio.run(ModelServer(socket_path, preload=preload).serve())
@@ -0,0 +1,108 @@
+"""
+Search Result Cache
+Bounded LRU cache for search responses. Keys include the catalog or index
+version, so entries for an old version are never served and simply age out.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+def normalize_query(query: Optional[str], casefold: bool = True) -> str:
+    """Collapse whitespace (and case-fold) so trivially different queries share an entry"""
+    query = " ".join((query or "").split())
+    return query.casefold() if casefold else query
+
+
+class ResultCache:
+    """Thread-safe LRU cache with per-endpoint hit/miss counters"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+    @staticmethod
+    def make_key(
+        endpoint: str,
+        query: Optional[str],
+        params: Dict[str, Any],
+        version: Hashable,
+        normalize: bool = True,
+        casefold: bool = True
+    ) -> Tuple:
+        """
+        Build a cache key
+
+        Args:
+            endpoint: Endpoint name (e.g. "ai-search")
+            query: Raw query text
+            params: Other parameters affecting the result
+            version: Catalog or index version the result was computed from
+            normalize: Normalize the query (disable for exact substring matching)
+            casefold: Also ignore case (disable for case-sensitive models)
+
+        Returns:
+            Hashable key
+        """
+        frozen_params = tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in params.items()
+        ))
+        query_key = normalize_query(query, casefold) if normalize else (query or "")
+        return (endpoint, query_key, frozen_params, version)
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        """Cached value or None; counts a hit or a miss for the key's endpoint"""
+        endpoint = key[0]
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits[endpoint] = self._hits.get(endpoint, 0) + 1
+                return self._entries[key]
+            self._misses[endpoint] = self._misses.get(endpoint, 0) + 1
+            return None
+
+    def set(self, key: Tuple, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Entry count and hit ratios, overall and per endpoint"""
+        with self._lock:
+            endpoints = {}
+            for endpoint in sorted(set(self._hits) | set(self._misses)):
+                hits = self._hits.get(endpoint, 0)
+                misses = self._misses.get(endpoint, 0)
+                endpoints[endpoint] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0.0
+                }
+            total_hits = sum(self._hits.values())
+            total_requests = total_hits + sum(self._misses.values())
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": total_hits,
+                "misses": total_requests - total_hits,
+                "hit_ratio": round(total_hits / total_requests, 3) if total_requests else 0.0,
+                "endpoints": endpoints
+            }
+
+
+# Global instance shared by /api/search, /api/ai-search and /api/doc-search
+from app.core.config import settings
+
+search_cache = ResultCache(max_entries=settings.SEARCH_CACHE_MAX_ENTRIES)
@@ -19,6 +19,15 @@ class StorageService:
             tools_db = result.scalars().all()
             return [Tool(**tool.to_dict()) for tool in tools_db]
     
+    async def get_catalog_version(self) -> str:
+        """Cheap catalog fingerprint; changes on every create, update and delete"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(func.count(ToolDB.id), func.max(ToolDB.updated_at))
+            )
+            count, last_updated = result.one()
+            return f"{count}:{last_updated.isoformat() if last_updated else ''}"
+    
     async def get_tool_by_id(self, tool_id: str) -> Optional[Tool]:
         """Get tool by ID"""
         async with AsyncSessionLocal() as session:
@@ -0,0 +1,602 @@
+"""
+Vector Store
+Storage backends for the document index, selected with VECTOR_STORE_BACKEND:
+- chroma: ChromaDB persistent collection with an HNSW graph (default)
+- numpy: exact in-process search over a memory-mapped float32 matrix
+
+Both accept the same subset of Chroma's `where` filter language:
+{"field": value}, {"field": {"$eq"|"$ne"|"$in"|"$nin": ...}}, {"$and": [...]}, {"$or": [...]}
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+COLLECTION_NAME = "tool_documents"
+
+
+def hnsw_metadata(
+    m: Optional[int] = None,
+    construction_ef: Optional[int] = None,
+    search_ef: Optional[int] = None
+) -> Dict:
+    """
+    Collection metadata for the doc index's HNSW graph
+
+    Arguments default to the DOC_HNSW_* settings; 0 leaves Chroma's default.
+    """
+    params = {
+        "hnsw:M": settings.DOC_HNSW_M if m is None else m,
+        "hnsw:construction_ef": settings.DOC_HNSW_CONSTRUCTION_EF if construction_ef is None else construction_ef,
+        "hnsw:search_ef": settings.DOC_HNSW_SEARCH_EF if search_ef is None else search_ef,
+    }
+    metadata = {"hnsw:space": "cosine"}  # Use cosine similarity
+    metadata.update({key: value for key, value in params.items() if value})
+    return metadata
+
+
+class VectorStore:
+    """
+    Interface of a document vector store
+
+    Distances are cosine distances (1 - cosine similarity).
+    """
+
+    name = "base"
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        """Insert or replace records"""
+        raise NotImplementedError
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        """Replace the metadata of existing records (embeddings untouched)"""
+        raise NotImplementedError
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> int:
+        """Delete records by id and/or filter; returns the number deleted"""
+        raise NotImplementedError
+
+    def get(
+        self,
+        where: Optional[Dict] = None,
+        include_documents: bool = False,
+        include_embeddings: bool = False
+    ) -> Dict:
+        """
+        Records matching a filter (metadata only unless asked otherwise)
+
+        Returns:
+            {"ids": [...], "metadatas": [...]} (+ "documents", and "embeddings"
+            as a float32 array, if requested)
+        """
+        raise NotImplementedError
+
+    def query(self, embedding: List[float], top_k: int, where: Optional[Dict] = None) -> Dict:
+        """
+        Nearest records to an embedding
+
+        Returns:
+            {"ids", "documents", "metadatas", "distances"}, nearest first
+        """
+        return self.query_many([embedding], top_k, where)[0]
+
+    def query_many(self, embeddings: List[List[float]], top_k: int, where: Optional[Dict] = None) -> List[Dict]:
+        """
+        Nearest records to each of several embeddings, in one request
+
+        Returns:
+            One query() result per embedding
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def refresh(self):
+        """Pick up writes made by another process"""
+
+    def close(self):
+        """Release open files so the store directory can be moved"""
+
+
+class _ReadWriteLock:
+    """Many readers or one writer (used to reopen a store's handles between queries)"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            # A waiting writer goes first, or a steady stream of queries would starve it
+            self._cond.wait_for(lambda: not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                self._cond.wait_for(lambda: not self._readers)
+            finally:
+                self._writers_waiting -= 1
+            try:
+                yield
+            finally:
+                self._cond.notify_all()
+
+
+class ChromaVectorStore(VectorStore):
+    """ChromaDB persistent collection (HNSW, approximate)"""
+
+    name = "chroma"
+
+    def __init__(self, path: str, writable: bool = True):
+        """
+        Args:
+            path: Directory of the Chroma database
+            writable: False in processes that only search (web workers behind
+                the index writer): the collection is opened, never created or
+                modified, and writes raise
+        """
+        self.path = path
+        self.writable = writable
+        self._lock = _ReadWriteLock()
+        os.makedirs(path, exist_ok=True)
+        self.client, self.collection = self._open()
+        if writable:
+            self._apply_search_ef()
+
+    def _open(self):
+        """New client and collection"""
+        import chromadb
+        from chromadb.config import Settings
+
+        # Initialize ChromaDB with persistent storage
+        client = chromadb.PersistentClient(
+            path=self.path,
+            settings=Settings(anonymized_telemetry=False)
+        )
+
+        if self.writable:
+            collection = client.get_or_create_collection(name=COLLECTION_NAME, metadata=hnsw_metadata())
+        else:
+            try:
+                collection = client.get_collection(name=COLLECTION_NAME)
+            except Exception:
+                collection = None  # the writer has not created it yet; searches find nothing
+        return client, collection
+
+    @staticmethod
+    def _release(client):
+        """
+        Let go of a client so the next one loads the segments from disk
+
+        Chroma shares one system (and its loaded segments) per path and process.
+        Client.close() (chromadb >= 1.5) stops it with its last client; older
+        versions can only drop the cached systems.
+        """
+        close = getattr(client, "close", None)
+        if close is not None:
+            close()
+        else:
+            from chromadb.api.client import SharedSystemClient
+
+            SharedSystemClient.clear_system_cache()
+
+    def _apply_search_ef(self):
+        """
+        Bring an existing collection's HNSW settings in line with the config
+
+        search_ef can be changed in place (it is read when the HNSW segment is
+        loaded, i.e. on the first query after startup); M and construction_ef
+        are fixed when the graph is built, so a mismatch is only reported.
+        """
+        configured = hnsw_metadata()
+        current = (getattr(self.collection, "configuration_json", None) or {}).get("hnsw") or {}
+
+        for key, name in (("hnsw:M", "max_neighbors"), ("hnsw:construction_ef", "ef_construction")):
+            if key in configured and current.get(name) != configured[key]:
+                print(
+                    f"⚠️ {COLLECTION_NAME} was built with {key}={current.get(name, 'default')}, "
+                    f"configured {configured[key]}; rebuild the doc index to apply it"
+                )
+
+        search_ef = configured.get("hnsw:search_ef")
+        if search_ef and current.get("ef_search") != search_ef:
+            try:
+                self.collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+                print(f"Doc index search_ef set to {search_ef}")
+            except Exception as e:
+                print(f"⚠️ Could not update search_ef: {e}")
+
+    def _check_open(self):
+        # A reader whose collection does not exist yet has a client; a closed store has none
+        if self.client is None:
+            raise RuntimeError(f"{self.path} is closed")
+
+    def _writable_collection(self):
+        if not self.writable:
+            raise RuntimeError(f"{self.path} is opened read-only; writes go through the index writer")
+        self._check_open()
+        return self.collection
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        with self._lock.read():
+            self._writable_collection().upsert(
+                ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas
+            )
+
+    def update_metadata(self, ids, metadatas):
+        with self._lock.read():
+            self._writable_collection().update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids=None, where=None) -> int:
+        with self._lock.read():
+            collection = self._writable_collection()
+            matched = collection.get(ids=ids, where=where, include=[])["ids"]
+            if matched:
+                collection.delete(ids=matched)
+            return len(matched)
+
+    def get(self, where=None, include_documents=False, include_embeddings=False) -> Dict:
+        include = ["metadatas"]
+        if include_documents:
+            include.append("documents")
+        if include_embeddings:
+            include.append("embeddings")
+        with self._lock.read():
+            self._check_open()
+            if self.collection is None:
+                results = {"ids": [], "metadatas": [], "documents": [], "embeddings": None}
+            else:
+                results = self.collection.get(where=where, include=include)
+        output = {"ids": results["ids"], "metadatas": results["metadatas"] or []}
+        if include_documents:
+            output["documents"] = results["documents"] or []
+        if include_embeddings:
+            embeddings = results["embeddings"]
+            output["embeddings"] = np.asarray(embeddings if embeddings is not None else [], dtype=np.float32)
+        return output
+
+    def query_many(self, embeddings, top_k, where=None) -> List[Dict]:
+        if len(embeddings) == 0:
+            return []
+        keys = ("ids", "documents", "metadatas", "distances")
+        with self._lock.read():
+            self._check_open()
+            if self.collection is None:
+                return [{key: [] for key in keys} for _ in embeddings]
+            results = self.collection.query(
+                query_embeddings=list(embeddings),
+                n_results=top_k,
+                where=where,
+                include=["documents", "metadatas", "distances"]
+            )
+        if not results["ids"]:
+            return [{key: [] for key in keys} for _ in embeddings]
+        return [{key: results[key][i] for key in keys} for i in range(len(embeddings))]
+
+    def count(self) -> int:
+        with self._lock.read():
+            self._check_open()
+            return self.collection.count() if self.collection is not None else 0
+
+    def refresh(self):
+        # The HNSW segment is loaded once per system: reopen to see another process's
+        # writes. Running queries finish first; new ones wait for the reopened collection
+        with self._lock.write():
+            if self.client is not None:
+                self._release(self.client)
+            self.client, self.collection = None, None
+            self.client, self.collection = self._open()
+
+    def close(self):
+        with self._lock.write():
+            if self.client is not None:
+                self._release(self.client)
+            self.collection = None
+            self.client = None
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact cosine search over a memory-mapped float32 matrix
+
+    On disk:
+        vectors.npy   normalized embeddings, one row per slot (memory-mapped)
+        records.json  id, document and metadata per slot (null id = free slot)
+
+    records.json is replaced atomically after the vectors are written, so it
+    is the commit point; other processes reload when its mtime changes.
+    """
+
+    name = "numpy"
+
+    def __init__(self, path: str, writable: bool = True):
+        """
+        Args:
+            path: Directory of vectors.npy and records.json
+            writable: False in processes that only search; writes then raise
+        """
+        self.path = path
+        self.writable = writable
+        self._lock = threading.RLock()
+        self._vectors: Optional[np.ndarray] = None  # memmap, (capacity, dim)
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._loaded_mtime: Optional[int] = None
+        self._columns: Dict[str, np.ndarray] = {}  # metadata field -> values per slot
+        self._occupied: Optional[np.ndarray] = None  # slot holds a record (cached until the next write)
+        os.makedirs(path, exist_ok=True)
+        self._reload_if_changed()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.npy")
+
+    @property
+    def _records_path(self) -> str:
+        return os.path.join(self.path, "records.json")
+
+    def _reload_if_changed(self):
+        """Load the records written by this or another process if they changed"""
+        try:
+            mtime = os.stat(self._records_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+
+        with open(self._records_path, encoding="utf-8") as f:
+            records = json.load(f)
+        self._ids = records["ids"]
+        self._documents = records["documents"]
+        self._metadatas = records["metadatas"]
+        self._rows = {record_id: row for row, record_id in enumerate(self._ids) if record_id is not None}
+        self._free = [row for row, record_id in enumerate(self._ids) if record_id is None]
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+") if self._ids else None
+        self._columns = {}
+        self._occupied = None
+        self._loaded_mtime = mtime
+
+    def _commit(self):
+        """Flush vectors, then atomically publish the records"""
+        if self._vectors is not None:
+            self._vectors.flush()
+        tmp_path = f"{self._records_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"ids": self._ids, "documents": self._documents, "metadatas": self._metadatas},
+                f,
+                ensure_ascii=False
+            )
+        os.replace(tmp_path, self._records_path)
+        self._loaded_mtime = os.stat(self._records_path).st_mtime_ns
+        self._columns = {}
+        self._occupied = None
+
+    def _ensure_capacity(self, rows: int, dim: int):
+        """Grow the memory-mapped matrix (doubling) to hold at least rows slots"""
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if self._vectors is not None and self._vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the store ({self._vectors.shape[1]})")
+        if rows <= capacity:
+            return
+
+        new_capacity = max(rows, capacity * 2, 1024)
+        tmp_path = f"{self._vectors_path}.{os.getpid()}.tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(new_capacity, dim))
+        if capacity:
+            grown[:capacity] = self._vectors
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self._vectors_path)
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+
+    def _column(self, field: str) -> np.ndarray:
+        """Metadata values of one field for every slot (cached until the next write)"""
+        column = self._columns.get(field)
+        if column is None:
+            column = np.empty(len(self._ids), dtype=object)
+            column[:] = [metadata.get(field) if metadata else None for metadata in self._metadatas]
+            self._columns[field] = column
+        return column
+
+    def _mask(self, where: Optional[Dict]) -> np.ndarray:
+        """Boolean mask over slots: occupied and matching the filter"""
+        if self._occupied is None:
+            self._occupied = np.fromiter(
+                (record_id is not None for record_id in self._ids), dtype=bool, count=len(self._ids)
+            )
+        if not where:
+            return self._occupied.copy()
+        return self._occupied & self._match(where)
+
+    def _match(self, where: Dict) -> np.ndarray:
+        mask = np.ones(len(self._ids), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._match(clause)
+            elif key == "$or":
+                any_mask = np.zeros(len(self._ids), dtype=bool)
+                for clause in condition:
+                    any_mask |= self._match(clause)
+                mask &= any_mask
+            else:
+                column = self._column(key)
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                for operator, value in condition.items():
+                    if operator == "$eq":
+                        mask &= column == value
+                    elif operator == "$ne":
+                        mask &= column != value
+                    elif operator == "$in":
+                        mask &= np.isin(column, list(value))
+                    elif operator == "$nin":
+                        mask &= ~np.isin(column, list(value))
+                    else:
+                        raise ValueError(f"Unsupported filter operator: {operator}")
+        return mask
+
+    def _check_writable(self):
+        if not self.writable:
+            raise RuntimeError(f"{self.path} is opened read-only; writes go through the index writer")
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self._check_writable()
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.clip(norms, 1e-12, None)
+
+        with self._lock:
+            self._reload_if_changed()
+            new_ids = [record_id for record_id in dict.fromkeys(ids) if record_id not in self._rows]
+            appended = max(0, len(new_ids) - len(self._free))
+            self._ensure_capacity(len(self._ids) + appended, vectors.shape[1])
+
+            for record_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                row = self._rows.get(record_id)
+                if row is None:
+                    if self._free:
+                        row = self._free.pop()
+                    else:
+                        row = len(self._ids)
+                        self._ids.append(None)
+                        self._documents.append(None)
+                        self._metadatas.append(None)
+                    self._rows[record_id] = row
+                self._vectors[row] = vector
+                self._ids[row] = record_id
+                self._documents[row] = document
+                self._metadatas[row] = metadata
+            self._commit()
+
+    def update_metadata(self, ids, metadatas):
+        self._check_writable()
+        with self._lock:
+            self._reload_if_changed()
+            for record_id, metadata in zip(ids, metadatas):
+                row = self._rows.get(record_id)
+                if row is not None:
+                    self._metadatas[row] = metadata
+            self._commit()
+
+    def delete(self, ids=None, where=None) -> int:
+        self._check_writable()
+        with self._lock:
+            self._reload_if_changed()
+            mask = self._mask(where)
+            if ids is not None:
+                wanted = np.zeros(len(self._ids), dtype=bool)
+                wanted[[self._rows[record_id] for record_id in ids if record_id in self._rows]] = True
+                mask &= wanted
+
+            rows = np.flatnonzero(mask)
+            for row in rows:
+                del self._rows[self._ids[row]]
+                self._ids[row] = None
+                self._documents[row] = None
+                self._metadatas[row] = None
+                self._free.append(int(row))
+            if len(rows):
+                self._commit()
+            return len(rows)
+
+    def get(self, where=None, include_documents=False, include_embeddings=False) -> Dict:
+        with self._lock:
+            self._reload_if_changed()
+            rows = np.flatnonzero(self._mask(where))
+            output = {
+                "ids": [self._ids[row] for row in rows],
+                "metadatas": [self._metadatas[row] for row in rows]
+            }
+            if include_documents:
+                output["documents"] = [self._documents[row] for row in rows]
+            if include_embeddings:
+                output["embeddings"] = (
+                    np.array(self._vectors[rows]) if rows.size else np.zeros((0, 0), dtype=np.float32)
+                )
+            return output
+
+    def query_many(self, embeddings, top_k, where=None) -> List[Dict]:
+        if len(embeddings) == 0:
+            return []
+        with self._lock:
+            self._reload_if_changed()
+            mask = self._mask(where)
+            candidates = int(mask.sum())
+            if candidates == 0 or top_k <= 0:
+                return [{"ids": [], "documents": [], "metadatas": [], "distances": []} for _ in embeddings]
+
+            # One contiguous matrix-matrix product over all slots, then mask
+            queries = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            similarities = self._vectors[:len(self._ids)] @ queries.T  # (slots, queries)
+            similarities[~mask] = -np.inf
+
+            top_k = min(top_k, candidates)
+            results = []
+            for column in similarities.T:
+                top = np.argpartition(column, -top_k)[-top_k:]
+                top = top[np.argsort(column[top])[::-1]]
+                results.append({
+                    "ids": [self._ids[row] for row in top],
+                    "documents": [self._documents[row] for row in top],
+                    "metadatas": [self._metadatas[row] for row in top],
+                    "distances": [float(1.0 - column[row]) for row in top]
+                })
+            return results
+
+    def count(self) -> int:
+        with self._lock:
+            self._reload_if_changed()
+            return len(self._rows)
+
+    def refresh(self):
+        with self._lock:
+            self._reload_if_changed()
+
+    def close(self):
+        with self._lock:
+            self._vectors = None
+            self._loaded_mtime = None
+
+
+def create_vector_store(path: str, backend: Optional[str] = None, writable: bool = True) -> VectorStore:
+    """
+    Open the configured vector store
+
+    Args:
+        path: Directory holding the store's files
+        backend: "chroma" or "numpy" (defaults to VECTOR_STORE_BACKEND)
+        writable: False for search-only processes: writes raise, and Chroma
+            neither creates nor modifies the collection
+    """
+    backend = backend or settings.VECTOR_STORE_BACKEND
+    if backend == "numpy":
+        return NumpyVectorStore(path, writable=writable)
+    if backend == "chroma":
+        return ChromaVectorStore(path, writable=writable)
+    raise ValueError(f"Unknown vector store backend: {backend}")
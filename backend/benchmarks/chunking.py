@@ -0,0 +1,113 @@
+"""
+Document chunker benchmark
+
+Compares the character chunker with the tokenizer-aligned chunker on large
+Confluence-style pages: throughput, chunk count, tokens per chunk, and how
+much text the embedding model would silently truncate.
+
+Usage (from backend/):
+    uv run python -m benchmarks.chunking
+    uv run python -m benchmarks.chunking --pages-dir crawled_pages/ --model sentence-transformers/all-MiniLM-L6-v2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, List
+
+from app.services.chunking import (
+    SPECIAL_TOKENS,
+    TokenChunker,
+    _max_seq_length,
+    chunk_by_characters,
+    iter_paragraphs,
+)
+
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+ENGLISH_SENTENCES = [
+    "Authentication setup: generate an API token and add it to the .env file before starting the service.",
+    "The strategy GUI connects to the RKV cluster on startup and retries with exponential backoff.",
+    "Grafana dashboards show exchange latency percentiles per venue and per gateway.",
+    "Run the migration script once after upgrading; it is safe to re-run.",
+    "If the order book view is empty, check that the market data subscription is active.",
+]
+
+CHINESE_SENTENCES = [
+    "部署步骤：1. 安装依赖 npm install 2. 启动后端 node server.js 3. 打开浏览器访问 http://localhost:5173",
+    "监控系统会在延迟超过阈值时发送告警，请在值班群中确认处理。",
+    "风控参数修改后需要重新加载策略配置，否则新的限额不会生效。",
+    "如果连接超时，请检查防火墙规则以及 RKV 服务的健康状态。",
+]
+
+
+def synthetic_pages(count: int, paragraphs_per_page: int, seed: int = 0) -> List[str]:
+    """Mixed English/Chinese pages; every fourth page is one whitespace-collapsed paragraph"""
+    rng = random.Random(seed)
+    pages = []
+    for page_number in range(count):
+        paragraphs = []
+        for _ in range(paragraphs_per_page):
+            pool = CHINESE_SENTENCES if rng.random() < 0.4 else ENGLISH_SENTENCES
+            paragraphs.append(" ".join(rng.choice(pool) for _ in range(rng.randint(1, 12))))
+        separator = " " if page_number % 4 == 3 else "\n\n"
+        pages.append(separator.join(paragraphs))
+    return pages
+
+
+def load_pages(pages_dir: str) -> List[str]:
+    pages = []
+    for name in sorted(os.listdir(pages_dir)):
+        with open(os.path.join(pages_dir, name), encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+
+def run(label: str, chunk_fn: Callable[[str], List[str]], pages: List[str], chunker: TokenChunker, limit: int):
+    start = time.perf_counter()
+    chunks = [chunk for page in pages for chunk in chunk_fn(page)]
+    elapsed = time.perf_counter() - start
+
+    token_counts = [chunker.count_tokens(chunk) for chunk in chunks]
+    total_tokens = sum(token_counts)
+    truncated = [count for count in token_counts if count > limit]
+    lost = sum(count - limit for count in truncated)
+    megabytes = sum(len(page.encode()) for page in pages) / 1e6
+
+    print(
+        f"{label:<10} {len(pages) / elapsed:>8.1f} {megabytes / elapsed:>7.2f} {len(chunks):>8} "
+        f"{total_tokens / max(len(chunks), 1):>9.1f} {len(truncated) / max(len(chunks), 1):>10.1%} "
+        f"{lost / max(total_tokens, 1):>10.1%}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--pages-dir", help="Directory of crawled pages, one text file per page")
+    parser.add_argument("--pages", type=int, default=40, help="Synthetic pages (without --pages-dir)")
+    parser.add_argument("--paragraphs", type=int, default=200, help="Paragraphs per synthetic page")
+    parser.add_argument("--overlap", type=int, default=16)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    limit = _max_seq_length(args.model, None) - SPECIAL_TOKENS
+    chunker = TokenChunker(tokenizer, limit, args.overlap)
+
+    pages = load_pages(args.pages_dir) if args.pages_dir else synthetic_pages(args.pages, args.paragraphs)
+    megabytes = sum(len(page.encode()) for page in pages) / 1e6
+    print(f"=== {args.model}: {len(pages)} pages, {megabytes:.1f} MB, {limit} tokens per input ===")
+
+    header = f"{'chunker':<10} {'pages/s':>8} {'MB/s':>7} {'chunks':>8} {'tok/chunk':>9} {'truncated':>10} {'tok lost':>10}"
+    print(header)
+    print("-" * len(header))
+    run("chars", chunk_by_characters, pages, chunker, limit)
+    run("tokens", lambda page: list(chunker.chunk(iter_paragraphs(page))), pages, chunker, limit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Embedding backend parity check and throughput benchmark
+
+Compares the ONNX Runtime backend (fp32 and int8) against the PyTorch
+SentenceTransformer embeddings for the models used by AI search and doc search.
+
+Usage (from backend/):
+    uv run python -m benchmarks.embedding_backends
+    uv run python -m benchmarks.embedding_backends --texts-file docs.txt --min-cosine 0.98
+"""
+import argparse
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from app.services.embedding_backends import OnnxBackend, TorchBackend
+
+# Models used by AI search and doc search
+DEFAULT_MODELS = [
+    "sentence-transformers/all-MiniLM-L6-v2",
+    "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+]
+
+SAMPLE_TEXTS = [
+    "trading tools",
+    "RMS UI risk management dashboard",
+    "HFT cloud DB management and subscriptions",
+    "监控系统",
+    "如何部署 strategy GUI",
+    "troubleshooting RKV connection timeouts",
+    "Grafana dashboards for exchange latency monitoring",
+    "Corporate action as a service: splits, dividends and symbol changes",
+    "Authentication setup: generate an API token and add it to the .env file before starting the service.",
+    "部署步骤：1. 安装依赖 npm install 2. 启动后端 node server.js 3. 打开浏览器访问 http://localhost:5173",
+]
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity between two embedding matrices"""
+    num = (reference * candidate).sum(axis=1)
+    den = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    return num / np.clip(den, 1e-12, None)
+
+
+def throughput(backend, texts: List[str], batch_size: int, repeats: int) -> float:
+    """Texts encoded per second (after one warm-up pass)"""
+    backend.encode(texts[:batch_size], batch_size=batch_size)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        backend.encode(texts, batch_size=batch_size)
+    return len(texts) * repeats / (time.perf_counter() - start)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS)
+    parser.add_argument("--texts-file", help="One text per line (defaults to built-in samples)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="Fail if the minimum cosine agreement drops below this")
+    args = parser.parse_args()
+
+    if args.texts_file:
+        with open(args.texts_file, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = SAMPLE_TEXTS * 10
+
+    failed = False
+    for model_name in args.models:
+        print(f"\n=== {model_name} ({len(texts)} texts) ===")
+        torch_backend = TorchBackend(model_name)
+        reference = np.asarray(torch_backend.encode(texts), dtype=np.float32)
+
+        candidates = [
+            ("torch", torch_backend),
+            ("onnx-fp32", OnnxBackend(model_name, quantize=False)),
+            ("onnx-int8", OnnxBackend(model_name, quantize=True)),
+        ]
+
+        header = f"{'backend':<10} {'min cos':>8} {'mean cos':>9}" + "".join(
+            f" {f'bs={bs} txt/s':>13}" for bs in args.batch_sizes
+        )
+        print(header)
+        print("-" * len(header))
+
+        for label, backend in candidates:
+            agreement = cosine_agreement(reference, np.asarray(backend.encode(texts), dtype=np.float32))
+            rates = [throughput(backend, texts, bs, args.repeats) for bs in args.batch_sizes]
+            print(f"{label:<10} {agreement.min():>8.4f} {agreement.mean():>9.4f}" + "".join(
+                f" {rate:>13.1f}" for rate in rates
+            ))
+            if agreement.min() < args.min_cosine:
+                failed = True
+                print(f"⚠️  {label} below parity threshold {args.min_cosine}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Doc index HNSW recall/latency benchmark
+
+Builds a corpus into throwaway Chroma collections for each HNSW parameter set
+and compares query results with exact brute-force cosine search. Reports
+recall@k and p50/p99 query latency, to pick DOC_HNSW_M,
+DOC_HNSW_CONSTRUCTION_EF and DOC_HNSW_SEARCH_EF.
+
+Usage (from backend/):
+    uv run python -m benchmarks.hnsw
+    uv run python -m benchmarks.hnsw --from-index data/chroma_db --m 16 32 --search-ef 10 50 100
+"""
+import argparse
+import itertools
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from app.services.vector_store import hnsw_metadata
+
+
+def synthetic_corpus(size: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors (doc chunks of one tool tend to sit close together)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, size)] + rng.normal(scale=0.6, size=(size, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exported_corpus(db_path: str) -> np.ndarray:
+    """Chunk embeddings of an existing doc index"""
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.PersistentClient(path=db_path, settings=Settings(anonymized_telemetry=False))
+    collection = client.get_collection("tool_documents")
+    embeddings = collection.get(include=["embeddings"])["embeddings"]
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def make_queries(corpus: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Perturbed corpus vectors, so every query has real near neighbours"""
+    rng = np.random.default_rng(seed)
+    picks = corpus[rng.integers(0, len(corpus), count)]
+    queries = picks + rng.normal(scale=0.3 / np.sqrt(corpus.shape[1]), size=picks.shape)
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_neighbours(corpus: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    normalized = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    scores = queries @ normalized.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def build_collection(client, name: str, corpus: np.ndarray, m: int, construction_ef: int, batch_size: int = 5000):
+    collection = client.create_collection(name=name, metadata=hnsw_metadata(m, construction_ef, 0))
+    for start in range(0, len(corpus), batch_size):
+        end = min(start + batch_size, len(corpus))
+        collection.add(
+            ids=[str(i) for i in range(start, end)],
+            embeddings=corpus[start:end].tolist()
+        )
+    return collection
+
+
+def measure(collection, queries: np.ndarray, truth: List[set], k: int):
+    """Recall@k and per-query latencies (ms)"""
+    latencies = []
+    found = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += len(expected & {int(i) for i in result["ids"][0]})
+    return found / (k * len(queries)), np.asarray(latencies)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-index", help="Chroma directory to take the corpus from (e.g. data/chroma_db)")
+    parser.add_argument("--size", type=int, default=20000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic embedding dimension")
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", nargs="+", type=int, default=[16, 32])
+    parser.add_argument("--construction-ef", nargs="+", type=int, default=[100, 200])
+    parser.add_argument("--search-ef", nargs="+", type=int, default=[10, 50, 100, 200])
+    args = parser.parse_args()
+
+    import chromadb
+    from chromadb.api.client import SharedSystemClient
+    from chromadb.config import Settings
+
+    corpus = exported_corpus(args.from_index) if args.from_index else synthetic_corpus(
+        args.size, args.dim, args.clusters
+    )
+    queries = make_queries(corpus, args.queries)
+    k = min(args.k, len(corpus))
+    truth = exact_neighbours(corpus, queries, k)
+    print(f"=== {len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, recall@{k} ===")
+
+    header = f"{'M':>4} {'constr_ef':>9} {'search_ef':>9} {'build s':>8} {'recall':>7} {'p50 ms':>7} {'p99 ms':>7}"
+    print(header)
+    print("-" * len(header))
+
+    with tempfile.TemporaryDirectory() as db_path:
+        client = chromadb.PersistentClient(path=db_path, settings=Settings(anonymized_telemetry=False))
+        for m, construction_ef in itertools.product(args.m, args.construction_ef):
+            start = time.perf_counter()
+            collection = build_collection(client, f"bench_m{m}_ef{construction_ef}", corpus, m, construction_ef)
+            build_seconds = time.perf_counter() - start
+
+            for search_ef in args.search_ef:
+                # search_ef is read when the index is loaded: drop the cached segment and reopen
+                collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+                SharedSystemClient.clear_system_cache()
+                client = chromadb.PersistentClient(path=db_path, settings=Settings(anonymized_telemetry=False))
+                collection = client.get_collection(collection.name)
+                recall, latencies = measure(collection, queries, truth, k)
+                print(
+                    f"{m:>4} {construction_ef:>9} {search_ef:>9} {build_seconds:>8.1f} {recall:>7.3f} "
+                    f"{np.percentile(latencies, 50):>7.2f} {np.percentile(latencies, 99):>7.2f}"
+                )
+            client.delete_collection(collection.name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
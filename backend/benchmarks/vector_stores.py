@@ -0,0 +1,133 @@
+"""
+Vector store parity check and query latency benchmark
+
+Runs the same sequence of operations (upsert, metadata update, delete by id
+and by filter, filtered get and query, count) against every vector store
+backend, checks that they agree, and compares query latency.
+
+Usage (from backend/):
+    uv run python -m benchmarks.vector_stores
+    uv run python -m benchmarks.vector_stores --chunks 20000 --queries 500
+"""
+import argparse
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.vector_store import create_vector_store
+
+BACKENDS = ["chroma", "numpy"]
+
+
+def synthetic_chunks(count: int, dim: int, tools: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(count, dim)).astype(np.float32)
+    ids = [f"chunk-{i}" for i in range(count)]
+    documents = [f"Chunk {i} of the documentation" for i in range(count)]
+    metadatas = [
+        {
+            "tool_id": f"tool-{i % tools}",
+            "doc_url": f"https://confluence.example.com/pages/{i % (tools * 3)}",
+            "doc_type": "confluence" if i % 5 else "readme",
+            "chunk_index": i,
+        }
+        for i in range(count)
+    ]
+    return ids, embeddings, documents, metadatas
+
+
+def exercise(store, ids, embeddings, documents, metadatas, queries: np.ndarray, k: int) -> Dict:
+    """Apply the operation sequence; returns what each step observed"""
+    observed = {}
+    for start in range(0, len(ids), 2000):
+        end = start + 2000
+        store.upsert(ids[start:end], embeddings[start:end].tolist(), documents[start:end], metadatas[start:end])
+    observed["count after insert"] = store.count()
+
+    # Re-upsert a few records with new vectors, move others' metadata
+    store.upsert(ids[:10], embeddings[10:20].tolist(), documents[:10], metadatas[:10])
+    store.update_metadata(ids[20:30], [{**metadata, "doc_type": "moved"} for metadata in metadatas[20:30]])
+    observed["moved"] = sorted(store.get(where={"doc_type": "moved"})["ids"])
+
+    observed["deleted by id"] = store.delete(ids=ids[30:40] + ["missing"])
+    observed["deleted by filter"] = store.delete(where={"tool_id": "tool-1"})
+    observed["count after delete"] = store.count()
+
+    in_filter = {"tool_id": {"$in": ["tool-2", "tool-3"]}}
+    and_filter = {"$and": [{"tool_id": "tool-2"}, {"doc_type": "readme"}]}
+    observed["get $in"] = sorted(store.get(where=in_filter)["ids"])
+    observed["get $and"] = sorted(store.get(where=and_filter)["ids"])
+
+    observed["top1"] = [store.query(query.tolist(), 1)["ids"] for query in queries[:20]]
+    observed["topk filtered"] = [store.query(query.tolist(), k, where=in_filter)["ids"] for query in queries[:20]]
+    return observed
+
+
+def latency_ms(store, queries: np.ndarray, k: int, where=None) -> np.ndarray:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        store.query(query.tolist(), k, where=where)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.asarray(timings)
+
+
+def overlap(a: List[List[str]], b: List[List[str]]) -> float:
+    matches = sum(len(set(x) & set(y)) for x, y in zip(a, b))
+    return matches / max(sum(len(x) for x in a), 1)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--tools", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    ids, embeddings, documents, metadatas = synthetic_chunks(args.chunks, args.dim, args.tools)
+    queries = embeddings[np.random.default_rng(1).integers(0, args.chunks, args.queries)] + 0.01
+    print(f"=== {args.chunks} chunks x {args.dim} dims, {args.queries} queries, k={args.k} ===")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        header = f"{'backend':<8} {'p50 ms':>7} {'p99 ms':>7} {'p50 filtered':>13} {'p99 filtered':>13}"
+        rows = []
+        for backend in args.backends:
+            store = create_vector_store(f"{tmp}/{backend}", backend)
+            results[backend] = exercise(store, ids, embeddings, documents, metadatas, queries, args.k)
+            plain = latency_ms(store, queries, args.k)
+            filtered = latency_ms(store, queries, args.k, where={"tool_id": {"$in": ["tool-2", "tool-3"]}})
+            rows.append(
+                f"{backend:<8} {np.percentile(plain, 50):>7.2f} {np.percentile(plain, 99):>7.2f} "
+                f"{np.percentile(filtered, 50):>13.2f} {np.percentile(filtered, 99):>13.2f}"
+            )
+        print(header)
+        print("-" * len(header))
+        print("\n".join(rows))
+
+    failed = False
+    reference_name, reference = args.backends[0], results[args.backends[0]]
+    for backend in args.backends[1:]:
+        for step, expected in reference.items():
+            actual = results[backend][step]
+            if step in ("top1", "topk filtered"):
+                agreement = overlap(expected, actual)
+                ok = agreement >= 0.95  # HNSW is approximate
+                detail = f"{agreement:.3f} overlap"
+            else:
+                ok = actual == expected
+                detail = "match" if ok else f"{reference_name}={expected!r:.80} {backend}={actual!r:.80}"
+            print(f"{'✓' if ok else '✗'} {backend} vs {reference_name}: {step} ({detail})")
+            failed |= not ok
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
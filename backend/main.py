@@ -2,16 +2,74 @@
 AG Tools Catalogue - Backend API
 FastAPI application for managing internal tools catalogue
 """
+import multiprocessing
+import os
+import threading
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import tools, search, tags, users, ai_search, doc_search, admins
+from app.api.endpoints import tools, search, tags, users, ai_search, doc_search, admins, unified_search
 from app.core.config import settings
+from app.services.ai_search import ai_search_service
+from app.services.document_crawler import crawler
+from app.services.document_rag import rag_service
+from app.services.index_jobs import index_jobs
+
+
+def warm_up_services():
+    """Load embedding models and open the vector store off the request path"""
+    for name, service in (("ai-search", ai_search_service), ("doc-search", rag_service)):
+        try:
+            service.initialize()
+        except Exception as e:
+            print(f"⚠️ Warm-up failed for {name}: {e}")
+
+
+def running_several_workers() -> bool:
+    """
+    Best guess whether this is one of several API worker processes
+
+    WEB_CONCURRENCY sets the worker count for uvicorn and gunicorn; workers
+    started with `uvicorn --workers` are multiprocessing children (so is the
+    --reload server, hence the DEBUG check).
+    """
+    try:
+        if int(os.environ.get("WEB_CONCURRENCY") or 1) > 1:
+            return True
+    except ValueError:
+        pass
+    return multiprocessing.parent_process() is not None and not settings.DEBUG
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy services load lazily; optionally start loading them right away
+    # without holding up /health and the CRUD endpoints.
+    if settings.WARMUP_MODELS:
+        threading.Thread(target=warm_up_services, name="model-warmup", daemon=True).start()
+    
+    # Doc indexing jobs run in the index writer process when there is one
+    if not settings.INDEX_WRITER_SOCKET:
+        if running_several_workers():
+            print(
+                "⚠️ Several API workers but no INDEX_WRITER_SOCKET: every worker writes the doc index "
+                "and runs the indexing jobs. Run `python -m app.services.index_writer` and set "
+                "INDEX_WRITER_SOCKET for multi-worker deployments"
+            )
+        index_jobs.start()
+    yield
+    await index_jobs.stop()
+    await crawler.close()
+
 
 app = FastAPI(
     title="ONE UI API",
     description="API for managing internal company tools and GUIs",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -30,6 +88,7 @@ app.include_router(tags.router, prefix="/api/tags", tags=["tags"])
 app.include_router(users.router, prefix="/api", tags=["users"])
 app.include_router(ai_search.router, prefix="/api", tags=["ai-search"])
 app.include_router(doc_search.router, prefix="/api", tags=["doc-search"])
+app.include_router(unified_search.router, prefix="/api", tags=["unified-search"])
 app.include_router(admins.router, prefix="/api/admins", tags=["admins"])
 
 
@@ -47,6 +106,20 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Ready once the search models and vector store are loaded"""
+    components = {
+        "ai_search": ai_search_service.is_ready,
+        "doc_search": rag_service.is_ready,
+    }
+    ready = all(components.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "loading", "components": components}
+    )
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
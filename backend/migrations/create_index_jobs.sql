@@ -0,0 +1,30 @@
+-- Durable doc indexing jobs (app/services/index_jobs.py)
+-- Run this SQL against your PostgreSQL database (new installs get it from app.db.init_db)
+
+CREATE TABLE IF NOT EXISTS index_jobs (
+    id VARCHAR(36) PRIMARY KEY,
+    tool_id VARCHAR(36) NOT NULL,
+    tool_name VARCHAR(255) NOT NULL,
+    doc_url VARCHAR(500) NOT NULL,
+    batch_id VARCHAR(36),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    chunks_indexed INTEGER,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_index_jobs_tool_id ON index_jobs (tool_id);
+CREATE INDEX IF NOT EXISTS ix_index_jobs_batch_id ON index_jobs (batch_id);
+CREATE INDEX IF NOT EXISTS ix_index_jobs_status_run_after ON index_jobs (status, run_after);
+
+-- At most one pending job per tool: new requests are merged into it
+CREATE UNIQUE INDEX IF NOT EXISTS uq_index_jobs_pending_tool ON index_jobs (tool_id) WHERE status = 'pending';
+
+-- Verify the change
+\d index_jobs
@@ -0,0 +1,172 @@
+"""
+Vector store backends behave the same through the VectorStore interface
+"""
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import document_rag
+from app.services.index_snapshot import export_snapshot, import_snapshot
+from app.services.vector_store import create_vector_store
+
+BACKENDS = ["chroma", "numpy"]
+DIMENSION = 8
+
+
+def unit(i: int) -> list:
+    """Embedding pointing along axis i (cosine distance 0 to itself, 1 to the others)"""
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    vector[i] = 1.0
+    return vector.tolist()
+
+
+def add_records(store, count: int = 4):
+    store.upsert(
+        ids=[f"chunk-{i}" for i in range(count)],
+        embeddings=[unit(i) for i in range(count)],
+        documents=[f"document {i}" for i in range(count)],
+        metadatas=[{"tool_id": f"tool-{i % 2}", "chunk_index": i} for i in range(count)]
+    )
+
+
+@pytest.fixture(params=BACKENDS)
+def store(request, tmp_path):
+    store = create_vector_store(str(tmp_path / request.param), request.param)
+    yield store
+    store.close()
+
+
+def test_upsert_and_count(store):
+    assert store.count() == 0
+    add_records(store)
+    assert store.count() == 4
+
+    # Same ids replace, new ids insert
+    store.upsert(ids=["chunk-0", "chunk-9"], embeddings=[unit(5), unit(6)],
+                 documents=["replaced", "new"], metadatas=[{"tool_id": "tool-0"}, {"tool_id": "tool-2"}])
+    assert store.count() == 5
+    result = store.query(unit(5), top_k=1)
+    assert result["ids"] == ["chunk-0"]
+    assert result["documents"] == ["replaced"]
+
+
+def test_get(store):
+    add_records(store)
+    result = store.get(where={"tool_id": "tool-1"}, include_documents=True, include_embeddings=True)
+
+    by_id = dict(zip(result["ids"], zip(result["documents"], result["metadatas"], result["embeddings"])))
+    assert sorted(by_id) == ["chunk-1", "chunk-3"]
+    document, metadata, embedding = by_id["chunk-3"]
+    assert document == "document 3"
+    assert metadata == {"tool_id": "tool-1", "chunk_index": 3}
+    assert result["embeddings"].dtype == np.float32
+    np.testing.assert_allclose(embedding, unit(3), atol=1e-6)
+
+    assert "documents" not in store.get()
+    assert store.get(where={"tool_id": "missing"})["ids"] == []
+
+
+def test_update_metadata(store):
+    add_records(store)
+    store.update_metadata(ids=["chunk-0"], metadatas=[{"tool_id": "tool-7", "chunk_index": 0}])
+
+    assert store.get(where={"tool_id": "tool-7"})["ids"] == ["chunk-0"]
+    # Embedding and document are untouched
+    result = store.query(unit(0), top_k=1)
+    assert result["ids"] == ["chunk-0"]
+    assert result["documents"] == ["document 0"]
+
+
+def test_delete(store):
+    add_records(store, count=6)
+
+    assert store.delete(where={"tool_id": "tool-0"}) == 3
+    assert store.count() == 3
+    assert store.get(where={"tool_id": "tool-0"})["ids"] == []
+
+    assert store.delete(ids=["chunk-1"]) == 1
+    assert store.delete(ids=["chunk-1"]) == 0
+    assert store.delete(where={"$and": [{"tool_id": "tool-1"}, {"chunk_index": {"$in": [3, 4]}}]}) == 1
+    assert sorted(store.get()["ids"]) == ["chunk-5"]
+
+
+def test_query(store):
+    add_records(store)
+
+    result = store.query(unit(2), top_k=2)
+    assert set(result) >= {"ids", "documents", "metadatas", "distances"}
+    assert result["ids"][0] == "chunk-2"
+    assert result["distances"][0] == pytest.approx(0.0, abs=1e-5)
+    assert result["distances"][1] == pytest.approx(1.0, abs=1e-5)
+    assert result["metadatas"][0]["tool_id"] == "tool-0"
+
+    # The filter applies before top_k
+    filtered = store.query(unit(2), top_k=2, where={"tool_id": {"$in": ["tool-1"]}})
+    assert sorted(filtered["ids"]) == ["chunk-1", "chunk-3"]
+
+
+def test_query_many(store):
+    add_records(store)
+
+    results = store.query_many([unit(3), unit(1), unit(0)], top_k=1)
+    assert [result["ids"] for result in results] == [["chunk-3"], ["chunk-1"], ["chunk-0"]]
+    assert store.query_many([], top_k=1) == []
+
+
+def test_empty_store(store):
+    assert store.query(unit(0), top_k=3)["ids"] == []
+    assert store.get()["ids"] == []
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_snapshot_export_import(backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_STORE_BACKEND", backend)
+    # Snapshots carry vectors; no embedding model is needed
+    monkeypatch.setattr(document_rag.embedding_service, "get_model", lambda model_name: None)
+
+    source = document_rag.DocumentRAGService()
+    source.db_path = str(tmp_path / "source")
+    source.initialize()
+    add_records(source.store, count=5)
+
+    manifest = export_snapshot(source, str(tmp_path / "snapshot.npz"))
+    assert manifest["chunks"] == 5
+    assert manifest["tools"] == 2
+    assert manifest["dimension"] == DIMENSION
+
+    target = document_rag.DocumentRAGService()
+    target.db_path = str(tmp_path / "target")
+    target.initialize()
+    target.store.upsert(ids=["stale"], embeddings=[unit(7)], documents=["stale"], metadatas=[{"tool_id": "old"}])
+
+    import_snapshot(target, str(tmp_path / "snapshot.npz"))
+    assert target.store.count() == 5
+    assert target.store.get(where={"tool_id": "old"})["ids"] == []
+    exported = source.store.get(include_documents=True)
+    imported = target.store.get(include_documents=True)
+    assert sorted(zip(imported["ids"], imported["documents"])) == sorted(zip(exported["ids"], exported["documents"]))
+    assert target.store.query(unit(4), top_k=1)["ids"] == ["chunk-4"]
+
+    source.store.close()
+    target.store.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_read_only_store(backend, tmp_path):
+    path = str(tmp_path / backend)
+    writer = create_vector_store(path, backend)
+    add_records(writer)
+    reader = create_vector_store(path, backend, writable=False)
+
+    assert reader.count() == 4
+    assert reader.query(unit(1), top_k=1)["ids"] == ["chunk-1"]
+    with pytest.raises(RuntimeError):
+        reader.upsert(ids=["x"], embeddings=[unit(0)], documents=["x"], metadatas=[{"tool_id": "x"}])
+    with pytest.raises(RuntimeError):
+        reader.update_metadata(ids=["chunk-0"], metadatas=[{"tool_id": "x"}])
+    with pytest.raises(RuntimeError):
+        reader.delete(where={"tool_id": "tool-0"})
+    assert writer.count() == 4
+
+    reader.close()
+    writer.close()